@@ -0,0 +1,282 @@
+# Benchmark harness for the sales analytics code at several data scales
+#
+# Each scale gets a synthetic file from benchmarks/salesdatagenerator.py.
+# Up to IN_MEMORY_MAX_ROWS rows every stage is timed on its own:
+# read_sales_data, parse_transactions, the memory-mapped parser (lazy, and
+# with every column materialized), validate_and_filter, each
+# utils/dataprocessor.py analysis and the report. Larger scales do not fit
+# in memory as dictionaries, so they time the streaming path instead
+# (batched parse + validate + mergeable engines), then the analyses on the
+# merged engine. Results can be saved as the baseline and later runs
+# compared against it.
+#
+#   python -m benchmarks.runbenchmarks --scales 1k 1m --save-baseline
+#   python -m benchmarks.runbenchmarks --scales 1k 1m --compare
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.salesdatagenerator import generate_sales_file
+from utils import dataprocessor
+from utils.dataprocessor import ALL_GROUPS, AnalyticsEngine
+from utils.filehandler import iter_transactions, parse_transactions, read_sales_data, validate_and_filter, validate_and_filter_batches
+from utils.mmapparser import materialize, parse_sales_file_mmap
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCALES = {
+    '1k': 1_000,
+    '1m': 1_000_000,
+    '100m': 100_000_000,
+}
+
+DEFAULT_SCALES = ('1k', '1m')
+
+DATA_DIR = 'benchmarks/data'
+BASELINE_FILE = 'benchmarks/baseline.json'
+
+IN_MEMORY_MAX_ROWS = 5_000_000
+STREAM_CHUNK_SIZE = 100_000
+
+# Best of this many runs; single runs from 1M rows up
+REPEAT_SMALL = 5
+REPEAT_LARGE_ROWS = 1_000_000
+
+# A benchmark slower than baseline by more than this factor is a regression
+REGRESSION_RATIO = 1.25
+
+# dataprocessor analyses, called as func(transactions_or_engine)
+ANALYSES = (
+    'calculate_total_revenue',
+    'region_wise_sales',
+    'top_selling_products',
+    'customer_analysis',
+    'daily_sales_trend',
+    'find_peak_sales_day',
+    'order_value_percentiles',
+    'low_performing_products',
+)
+
+
+def _quiet(func, *args, **kwargs):
+    """
+    Calls func with its prints discarded
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _time(func, repeat):
+    """
+    Returns: (best wall time in seconds over repeat runs, last result)
+    """
+    best = None
+    result = None
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, result
+
+
+def _report(transactions, output_dir):
+    """
+    The main.py report stage: DataFrame conversion plus generate_sales_report
+    """
+    import main
+
+    frame = main.report_frame(transactions)
+    main.generate_sales_report(frame, frame, os.path.join(output_dir, 'sales_report.txt'))
+
+
+def benchmark_in_memory(filename, rows):
+    """
+    Times every stage separately on a file that fits in memory
+    Returns: dict of benchmark name -> seconds
+    """
+    repeat = 1 if rows >= REPEAT_LARGE_ROWS else REPEAT_SMALL
+    results = {}
+
+    results['read_sales_data'], raw_lines = _time(lambda: _quiet(read_sales_data, filename), repeat)
+    results['parse_transactions'], transactions = _time(lambda: parse_transactions(raw_lines), repeat)
+    results['parse_transactions[table]'], table = _time(lambda: parse_transactions(raw_lines, as_table=True), repeat)
+
+    # Reads the file itself, so compare with read_sales_data + parse_transactions
+    results['parse_sales_file_mmap'], _ = _time(lambda: parse_sales_file_mmap(filename), repeat)
+    results['parse_sales_file_mmap[materialized]'], _ = _time(
+        lambda: materialize(parse_sales_file_mmap(filename)), repeat
+    )
+
+    results['validate_and_filter'], validated = _time(lambda: _quiet(validate_and_filter, transactions), repeat)
+    results['validate_and_filter[table]'], validated_table = _time(lambda: _quiet(validate_and_filter, table), repeat)
+    valid = validated[0]
+    valid_table = validated_table[0]
+
+    for name in ANALYSES:
+        func = getattr(dataprocessor, name)
+        results[name], _ = _time(lambda: func(valid), repeat)
+
+    results['analyze'], _ = _time(lambda: dataprocessor.analyze(valid), repeat)
+    results['analyze[table]'], _ = _time(lambda: dataprocessor.analyze(valid_table), repeat)
+
+    try:
+        import pandas   # the report is pandas based
+    except ImportError:
+        print("  pandas not installed; skipping report generation")
+    else:
+        with tempfile.TemporaryDirectory() as output_dir:
+            results['generate_sales_report'], _ = _time(lambda: _quiet(_report, valid, output_dir), repeat)
+
+    return results
+
+
+def benchmark_streaming(filename, rows):
+    """
+    Times the batched path on a file too large to hold as dictionaries
+    Engines are approximate (bounded memory), as at this scale in production
+    Returns: dict of benchmark name -> seconds
+    """
+    results = {}
+
+    def stream():
+        engine = AnalyticsEngine([], ALL_GROUPS, mergeable=True, approximate=True)
+        batches = iter_transactions(filename, STREAM_CHUNK_SIZE, as_table=True)
+
+        for batch in validate_and_filter_batches(batches):
+            engine.merge(AnalyticsEngine(batch, ALL_GROUPS, mergeable=True, approximate=True))
+
+        return engine
+
+    results['stream_parse_validate_analyze[approximate]'], engine = _time(stream, 1)
+
+    for name in ANALYSES:
+        func = getattr(dataprocessor, name)
+        results[name], _ = _time(lambda: func(engine), 1)
+
+    return results
+
+
+def run(scales=DEFAULT_SCALES, data_dir=DATA_DIR):
+    """
+    Generates (or reuses) each scale's file and benchmarks it
+    Returns: the results document (environment + per-scale timings)
+    """
+    document = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__ if np is not None else None,
+        'machine': f"{platform.system()} {platform.machine()}",
+        'scales': {}
+    }
+
+    for scale in scales:
+        rows = SCALES[scale]
+        filename = os.path.join(data_dir, f"sales_{scale}.txt")
+
+        print(f"[{scale}] generating {rows:,} rows...")
+        generate_sales_file(filename, rows)
+
+        print(f"[{scale}] benchmarking...")
+        if rows <= IN_MEMORY_MAX_ROWS:
+            results = benchmark_in_memory(filename, rows)
+        else:
+            results = benchmark_streaming(filename, rows)
+
+        document['scales'][scale] = {
+            'rows': rows,
+            'seconds': {name: round(seconds, 6) for name, seconds in results.items()}
+        }
+
+        for name, seconds in results.items():
+            print(f"  {name:<44} {seconds:>10.4f}s")
+
+    return document
+
+
+def save_results(document, filename):
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_file = filename + '.tmp'
+
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+
+    os.replace(tmp_file, filename)
+
+
+def compare(document, baseline, ratio=REGRESSION_RATIO):
+    """
+    Prints current vs baseline timings for the scales both have
+    Returns: list of (scale, benchmark, ratio) slower than the threshold
+    """
+    regressions = []
+
+    for scale, current in document['scales'].items():
+        before = baseline.get('scales', {}).get(scale)
+
+        if before is None:
+            print(f"[{scale}] no baseline")
+            continue
+
+        print(f"[{scale}] {'benchmark':<44} {'baseline':>10} {'current':>10} {'ratio':>7}")
+
+        for name, seconds in current['seconds'].items():
+            old = before['seconds'].get(name)
+
+            if not old:
+                print(f"  {name:<44} {'-':>10} {seconds:>10.4f}")
+                continue
+
+            change = seconds / old
+            flag = '  REGRESSION' if change > ratio else ''
+            print(f"  {name:<44} {old:>10.4f} {seconds:>10.4f} {change:>6.2f}x{flag}")
+
+            if change > ratio:
+                regressions.append((scale, name, change))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the sales analytics code')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare against the baseline; exit 1 on regression')
+    parser.add_argument('--output', help='also write these results to a JSON file')
+    args = parser.parse_args()
+
+    document = run(args.scales, args.data_dir)
+
+    if args.output:
+        save_results(document, args.output)
+
+    if args.save_baseline:
+        save_results(document, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"Error: No baseline at {args.baseline}; run with --save-baseline first.")
+            sys.exit(1)
+
+        if compare(document, baseline):
+            sys.exit(1)
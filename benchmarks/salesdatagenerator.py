@@ -0,0 +1,176 @@
+# Deterministic synthetic sales data in the exact Sales_data.txt format
+#
+# Pipe-separated, latin-1, with the quirks of the real file: product names
+# containing commas (and a non-ASCII one), unit prices with comma thousands
+# separators, and invalid rows of every kind the validation rules reject.
+# The same (rows, seed, invalid_rate) always produces byte-identical files.
+#
+#   python -m benchmarks.salesdatagenerator 1000000 data/bench_1m.txt
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region'
+
+# (ProductID, names seen for it, typical unit price)
+PRODUCTS = [
+    ('P101', ('Laptop', 'Laptop,Premium'), 52000),
+    ('P102', ('Mouse', 'Mouse,Wireless'), 550),
+    ('P103', ('Keyboard', 'Keyboard,Mechanical', 'Keyboard,Français'), 2400),
+    ('P104', ('Monitor', 'Monitor,LED'), 14000),
+    ('P105', ('Webcam', 'Webcam,HD'), 3000),
+    ('P106', ('Headphones',), 2800),
+    ('P107', ('USB Cable',), 300),
+    ('P108', ('External Hard Drive', 'External Hard Drive,1TB'), 8500),
+    ('P109', ('Wireless Mouse', 'Wireless Mouse,Gaming'), 1000),
+    ('P110', ('Laptop Charger', 'Laptop Charger,65W'), 1900),
+]
+
+REGIONS = ('North', 'South', 'East', 'West')
+
+START_DATE = date(2024, 1, 1)
+
+DEFAULT_DAYS = 366
+DEFAULT_CUSTOMERS = 500
+DEFAULT_INVALID_RATE = 0.125      # the share of invalid rows in Sales_data.txt
+DEFAULT_SEED = 42
+
+# Share of valid prices >= 1000 written with thousands separators
+THOUSANDS_SEPARATOR_RATE = 0.5
+
+# The ways a row can be invalid, as seen in Sales_data.txt
+DEFECTS = (
+    'transaction_prefix',   # X611 instead of T...
+    'product_prefix',
+    'customer_missing',
+    'zero_quantity',
+    'negative_price',
+    'region_missing',
+    'field_count',          # a field dropped
+)
+
+WRITE_BLOCK_ROWS = 10000
+
+
+def _valid_fields(random_, number, dates, customers):
+    product_id, names, price = PRODUCTS[int(random_() * len(PRODUCTS))]
+    unit_price = max(1, int(price * (0.85 + 0.3 * random_())))
+
+    if unit_price >= 1000 and random_() < THOUSANDS_SEPARATOR_RATE:
+        unit_price = f"{unit_price:,}"
+
+    return [
+        f"T{number:03d}",
+        dates[int(random_() * len(dates))],
+        product_id,
+        names[int(random_() * len(names))],
+        str(1 + int(random_() * 10)),
+        str(unit_price),
+        customers[int(random_() * len(customers))],
+        REGIONS[int(random_() * len(REGIONS))]
+    ]
+
+
+def _break(rng, fields):
+    """
+    Applies one random defect to a row's fields
+    """
+    defect = DEFECTS[rng.randrange(len(DEFECTS))]
+
+    if defect == 'transaction_prefix':
+        fields[0] = 'X' + fields[0][1:]
+    elif defect == 'product_prefix':
+        fields[2] = 'Q' + fields[2][1:]
+    elif defect == 'customer_missing':
+        fields[6] = ''
+    elif defect == 'zero_quantity':
+        fields[4] = '0'
+    elif defect == 'negative_price':
+        fields[5] = '-' + fields[5].replace(',', '')
+    elif defect == 'region_missing':
+        fields[7] = ''
+    else:
+        del fields[rng.randrange(len(fields))]
+
+    return fields
+
+
+def generate_lines(rows, seed=DEFAULT_SEED, invalid_rate=DEFAULT_INVALID_RATE,
+                   days=DEFAULT_DAYS, customers=DEFAULT_CUSTOMERS):
+    """
+    Yields the data lines (no header, no newline) of a synthetic file
+    """
+    rng = random.Random(seed)
+    random_ = rng.random
+
+    # Field values drawn from, formatted once
+    dates = [(START_DATE + timedelta(days=day)).isoformat() for day in range(days)]
+    customer_ids = [f"C{customer:03d}" for customer in range(1, customers + 1)]
+
+    for number in range(1, rows + 1):
+        fields = _valid_fields(random_, number, dates, customer_ids)
+
+        if random_() < invalid_rate:
+            fields = _break(rng, fields)
+
+        yield '|'.join(fields)
+
+
+def generate_sales_file(filename, rows, seed=DEFAULT_SEED, invalid_rate=DEFAULT_INVALID_RATE,
+                        days=DEFAULT_DAYS, customers=DEFAULT_CUSTOMERS):
+    """
+    Writes a synthetic sales file (header + rows lines, latin-1)
+    Existing files are reused if they were generated with the same settings
+    Returns: filename
+    """
+    if not 0 <= invalid_rate <= 1:
+        raise ValueError('invalid_rate must be between 0 and 1')
+
+    settings = f"rows={rows} seed={seed} invalid_rate={invalid_rate} days={days} customers={customers}"
+    stamp_file = filename + '.settings'
+
+    if os.path.exists(filename) and os.path.exists(stamp_file):
+        with open(stamp_file, 'r', encoding='utf-8') as f:
+            if f.read() == settings:
+                return filename
+
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_file = filename + '.tmp'
+
+    with open(tmp_file, 'w', encoding='latin-1', newline='\n', buffering=1 << 20) as f:
+        f.write(HEADER + '\n')
+
+        block = []
+        for line in generate_lines(rows, seed, invalid_rate, days, customers):
+            block.append(line)
+            if len(block) >= WRITE_BLOCK_ROWS:
+                f.write('\n'.join(block) + '\n')
+                block = []
+
+        if block:
+            f.write('\n'.join(block) + '\n')
+
+    os.replace(tmp_file, filename)
+
+    with open(stamp_file, 'w', encoding='utf-8') as f:
+        f.write(settings)
+
+    return filename
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic Sales_data.txt-style file')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('filename')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--invalid-rate', type=float, default=DEFAULT_INVALID_RATE)
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--customers', type=int, default=DEFAULT_CUSTOMERS)
+    args = parser.parse_args()
+
+    generate_sales_file(args.filename, args.rows, args.seed, args.invalid_rate, args.days, args.customers)
+    print(f"Wrote {args.rows} rows to {args.filename}")
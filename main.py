@@ -1,9 +1,20 @@
 # Entry point for the sales analytics system
+from utils.filehandler import parse_transactions
+from utils.indexes import TransactionIndex
+from utils.reportrenderer import format_currency, format_percentage, grouped_totals, render_rows, render_section, rollup
+from utils.validation import DEFAULT_VALIDATOR
+
 encoding='latin-1'
 def clean_transactions(file_path):
+    """
+    Counts valid and invalid records using the shared rules in utils/validation.py
+    """
     total_records = 0
     invalid_records = 0
     valid_records = []
+    rules = DEFAULT_VALIDATOR.rules
+    rejected = {rule.name: 0 for rule in rules}
+    rejected['malformed'] = 0
 
     with open(file_path, 'r', encoding='latin-1') as file:
         header = file.readline()
@@ -16,102 +27,169 @@ def clean_transactions(file_path):
 
             total_records += 1
 
-            try:
-                fields = line.split('|')
-
-                if len(fields) != 8:
-                    invalid_records += 1
-                    continue
-
-                transaction_id, date, product_id, product_name, quantity, unit_price, customer_id, region = fields
-
-                if not transaction_id.startswith('T'):
-                    invalid_records += 1
-                    continue
-
-                if not customer_id.strip() or not region.strip():
-                    invalid_records += 1
-                    continue
-
-                quantity = int(quantity.replace(',', ''))
-                unit_price = float(unit_price.replace(',', ''))
+            # Wrong field count or unreadable numbers
+            parsed = parse_transactions([line])
 
-                if quantity < 0 or unit_price < 0:
-                    invalid_records += 1
-                    continue
+            if not parsed:
+                invalid_records += 1
+                rejected['malformed'] += 1
+                continue
 
-                valid_records.append(fields)
+            failed = DEFAULT_VALIDATOR.check(parsed[0])
 
-            except Exception:
+            if failed >= 0:
                 invalid_records += 1
+                rejected[rules[failed].name] += 1
+                continue
+
+            valid_records.append(line.split('|'))
 
     print(f"Total records parsed: {total_records}")
     print(f"Invalid records removed: {invalid_records}")
     print(f"Valid records after cleaning: {len(valid_records)}")
 
+    for name, count in rejected.items():
+        if count:
+            print(f"  {name}: {count}")
 
-if __name__ == "__main__":
-    clean_transactions("transactions.txt")
-
-# Report generator
-from Utils.data_processor import load_transactions
-from Utils.api_handler import fetch_all_products, create_product_mapping, enrich_sales_data
-from Utils.report_generator import generate_sales_report
-
-
-def main():
-    transactions = load_transactions("Transactions.txt")
-    print("Transactions loaded:", len(transactions))
-    print(transactions[:3])
-
-
-    api_products = fetch_all_products()
-    product_mapping = create_product_mapping(api_products)
-
-    enriched_transactions = enrich_sales_data(transactions, product_mapping)
-
-    generate_sales_report(transactions, enriched_transactions)
-
-
-if __name__ == "__main__":
-    main()
 
 # Main Script
 import os
 import pandas as pd
-from datetime import datetime
-import requests  # for API
-from collections import defaultdict
-
-# Assume prior functions exist: validate_transactions, analyze_sales, fetch_products_api, enrich_sales_data
-# Stub if missing
-
-def validate_transactions(transactions):
-    # Stub: return valid_df, invalid_count
-    return transactions, 0
-
-def analyze_sales(transactions):
-    # Stub
-    pass
-
-def fetch_products_api():
-    # Stub: mock API response
-    return pd.DataFrame({'product_name': [], 'category': []})
 
-def enrich_sales_data(transactions, products):
-    # Stub
+from utils.apihandler import CATALOG_TTL, enrich_sales_data, referenced_product_ids, save_enriched_data
+from utils.asyncenrichment import close_enrichment_service, get_enrichment_service
+from utils.dataprocessor import analyze
+from utils.filehandler import read_sales_data, validate_and_filter
+from utils.pipeline import Pipeline, Stage
+from utils.profiler import Profiler
+
+SALES_FILE = 'data/Sales_data.txt'
+ENRICHED_FILE = 'data/enriched_sales_data.txt'
+REPORT_FILE = 'output/sales_report.txt'
+PROFILE_FILE = 'output/run_profile.json'   # per-stage time, memory and row counts
+
+# -------- PIPELINE STAGES --------
+# Each stage takes the results of the stages it depends on (see build_pipeline)
+
+def read_stage(filename):
+    raw_lines = read_sales_data(filename)
+    print(f"✓ Successfully read {len(raw_lines)} lines\n")
+    return raw_lines
+
+def parse_stage(raw_lines):
+    transactions = parse_transactions(raw_lines)
+    print(f"✓ Parsed {len(transactions)} records\n")
     return transactions
 
+def validate_stage(transactions):
+    valid, invalid_count, summary = validate_and_filter(transactions)
+    print(f"✓ Valid: {len(valid)} | Invalid: {invalid_count}\n")
+    return valid
+
+def prefetch_stage(transactions):
+    # Product lookups run in the background while filtering and analysis do.
+    # Never cached: a cached validate result must still start them
+    get_enrichment_service().prefetch_transactions(transactions)
+
+def filter_stage(transactions, region=None, min_amount=None, max_amount=None):
+    if region is None and min_amount is None and max_amount is None:
+        print("✓ No filter applied\n")
+        return transactions
+
+    # Indexed once; each slice is a bitmap intersection, not a rescan
+    index = TransactionIndex(transactions, hash_fields=('Region',), sorted_fields=('Amount',))
+    amount = None if min_amount is None and max_amount is None else (min_amount, max_amount)
+    filtered = index.filter(Region=region, Amount=amount)
+    print(f"✓ Filtered to {len(filtered)} records\n")
+    return filtered
+
+def analyze_stage(transactions):
+    # The cube serves the peak day and the monthly trend without rescanning
+    engine = analyze(transactions, cube=True)
+    analysis = {
+        'total_revenue': engine.calculate_total_revenue(),
+        'regions': engine.region_wise_sales(),
+        'top_products': engine.top_selling_products(5),
+        'peak_day': engine.find_peak_sales_day(),
+        'monthly_trend': engine.rollup('month')
+    }
+    print(f"✓ Analysis complete: total revenue ₹{analysis['total_revenue']:,.2f}\n")
+    return analysis
+
+def fetch_stage(transactions):
+    # Waits only for lookups still in flight; validate_stage started them
+    product_mapping = get_enrichment_service().product_mapping(referenced_product_ids(transactions))
+    print(f"✓ Fetched {len(product_mapping)} products\n")
+    return product_mapping
+
+def enrich_stage(transactions, product_mapping):
+    enriched = enrich_sales_data(transactions, product_mapping)
+    matched = sum(1 for t in enriched if t['API_Match'])
+    success_rate = matched / len(enriched) * 100 if enriched else 0
+    print(f"✓ Enriched {matched}/{len(enriched)} transactions ({success_rate:.1f}%)\n")
+    return enriched
+
+def save_stage(enriched, filename):
+    count = save_enriched_data(enriched, filename)
+    print(f"✓ Saved {count} rows to: {filename}\n")
+    return count
+
+REPORT_COLUMNS = {
+    'TransactionID': 'transaction_id', 'Date': 'date', 'ProductID': 'product_id',
+    'ProductName': 'product_name', 'Quantity': 'quantity', 'UnitPrice': 'unit_price',
+    'CustomerID': 'customer_id', 'Region': 'region'
+}
+
+def report_frame(transactions):
+    """
+    Transactions as the DataFrame generate_sales_report expects
+    """
+    df = pd.DataFrame(list(transactions), columns=list(REPORT_COLUMNS)).rename(columns=REPORT_COLUMNS)
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+    df['amount'] = df['quantity'] * df['unit_price']
+    return df
+
+def report_stage(transactions, enriched, output_file):
+    matched = [t for t in enriched if t['API_Match']]
+    generate_sales_report(report_frame(transactions), report_frame(matched), output_file)
+    print(f"✓ Report saved to: {output_file}\n")
+    return output_file
+
+def build_pipeline(sales_file=SALES_FILE, region=None, min_amount=None, max_amount=None, profiler=None):
+    """
+    The analytics run as a DAG (each stage's fingerprint covers the project
+    code it reaches, see utils/pipeline.py code_dependencies):
+      read -> parse -> validate -> filter -> analyze
+      filter -> fetch (API, refreshed after CATALOG_TTL) -> enrich -> save
+      filter + enrich -> report
+    prefetch (validate ->, rerun every time) starts the product lookups on
+    the shared EnrichmentService, and fetch waits for the ones the filtered
+    transactions need
+    """
+    return Pipeline([
+        Stage('read', read_stage, params={'filename': sales_file}, files=(sales_file,),
+              description="Reading sales data"),
+        Stage('parse', parse_stage, inputs=('read',), description="Parsing and cleaning data"),
+        Stage('validate', validate_stage, inputs=('parse',), description="Validating transactions"),
+        Stage('prefetch', prefetch_stage, inputs=('validate',), cacheable=lambda _: False,
+              description="Starting product lookups"),
+        Stage('filter', filter_stage, inputs=('validate',),
+              params={'region': region, 'min_amount': min_amount, 'max_amount': max_amount},
+              description="Applying filters"),
+        Stage('analyze', analyze_stage, inputs=('filter',), description="Analyzing sales data"),
+        Stage('fetch', fetch_stage, inputs=('filter',), max_age=CATALOG_TTL, cacheable=bool,
+              description="Fetching product data from API"),
+        Stage('enrich', enrich_stage, inputs=('filter', 'fetch'), description="Enriching sales data"),
+        Stage('save', save_stage, inputs=('enrich',), params={'filename': ENRICHED_FILE},
+              outputs=(ENRICHED_FILE,), description="Saving enriched data"),
+        Stage('report', report_stage, inputs=('filter', 'enrich'), params={'output_file': REPORT_FILE},
+              outputs=(REPORT_FILE,), description="Generating report"),
+    ], profiler=profiler)
+
 def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt'):
     import os
     from datetime import datetime
-    from collections import defaultdict
-
-    def format_currency(amount):
-        return f"₹{amount:,.2f}"
-
-    def format_percentage(pct):
-        return f"{pct:.2f}%"
 
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
@@ -124,165 +202,131 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
 
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    # One grouped pass; region and customer sections roll up from it
+    totals = grouped_totals(transactions) if 'amount' in transactions.columns else None
+
+    sections = [
+        "=" * 44 + "\n" +
+        "        SALES ANALYTICS REPORT\n" +
+        f"     Generated: {now}\n" +
+        f"     Records Processed: {total_records}\n" +
+        "=" * 44 + "\n\n",
+        render_section(
+            "OVERALL SUMMARY",
+            f"Total Revenue:        {format_currency(total_revenue)}\n"
+            f"Total Transactions:   {total_transactions}\n"
+            f"Average Order Value:  {format_currency(avg_order_value)}\n"
+            f"Date Range:           {date_range}\n"
+        )
+    ]
+
+    # REGION
+    if 'region' in transactions.columns:
+        region_stats = rollup(totals, 'region')
+        region_stats['sales'] = region_stats['amount'].round(2)
+        region_stats['pct'] = (region_stats['sales'] / total_revenue * 100).round(2) if total_revenue else 0
+        region_stats = region_stats.sort_values('sales', ascending=False)
+
+        sections.append(render_section(
+            "REGION-WISE PERFORMANCE",
+            render_rows(
+                "{:10} {:<12} {:<10} {:<12}",
+                region_stats['region'],
+                region_stats['sales'].map(format_currency),
+                region_stats['pct'].map(format_percentage),
+                region_stats['dated']
+            )
+        ))
+
+    # TOP PRODUCTS (from enriched)
+    try:
+        if hasattr(enriched_transactions, 'groupby') and 'product_name' in enriched_transactions.columns:
+            prod = enriched_transactions.groupby('product_name').agg({'quantity': 'sum', 'amount': 'sum'}).round(2).reset_index()
+            prod = prod.nlargest(5, 'amount')
+            sections.append(render_section(
+                "TOP 5 PRODUCTS",
+                render_rows(
+                    "{:20} {:>6} {:>12}",
+                    prod['product_name'].str[:20],
+                    prod['quantity'].astype(int),
+                    prod['amount'].map(format_currency)
+                )
+            ))
+    except Exception:
+        pass
+
+    # TOP CUSTOMERS
+    try:
+        if 'customer_id' in transactions.columns:
+            cust = rollup(totals, 'customer_id')
+            cust['total_spent'] = cust['amount'].round(2)
+            cust = cust.nlargest(5, 'total_spent')
+            sections.append(render_section(
+                "TOP 5 CUSTOMERS",
+                render_rows(
+                    "{:12} {:>12} {:>6}",
+                    cust['customer_id'].astype(str),
+                    cust['total_spent'].map(format_currency),
+                    cust['dated']
+                )
+            ))
+    except Exception:
+        pass
+
+    # API ENRICHMENT SUMMARY (best-effort)
+    try:
+        enriched_count = len(enriched_transactions) if hasattr(enriched_transactions, '__len__') else 0
+        success_rate = (enriched_count / total_records * 100) if total_records else 0
+        sections.append(
+            "API ENRICHMENT SUMMARY\n" +
+            "-" * 44 + "\n" +
+            f"Products Enriched: {enriched_count}\n"
+            f"Success Rate: {success_rate:.2f}%\n"
+        )
+    except Exception:
+        pass
+
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("=" * 44 + "\n")
-        f.write("        SALES ANALYTICS REPORT\n")
-        f.write(f"     Generated: {now}\n")
-        f.write(f"     Records Processed: {total_records}\n")
-        f.write("=" * 44 + "\n\n")
-
-        f.write("OVERALL SUMMARY\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"Total Revenue:        {format_currency(total_revenue)}\n")
-        f.write(f"Total Transactions:   {total_transactions}\n")
-        f.write(f"Average Order Value:  {format_currency(avg_order_value)}\n")
-        f.write(f"Date Range:           {date_range}\n\n")
-
-        # REGION
-        if 'region' in transactions.columns:
-            region_stats = transactions.groupby('region').agg({'amount': 'sum', 'date': 'count'}).round(2).reset_index()
-            region_stats.columns = ['region', 'sales', 'transactions']
-            region_stats['pct'] = (region_stats['sales'] / total_revenue * 100).round(2) if total_revenue else 0
-            region_stats = region_stats.sort_values('sales', ascending=False)
-
-            f.write("REGION-WISE PERFORMANCE\n")
-            f.write("-" * 44 + "\n")
-            for _, row in region_stats.iterrows():
-                f.write(f"{row['region']:10} {format_currency(row['sales']):<12} {format_percentage(row['pct']):<10} {int(row['transactions']):<12}\n")
-            f.write("\n")
-
-        # TOP PRODUCTS (from enriched)
-        try:
-            if hasattr(enriched_transactions, 'groupby') and 'product_name' in enriched_transactions.columns:
-                prod = enriched_transactions.groupby('product_name').agg({'quantity': 'sum', 'amount': 'sum'}).round(2).reset_index()
-                prod = prod.sort_values('amount', ascending=False).head(5)
-                f.write("TOP 5 PRODUCTS\n")
-                f.write("-" * 44 + "\n")
-                for i, row in prod.iterrows():
-                    f.write(f"{row['product_name'][:20]:20} {int(row['quantity']):>6} {format_currency(row['amount']):>12}\n")
-                f.write("\n")
-        except Exception:
-            pass
-
-        # TOP CUSTOMERS
-        try:
-            if 'customer_id' in transactions.columns:
-                cust = transactions.groupby('customer_id').agg({'amount': 'sum', 'date': 'count'}).round(2).reset_index()
-                cust.columns = ['customer_id', 'total_spent', 'order_count']
-                cust = cust.sort_values('total_spent', ascending=False).head(5)
-                f.write("TOP 5 CUSTOMERS\n")
-                f.write("-" * 44 + "\n")
-                for _, row in cust.iterrows():
-                    f.write(f"{str(row['customer_id']):12} {format_currency(row['total_spent']):>12} {int(row['order_count']):>6}\n")
-                f.write("\n")
-        except Exception:
-            pass
-
-        # API ENRICHMENT SUMMARY (best-effort)
-        try:
-            enriched_count = len(enriched_transactions) if hasattr(enriched_transactions, '__len__') else 0
-            success_rate = (enriched_count / total_records * 100) if total_records else 0
-            f.write("API ENRICHMENT SUMMARY\n")
-            f.write("-" * 44 + "\n")
-            f.write(f"Products Enriched: {enriched_count}\n")
-            f.write(f"Success Rate: {success_rate:.2f}%\n")
-        except Exception:
-            pass
+        for section in sections:
+            f.write(section)
 
     print(f"Sales report generated at {output_file}")
 
-def main():
+def main(region=None, min_amount=None, max_amount=None, force=(), trace_memory=True):
+    """
+    Runs the analytics pipeline; stages whose code, parameters and input
+    data are unchanged since the last run are served from data/pipeline_cache
+    force names stages to rerun anyway (e.g. force=('fetch',))
+    Each stage's wall / CPU time, memory peak and row counts go to PROFILE_FILE
+    """
     try:
         print("=" * 47)
         print("      SALES ANALYTICS SYSTEM")
         print("=" * 47)
         print()
 
-        # 1. Read sales data (try CSV, fall back to Transactions.txt)
-        print("[1/10] Reading sales data...")
+        profiler = Profiler(trace_memory=trace_memory)
+        pipeline = build_pipeline(SALES_FILE, region, min_amount, max_amount, profiler)
+
         try:
-            df = pd.read_csv('data/transactions.csv', encoding='utf-8')
-            print(f"✓ Successfully read {len(df)} transactions\n")
-        except FileNotFoundError:
-            from Utils.data_processor import load_transactions
-            tx = load_transactions("Transactions.txt")
-            df = pd.DataFrame(tx)
-            # normalize column expected by downstream code
-            if 'total_amount' in df.columns and 'amount' not in df.columns:
-                df['amount'] = df['total_amount']
-            print(f"✓ Loaded {len(df)} transactions from Transactions.txt\n")
-
-        # 2. Parse/clean (already done by pandas)
-        print("[2/10] Parsing and cleaning data...")
-        # Basic cleaning
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['amount'])
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        print(f"✓ Parsed {len(df)} records\n")
-
-        # 3. Filter options
-        print("[3/10] Filter Options Available:")
-        regions = df['region'].unique()
-        print(f"Regions: {', '.join(regions)}")
-        min_amt, max_amt = df['amount'].min(), df['amount'].max()
-        print(f"Amount Range: ₹{min_amt:,.0f} - ₹{max_amt:,.0f}")
-        
-        # Non-interactive default: do not filter
-        filter_choice = 'n'
-        if filter_choice == 'y':
-            region_filter = input("Enter region (or 'all'): ").strip()
-            if region_filter != 'all':
-                df = df[df['region'] == region_filter]
-            min_filter = float(input("Min amount: "))
-            max_filter = float(input("Max amount: "))
-            df = df[(df['amount'] >= min_filter) & (df['amount'] <= max_filter)]
-            print(f"✓ Filtered to {len(df)} records\n")
-        else:
-            print("✓ No filter applied\n")
-
-        # 4. Validate
-        print("[4/10] Validating transactions...")
-        valid_df, invalid_count = validate_transactions(df)
-        print(f"✓ Valid: {len(valid_df)} | Invalid: {invalid_count}\n")
-        df = valid_df
-
-        # 5. Analyze
-        print("[5/10] Analyzing sales data...")
-        analyze_sales(df)
-        print("✓ Analysis complete\n")
-
-        # 6. API
-        print("[6/10] Fetching product data from API...")
-        products = fetch_products_api()
-        print(f"✓ Fetched {len(products)} products\n")
-
-        # 7. Enrich
-        print("[7/10] Enriching sales data...")
-        enriched = enrich_sales_data(df, products)
-        success_rate = len(enriched) / len(df) * 100 if len(df) > 0 else 0
-        print(f"✓ Enriched {len(enriched)}/{len(df)} transactions ({success_rate:.1f}%)\n")
-
-        # 8. Save enriched
-        os.makedirs('data', exist_ok=True)
-        enriched.to_csv('data/enriched_sales_data.csv', index=False)
-        print("✓ Saved to: data/enriched_sales_data.csv\n")
-
-        # 9. Generate report
-        print("[9/10] Generating report...")
-        generate_sales_report(df, enriched)
-        print("✓ Report saved to: output/sales_report.txt\n")
-
-        print("[10/10] Process Complete!")
+            status = pipeline.run(force=force)
+        finally:
+            profiler.stop()
+            close_enrichment_service()
+
+        ran = [name for name, state in status.items() if state == 'ran']
+        print(f"Process Complete! Ran: {', '.join(ran) if ran else 'nothing (all cached)'}")
+        print()
+        print(profiler.summary())
+        print(f"✓ Run profile saved to: {profiler.write(PROFILE_FILE)}")
         print("=" * 47)
 
     except FileNotFoundError as e:
         print(f"❌ Error: File not found - {e}")
-        print("Ensure data/transactions.csv exists.")
+        print(f"Ensure {SALES_FILE} exists.")
     except Exception as e:
         print(f"❌ Unexpected error: {str(e)}")
         print("Check data format and try again.")
 
 if __name__ == "__main__":
     main()
-
-
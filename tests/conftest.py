@@ -0,0 +1,19 @@
+import pytest
+
+from benchmarks.salesdatagenerator import generate_sales_file
+from utils.filehandler import parse_transactions, read_sales_data
+
+SAMPLE_ROWS = 3000
+
+
+@pytest.fixture(scope='session')
+def sales_file(tmp_path_factory):
+    """
+    Synthetic sales file with the same mix of invalid rows as Sales_data.txt
+    """
+    return generate_sales_file(str(tmp_path_factory.mktemp('sales') / 'sales.txt'), SAMPLE_ROWS, days=60)
+
+
+@pytest.fixture(scope='session')
+def sales_rows(sales_file):
+    return parse_transactions(read_sales_data(sales_file))
@@ -0,0 +1,244 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils import analyticsserver, dataprocessor
+from utils.analyticsserver import AnalyticsService, make_server
+from utils.filehandler import parse_transactions
+
+HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region\n'
+
+LINES = [
+    'T001|2024-12-01|P101|Laptop|2|45,000|C001|North',
+    'T002|2024-12-01|P102|Mouse,Wireless|5|500|C002|South',
+    'T003|2024-12-02|P103|Keyboard|1|2400|C001|East',
+    'X004|2024-12-02|P103|Keyboard|1|2400|C003|East',
+    'T005|2024-12-03|P104|Monitor|3|14,000|C003|North',
+    'T006|2024-12-03|P102|Mouse|0|500|C002|West',
+]
+
+NEW_LINE = 'T007|2024-12-04|P105|Webcam|4|3000|C004|West'
+
+
+def write(path, text, mode='w'):
+    with open(path, mode, encoding='latin-1', newline='') as f:
+        f.write(text)
+
+
+def valid(lines):
+    return [t for t in parse_transactions(lines) if t['TransactionID'].startswith('T') and t['Quantity'] > 0]
+
+
+def roundtrip(value):
+    return json.loads(json.dumps(value))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write(tmp_path / 'sales.txt', HEADER + '\n'.join(LINES) + '\n')
+    write(tmp_path / 'notes.txt', 'not a sales file\n')
+    return tmp_path
+
+
+def test_queries_match_dataprocessor(data_dir):
+    service = AnalyticsService(str(data_dir))
+    transactions = valid(LINES)
+
+    assert service.health()['rows'] == 4
+    assert service.query('revenue') == dataprocessor.calculate_total_revenue(transactions)
+    assert service.query('regions') == roundtrip(dataprocessor.region_wise_sales(transactions))
+    assert service.query('top_products', {'n': '2'}) == roundtrip(dataprocessor.top_selling_products(transactions, 2))
+    assert service.query('daily_trend') == roundtrip(dataprocessor.daily_sales_trend(transactions))
+
+    north = [t for t in transactions if t['Region'] == 'North']
+    assert service.query('customers', {'region': 'North'}) == roundtrip(dataprocessor.customer_analysis(north))
+
+    large = [t for t in transactions if t['Quantity'] * t['UnitPrice'] >= 10000]
+    assert service.query('revenue', {'min_amount': '10000'}) == dataprocessor.calculate_total_revenue(large)
+
+
+def test_customers_have_one_shape_with_or_without_n(data_dir):
+    service = AnalyticsService(str(data_dir))
+
+    everyone = service.query('customers')
+    best = service.query('customers', {'n': '1'})
+
+    assert isinstance(everyone, dict) and isinstance(best, dict)
+    assert best == dict(list(everyone.items())[:1])
+
+
+def test_repeated_queries_hit_the_cache(data_dir):
+    service = AnalyticsService(str(data_dir))
+
+    service.query('regions', {'region': 'North,East'})
+    service.query('regions', {'region': 'North,East'})
+
+    assert service.stats['cache_hits'] == 1
+
+
+def test_reload_folds_in_appended_rows_but_not_a_partial_line(data_dir):
+    service = AnalyticsService(str(data_dir))
+    version = service.snapshot.version
+
+    write(data_dir / 'sales.txt', NEW_LINE[:-2], 'a')
+    assert service.reload() == 0
+    assert 'We' not in service.query('regions')
+
+    write(data_dir / 'sales.txt', NEW_LINE[-2:] + '\n', 'a')
+    assert service.reload() == 1
+    assert service.snapshot.version > version
+    assert service.query('regions')['West']['transaction_count'] == 1
+    assert service.query('revenue') == dataprocessor.calculate_total_revenue(valid(LINES + [NEW_LINE]))
+
+
+def test_appends_extend_the_dataset_without_rebuilding_it(data_dir, monkeypatch):
+    service = AnalyticsService(str(data_dir))
+    snapshot = service.snapshot
+
+    def rebuilt(*args, **kwargs):
+        raise AssertionError('an append rebuilt the dataset')
+
+    monkeypatch.setattr(analyticsserver.AnalyticsEngine, 'from_state', rebuilt)
+    monkeypatch.setattr(analyticsserver.TransactionTable, 'concat', rebuilt)
+    monkeypatch.setattr(analyticsserver, 'TransactionIndex', rebuilt)
+
+    lines = list(LINES)
+    for number in range(8, 12):
+        line = f'T{number:03d}|2024-12-0{number - 4}|P101|Laptop|1|45,000|C00{number % 3}|West'
+        write(data_dir / 'sales.txt', line + '\n', 'a')
+        lines.append(line)
+        assert service.reload() == 1
+
+    assert service.snapshot is snapshot
+    transactions = valid(lines)
+    west = [t for t in transactions if t['Region'] == 'West']
+
+    assert service.health()['rows'] == len(transactions)
+    assert service.query('regions') == roundtrip(dataprocessor.region_wise_sales(transactions))
+    assert service.query('customers', {'region': 'West'}) == roundtrip(dataprocessor.customer_analysis(west))
+
+
+def test_concurrent_queries_are_all_counted(data_dir):
+    service = AnalyticsService(str(data_dir))
+
+    def ask():
+        for _ in range(200):
+            service.query('revenue')
+
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service.stats['queries'] == 800
+    assert service.stats['cache_hits'] >= 800 - len(threads)
+
+
+def test_new_files_are_picked_up(data_dir):
+    service = AnalyticsService(str(data_dir))
+
+    write(data_dir / 'more.txt', HEADER + NEW_LINE + '\n')
+
+    assert service.reload() == 1
+    assert service.health()['rows'] == 5
+
+
+def test_file_rewritten_in_place_is_rebuilt(data_dir):
+    service = AnalyticsService(str(data_dir))
+
+    # Same size, different rows: not an append
+    rewritten = [line.replace('North', 'Nerth') for line in LINES]
+    write(data_dir / 'sales.txt', HEADER + '\n'.join(rewritten) + '\n')
+
+    service.reload()
+
+    regions = service.query('regions')
+    assert 'North' not in regions and 'Nerth' in regions
+    assert service.health()['rows'] == 4
+
+
+def test_emptied_or_deleted_file_is_rebuilt(data_dir):
+    service = AnalyticsService(str(data_dir))
+    write(data_dir / 'more.txt', HEADER + NEW_LINE + '\n')
+    service.reload()
+
+    write(data_dir / 'more.txt', '')
+    service.reload()
+    assert service.health()['rows'] == 4
+
+    write(data_dir / 'more.txt', HEADER + NEW_LINE + '\n')
+    service.reload()
+    (data_dir / 'more.txt').unlink()
+    service.reload()
+    assert service.health()['rows'] == 4
+
+
+def test_query_errors(data_dir):
+    service = AnalyticsService(str(data_dir))
+
+    with pytest.raises(KeyError):
+        service.query('nope')
+    with pytest.raises(ValueError):
+        service.query('revenue', {'n': '3'})
+    with pytest.raises(ValueError):
+        service.query('revenue', {'min_amount': 'lots'})
+
+
+@pytest.fixture
+def server(data_dir):
+    service = AnalyticsService(str(data_dir))
+    httpd = make_server(service, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    yield service, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(url, method='GET'):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method=method)) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_http_routes(server):
+    service, base = server
+
+    assert request(base + '/health')[1]['rows'] == 4
+    assert 'customers' in request(base + '/analyses')[1]
+
+    status, body = request(base + '/query/top_products?region=North&n=1')
+    assert status == 200
+    assert body == {'analysis': 'top_products', 'result': [['Monitor', 3, 42000.0]]}
+
+    assert request(base + '/query/nope')[0] == 404
+    assert request(base + '/query/revenue?bogus=1')[0] == 400
+    assert request(base + '/elsewhere')[0] == 404
+
+
+def test_http_reload(server, data_dir):
+    service, base = server
+
+    write(data_dir / 'sales.txt', NEW_LINE + '\n', 'a')
+
+    status, body = request(base + '/reload', 'POST')
+    assert status == 200 and body['added_rows'] == 1
+    assert request(base + '/elsewhere', 'POST')[0] == 404
+
+
+def test_http_reload_failure_is_reported(server, monkeypatch):
+    service, base = server
+
+    def fail():
+        raise OSError('disk gone')
+
+    monkeypatch.setattr(service, 'reload', fail)
+
+    assert request(base + '/reload', 'POST') == (500, {'error': 'disk gone'})
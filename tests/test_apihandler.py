@@ -0,0 +1,226 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from utils import apihandler
+
+
+class StubProducts(BaseHTTPRequestHandler):
+    """
+    /products?limit=&skip=: `total` products, at most `cap` per page
+    Pages whose skip is in `failures` answer 503 that many times first;
+    pages whose skip is in `short` return only half their products;
+    a request carrying the current ETag gets 304
+    """
+    total = 95
+    cap = 30
+    failures = {}
+    short = set()
+    etag = '"v1"'
+    lock = threading.Lock()
+    requests = []
+
+    def do_GET(self):
+        cls = type(self)
+        query = {key: int(values[0]) for key, values in parse_qs(urlparse(self.path).query).items()}
+        limit, skip = min(query.get('limit', 30), cls.cap), query.get('skip', 0)
+
+        with cls.lock:
+            cls.requests.append((skip, limit))
+            cls.conditional.append((self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')))
+            failing = cls.failures.get(skip, 0)
+            if failing:
+                cls.failures[skip] = failing - 1
+
+        if failing:
+            self.send_json(503, {'message': 'busy'})
+            return
+
+        if self.headers.get('If-None-Match') == cls.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        if skip in cls.short:
+            limit = max(1, limit // 2)
+
+        ids = range(skip + 1, min(skip + limit, cls.total) + 1)
+        self.send_json(200, {'products': [{'id': i, 'title': f"Product {i}", 'price': i} for i in ids],
+                             'total': cls.total, 'skip': skip, 'limit': len(ids)})
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('ETag', type(self).etag)
+        self.send_header('Last-Modified', 'Sun, 01 Dec 2024 00:00:00 GMT')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def products_api(monkeypatch):
+    monkeypatch.setattr(apihandler, 'RETRY_BACKOFF', 0)
+    handler = type('Handler', (StubProducts,), {'failures': {}, 'short': set(), 'requests': [],
+                                                'conditional': [], 'lock': threading.Lock()})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield handler, f"http://127.0.0.1:{server.server_address[1]}/products"
+
+    server.shutdown()
+    server.server_close()
+
+
+def transaction(number, product_id):
+    return {
+        'TransactionID': f"T{number:03d}", 'Date': '2024-12-01', 'ProductID': product_id,
+        'ProductName': 'Laptop', 'Quantity': 1, 'UnitPrice': 10.0, 'CustomerID': 'C001', 'Region': 'North'
+    }
+
+
+def test_enrich_sales_data_accepts_a_generator(monkeypatch):
+    requested = []
+
+    def fake_fetch(product_ids, **kwargs):
+        requested.append(set(product_ids))
+        return [{'id': 101, 'title': 'Laptop', 'category': 'laptops', 'brand': 'Acme', 'rating': 4.5}]
+
+    monkeypatch.setattr(apihandler, 'fetch_products_by_id', fake_fetch)
+
+    rows = (transaction(i, product_id) for i, product_id in enumerate(['P101', 'P102', 'P101']))
+    enriched = apihandler.enrich_sales_data(rows)
+
+    assert requested == [{101, 102}]
+    assert [t['API_Match'] for t in enriched] == [True, False, True]
+    assert enriched[0]['API_Brand'] == 'Acme'
+
+
+def test_pages_step_by_what_the_server_returns(products_api):
+    handler, url = products_api
+
+    products = apihandler.fetch_all_products(url, cache_file=None, page_size=50)
+
+    # The server caps pages at 30, not the 50 asked for
+    assert [p['id'] for p in products] == list(range(1, 96))
+    assert sorted(skip for skip, _ in handler.requests) == [0, 30, 60, 90]
+
+
+def test_short_pages_are_completed(products_api):
+    handler, url = products_api
+    handler.short = {30}
+
+    products = apihandler.fetch_all_products(url, cache_file=None)
+
+    assert [p['id'] for p in products] == list(range(1, 96))
+    assert (45, 15) in handler.requests
+
+
+def test_failed_pages_are_retried(products_api):
+    handler, url = products_api
+    handler.failures = {0: 1, 60: 2}
+    metrics = []
+
+    products = apihandler.fetch_all_products(url, cache_file=None, metrics=metrics)
+
+    assert [p['id'] for p in products] == list(range(1, 96))
+    assert sorted(m['attempts'] for m in metrics) == [1, 1, 2, 3]
+
+
+def test_fresh_catalog_cache_is_served_without_a_request(products_api, tmp_path):
+    handler, url = products_api
+    cache_file = str(tmp_path / 'catalog.json')
+
+    fetched = apihandler.fetch_all_products(url, cache_file=cache_file)
+    handler.requests.clear()
+
+    assert apihandler.fetch_all_products(url, cache_file=cache_file) == fetched
+    assert handler.requests == []
+    assert apihandler.load_catalog_cache(url, cache_file)['etag'] == '"v1"'
+
+
+def test_stale_catalog_cache_is_revalidated(products_api, tmp_path):
+    handler, url = products_api
+    cache_file = str(tmp_path / 'catalog.json')
+    fetched = apihandler.fetch_all_products(url, cache_file=cache_file)
+    handler.requests.clear()
+    handler.conditional.clear()
+
+    # Past the TTL: one conditional request, answered 304
+    assert apihandler.fetch_all_products(url, cache_file=cache_file, ttl=0) == fetched
+    assert handler.conditional == [('"v1"', 'Sun, 01 Dec 2024 00:00:00 GMT')]
+
+    # The 304 renewed the cache entry
+    handler.requests.clear()
+    apihandler.fetch_all_products(url, cache_file=cache_file)
+    assert handler.requests == []
+
+
+def test_stale_catalog_cache_is_served_when_the_api_fails(products_api, tmp_path, capsys):
+    handler, url = products_api
+    cache_file = str(tmp_path / 'catalog.json')
+    fetched = apihandler.fetch_all_products(url, cache_file=cache_file)
+
+    handler.failures = {0: apihandler.REQUEST_RETRIES}
+
+    assert apihandler.fetch_all_products(url, cache_file=cache_file, ttl=0) == fetched
+    assert 'Using stale cached catalog (95 products)' in capsys.readouterr().out
+
+    # Without a cached copy there is nothing to fall back to
+    handler.failures = {0: apihandler.REQUEST_RETRIES}
+    assert apihandler.fetch_all_products(url, cache_file=None) == []
+
+
+ENRICHED = {
+    101: {'id': 101, 'title': 'Laptop', 'category': 'laptops', 'brand': 'Acme', 'rating': 4.5},
+}
+
+
+def test_enrichment_does_not_write_the_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    enriched = apihandler.enrich_sales_data([transaction(1, 'P101')], ENRICHED)
+
+    assert enriched[0]['API_Category'] == 'laptops'
+    assert not (tmp_path / 'data').exists()
+
+
+def test_saved_rows_stream_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(apihandler, 'WRITE_BLOCK_ROWS', 2)
+    filename = str(tmp_path / 'enriched.txt')
+    product_ids = ['P101', 'P102', 'P101', 'P101', 'P999']
+
+    rows = apihandler.iter_enriched((transaction(i, p) for i, p in enumerate(product_ids)), ENRICHED)
+    assert apihandler.save_enriched_data(rows, filename) == 5
+
+    with open(filename, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    assert lines[0] == '|'.join(apihandler.ENRICHED_HEADER)
+    assert lines[1] == 'T000|2024-12-01|P101|Laptop|1|10.0|C001|North|laptops|Acme|4.5|True'
+    assert lines[2] == 'T001|2024-12-01|P102|Laptop|1|10.0|C001|North||||False'
+    assert len(lines) == 6
+    assert not (tmp_path / 'enriched.txt.tmp').exists()
+
+
+def test_failed_save_keeps_the_previous_file(tmp_path):
+    filename = str(tmp_path / 'enriched.txt')
+    apihandler.save_enriched_data([], filename)
+
+    def failing():
+        yield apihandler.enrich_sales_data([transaction(1, 'P101')], ENRICHED)[0]
+        raise RuntimeError('enrichment failed')
+
+    with pytest.raises(RuntimeError):
+        apihandler.save_enriched_data(failing(), filename)
+
+    with open(filename, encoding='utf-8') as f:
+        assert f.read() == '|'.join(apihandler.ENRICHED_HEADER) + '\n'
+    assert not (tmp_path / 'enriched.txt.tmp').exists()
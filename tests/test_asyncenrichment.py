@@ -0,0 +1,211 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import apihandler
+from utils.asyncenrichment import AsyncProductClient, EnrichmentService
+
+MISSING_FROM = 900   # stub product IDs from here on do not exist
+
+
+class StubCatalog(BaseHTTPRequestHandler):
+    """
+    /products/<id>: a product after `delay` seconds, 404 for unknown IDs
+    Counts requests and the most served at once
+    """
+    delay = 0.0
+    lock = threading.Lock()
+    requests = []
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        product_id = int(self.path.rsplit('/', 1)[-1])
+
+        with cls.lock:
+            cls.requests.append(product_id)
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+
+        try:
+            time.sleep(cls.delay)
+
+            if product_id >= MISSING_FROM:
+                body, status = {'message': 'not found'}, 404
+            else:
+                body, status = {'id': product_id, 'title': f"Product {product_id}", 'category': 'laptops',
+                                'brand': 'Acme', 'price': 10, 'rating': 4.5}, 200
+
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def catalog():
+    handler = type('Handler', (StubCatalog,), {'requests': [], 'active': 0, 'peak': 0, 'delay': 0.0,
+                                               'lock': threading.Lock()})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield handler, f"http://127.0.0.1:{server.server_address[1]}/products"
+
+    server.shutdown()
+    server.server_close()
+
+
+def client(url, **options):
+    options.setdefault('cache_file', None)
+    return AsyncProductClient(url, use_aiohttp=False, **options)
+
+
+def test_concurrent_lookups_of_one_id_share_a_request(catalog):
+    handler, url = catalog
+    handler.delay = 0.2
+    lookups = client(url)
+
+    async def run():
+        try:
+            return await asyncio.gather(*[lookups.get(101) for _ in range(10)])
+        finally:
+            await lookups.close()
+
+    products = asyncio.run(run())
+
+    assert handler.requests == [101]
+    assert all(product['title'] == 'Product 101' for product in products)
+    assert lookups.stats['coalesced'] == 9
+
+
+def test_requests_in_flight_never_exceed_max_concurrency(catalog):
+    handler, url = catalog
+    handler.delay = 0.1
+    lookups = client(url, max_concurrency=3)
+
+    async def run():
+        try:
+            return await lookups.get_many(range(1, 13))
+        finally:
+            await lookups.close()
+
+    products = asyncio.run(run())
+
+    assert len(handler.requests) == 12
+    assert all(products.values())
+    assert handler.peak == 3
+
+
+def test_lookup_past_its_deadline_gives_up_but_still_fills_the_cache(catalog):
+    handler, url = catalog
+    handler.delay = 0.5
+    lookups = client(url, deadline=0.05)
+
+    async def run():
+        try:
+            first = await lookups.get(7)
+            await asyncio.sleep(0.7)
+            return first, await lookups.get(7)
+        finally:
+            await lookups.close()
+
+    first, second = asyncio.run(run())
+
+    assert first is None
+    assert lookups.stats['timeouts'] == 1
+    assert second['id'] == 7
+    assert handler.requests == [7]
+
+
+def test_unknown_products_are_cached(catalog, tmp_path):
+    handler, url = catalog
+    cache_file = str(tmp_path / 'product_cache.json')
+
+    async def lookup_twice():
+        lookups = client(url, cache_file=cache_file)
+        try:
+            return await lookups.get(MISSING_FROM), await lookups.get(MISSING_FROM), lookups.stats
+        finally:
+            await lookups.close()
+
+    first, second, stats = asyncio.run(lookup_twice())
+    assert first is None and second is None
+    assert stats['requests'] == 1 and stats['cache_hits'] == 1
+
+    # A new client finds the 404 in the saved cache
+    _, _, stats = asyncio.run(lookup_twice())
+    assert stats['requests'] == 0
+    assert handler.requests == [MISSING_FROM]
+
+
+def test_service_prefetches_in_the_background(catalog):
+    handler, url = catalog
+    handler.delay = 0.2
+
+    with EnrichmentService(url=url, cache_file=None, use_aiohttp=False) as service:
+        started = time.perf_counter()
+        service.prefetch([101, 102, MISSING_FROM])
+        assert time.perf_counter() - started < 0.1
+
+        mapping = service.product_mapping()
+
+    assert sorted(mapping) == [101, 102]
+    assert mapping[101]['category'] == 'laptops'
+
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/products"
+
+
+def test_outage_serves_stale_cache_entries(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(apihandler, 'RETRY_BACKOFF', 0)
+    cache_file = str(tmp_path / 'product_cache.json')
+    old = {'id': 101, 'title': 'Old laptop', 'category': 'laptops', 'brand': 'Acme', 'rating': 4.0}
+    apihandler.save_product_cache({'101': {'fetched_at': 0, 'product': old}}, cache_file)
+
+    with EnrichmentService(url=closed_port_url(), cache_file=cache_file, use_aiohttp=False) as service:
+        mapping = service.product_mapping([101, 102, 103])
+        stats = dict(service.client.stats)
+
+    assert sorted(mapping) == [101]
+    assert mapping[101]['brand'] == 'Acme'
+    assert stats['failures'] == 3 and stats['stale'] == 1
+
+    # One summary line for the whole outage, not one per product
+    warnings = [line for line in capsys.readouterr().out.splitlines() if 'lookups failed' in line]
+    assert len(warnings) == 1 and warnings[0].startswith('Warning: 3 product lookups failed')
+
+
+def test_timed_out_lookup_serves_stale_cache_entry(catalog, tmp_path):
+    handler, url = catalog
+    handler.delay = 0.5
+    cache_file = str(tmp_path / 'product_cache.json')
+    apihandler.save_product_cache({'7': {'fetched_at': 0, 'product': {'id': 7, 'title': 'Old'}}}, cache_file)
+
+    lookups = client(url, deadline=0.05, cache_file=cache_file)
+
+    async def run():
+        try:
+            return await lookups.get(7)
+        finally:
+            await lookups.close()
+
+    assert asyncio.run(run())['title'] == 'Old'
+    assert lookups.stats['timeouts'] == 1 and lookups.stats['stale'] == 1
@@ -0,0 +1,35 @@
+import pytest
+
+from utils.columnarstore import COMPRESSORS, read_columnar, read_columnar_footer, write_columnar
+from utils.transactiontable import TransactionTable
+
+
+@pytest.mark.parametrize('compression', list(COMPRESSORS))
+def test_round_trip_keeps_every_row(sales_rows, tmp_path, compression):
+    filename = str(tmp_path / 'sales.scol')
+    write_columnar(TransactionTable.from_transactions(sales_rows), filename, compression)
+
+    table = read_columnar(filename)
+
+    assert table.to_dicts() == sales_rows
+    assert read_columnar_footer(filename)['rows'] == len(sales_rows)
+
+
+def test_dictionaries_round_trip_too(sales_rows, tmp_path):
+    filename = str(tmp_path / 'sales.scol')
+    write_columnar(iter(sales_rows), filename)
+
+    assert read_columnar(filename).to_dicts() == sales_rows
+
+
+def test_reading_a_subset_of_columns(sales_rows, tmp_path):
+    filename = str(tmp_path / 'sales.scol')
+    write_columnar(sales_rows, filename)
+
+    table = read_columnar(filename, columns=['Region', 'Quantity'])
+
+    assert list(table.columns) == ['Quantity', 'Region']
+    assert [(t['Region'], t['Quantity']) for t in table] == [(t['Region'], t['Quantity']) for t in sales_rows]
+
+    with pytest.raises(KeyError):
+        read_columnar(filename, columns=['Missing'])
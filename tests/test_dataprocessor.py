@@ -0,0 +1,97 @@
+import contextlib
+import io
+import json
+
+import pytest
+
+from utils.dataprocessor import AnalyticsEngine, ALL_GROUPS, customer_analysis, region_wise_sales
+from utils.filehandler import validate_and_filter
+from utils.transactiontable import TransactionTable
+
+
+def transaction(number, region, customer, product, qty, price, date='2024-12-01'):
+    return {
+        'TransactionID': f"T{number:03d}", 'Date': date, 'ProductID': 'P101', 'ProductName': product,
+        'Quantity': qty, 'UnitPrice': price, 'CustomerID': customer, 'Region': region
+    }
+
+
+TRANSACTIONS = [
+    transaction(1, 'North', 'C001', 'Laptop', 1, 500.0),
+    transaction(2, 'South', 'C002', 'Mouse', 2, 50.0),
+    transaction(3, 'East', 'C003', 'Laptop', 1, 900.0, '2024-12-02'),
+    transaction(4, 'North', 'C002', 'Keyboard', 3, 100.0, '2024-12-02'),
+]
+
+
+def test_ranked_results_are_plain_dicts():
+    regions = region_wise_sales(TRANSACTIONS)
+    customers = customer_analysis(TRANSACTIONS)
+
+    assert type(regions) is dict and type(customers) is dict
+    assert list(regions) == ['East', 'North', 'South']
+    assert list(customers) == ['C003', 'C001', 'C002']
+
+    json.dumps(regions)
+    json.dumps(customers)
+
+    copy = regions.copy()
+    copy['West'] = {}
+    assert 'West' not in regions
+
+
+def test_n_keeps_the_best_entries_in_rank_order():
+    assert list(region_wise_sales(TRANSACTIONS, 2)) == ['East', 'North']
+    assert list(customer_analysis(TRANSACTIONS, 1)) == ['C003']
+    assert region_wise_sales(TRANSACTIONS, 2) == dict(list(region_wise_sales(TRANSACTIONS).items())[:2])
+
+
+def test_results_do_not_change_when_the_engine_does():
+    engine = AnalyticsEngine(TRANSACTIONS[:2], ALL_GROUPS, mergeable=True)
+    regions = engine.region_wise_sales()
+    before = json.dumps(regions)
+
+    engine.merge(AnalyticsEngine(TRANSACTIONS[2:], ALL_GROUPS, mergeable=True))
+
+    assert json.dumps(regions) == before
+    assert round(sum(data['percentage'] for data in regions.values())) == 100
+    assert round(sum(data['percentage'] for data in engine.region_wise_sales().values())) == 100
+
+
+EXACT_ANALYSES = [
+    'calculate_total_revenue', 'region_wise_sales', 'top_selling_products', 'customer_analysis',
+    'daily_sales_trend', 'find_peak_sales_day', 'low_performing_products',
+]
+
+
+@pytest.fixture(scope='module')
+def valid_rows(sales_rows):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return validate_and_filter(sales_rows)[0]
+
+
+def results(engine):
+    return {name: getattr(engine, name)() for name in EXACT_ANALYSES}
+
+
+def test_list_and_table_engines_agree(valid_rows):
+    table = TransactionTable.from_transactions(valid_rows)
+    assert results(AnalyticsEngine(table)) == results(AnalyticsEngine(valid_rows))
+
+
+def test_merged_partials_equal_a_single_scan(valid_rows):
+    third = len(valid_rows) // 3
+    parts = [valid_rows[:third], TransactionTable.from_transactions(valid_rows[third:2 * third]), valid_rows[2 * third:]]
+
+    merged = AnalyticsEngine(parts[0], mergeable=True)
+    for part in parts[1:]:
+        merged.merge(AnalyticsEngine(part, mergeable=True))
+
+    assert results(merged) == results(AnalyticsEngine(valid_rows))
+
+
+def test_state_round_trip_equals_a_single_scan(valid_rows):
+    engine = AnalyticsEngine(valid_rows, mergeable=True, cube=True)
+    restored = AnalyticsEngine.from_state(json.loads(json.dumps(engine.to_state())))
+
+    assert results(restored) == results(engine)
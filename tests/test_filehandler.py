@@ -0,0 +1,142 @@
+from utils import filehandler
+from utils.filehandler import detect_encoding, iter_transactions, parse_transactions, read_sales_data_chunks
+
+HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region\n'
+
+ROWS = [
+    'T001|2024-12-01|P101|Laptop|2|45,000|C001|North\n',
+    'T002|2024-12-01|P102|Mouse,Wireless|5|500|C002|South\n',
+]
+
+
+def write(path, text, mode='w'):
+    with open(path, mode, encoding='latin-1', newline='') as f:
+        f.write(text)
+
+
+def read_all(path, offset=0, cursor=None):
+    return [line for batch in read_sales_data_chunks(str(path), 1, offset=offset, cursor=cursor) for line in batch]
+
+
+def test_resume_reads_only_appended_lines(tmp_path):
+    path = tmp_path / 'sales.txt'
+    write(path, HEADER + ROWS[0])
+
+    cursor = {}
+    assert read_all(path, cursor=cursor) == [ROWS[0].strip()]
+
+    write(path, ROWS[1], 'a')
+    offset = cursor['offset']
+    assert read_all(path, offset, cursor) == [ROWS[1].strip()]
+    assert cursor['offset'] == path.stat().st_size
+
+
+def test_resume_leaves_partial_line_for_next_read(tmp_path):
+    path = tmp_path / 'sales.txt'
+    write(path, HEADER + ROWS[0])
+
+    cursor = {}
+    read_all(path, cursor=cursor)
+    complete = cursor['offset']
+
+    # A writer is halfway through the next row
+    write(path, 'T003|2024-12-02|P103|Keyboard|1|2400|C003|No', 'a')
+    assert read_all(path, complete, cursor) == []
+    assert cursor['offset'] == complete
+
+    write(path, 'rth\n', 'a')
+    assert read_all(path, cursor['offset'], cursor) == ['T003|2024-12-02|P103|Keyboard|1|2400|C003|North']
+    assert cursor['offset'] == path.stat().st_size
+
+
+def test_partial_line_is_parsed_whole_after_completion(tmp_path):
+    path = tmp_path / 'sales.txt'
+    write(path, HEADER + 'T003|2024-12-02|P103|Keyboard|1|2400|C003|No')
+
+    cursor = {}
+    assert list(iter_transactions(str(path), offset=0, cursor=cursor)) == []
+
+    write(path, 'rth\n', 'a')
+    batches = list(iter_transactions(str(path), offset=cursor['offset'], cursor=cursor))
+    assert [t['Region'] for batch in batches for t in batch] == ['North']
+
+
+def test_read_without_cursor_keeps_unterminated_last_line(tmp_path):
+    path = tmp_path / 'sales.txt'
+    write(path, HEADER + ROWS[0] + ROWS[1].strip())
+
+    assert read_all(path) == [line.strip() for line in ROWS]
+
+
+def test_crlf_lines_are_stripped(tmp_path):
+    path = tmp_path / 'sales.txt'
+    write(path, HEADER.replace('\n', '\r\n') + ROWS[0].replace('\n', '\r\n'))
+
+    assert read_all(path) == [ROWS[0].strip()]
+
+
+def test_table_parse_matches_dict_parse():
+    raw_lines = [
+        ' T001 | 2024-12-01 |P101|Laptop,Pro|1,000|45,000.5|C001|North\r',
+        'T002|2024-12-01|P102|Mouse|x|500|C002|South',
+        'T003|2024-12-02|P101|Laptop,Pro|2|500|C001',
+        'T004|2024-12-02|P103|Keyboard|3|100|C003| East ',
+    ]
+
+    rows = parse_transactions(raw_lines)
+    table = parse_transactions(raw_lines, as_table=True)
+
+    assert [t['TransactionID'] for t in rows] == ['T001', 'T004']
+    assert table.to_dicts() == rows
+    assert table.dictionary('ProductName') == ['Laptop Pro', 'Keyboard']
+    assert len(parse_transactions([], as_table=True)) == 0
+
+
+def write_bytes(path, data, mode='wb'):
+    with open(path, mode) as f:
+        f.write(data)
+
+
+def test_encoding_is_detected_from_a_sample_and_cached(tmp_path, monkeypatch):
+    utf8 = tmp_path / 'utf8.txt'
+    latin = tmp_path / 'latin.txt'
+    write_bytes(utf8, (HEADER + 'T001|2024-12-01|P101|Café|1|10|C001|North\n').encode('utf-8'))
+    write_bytes(latin, (HEADER + 'T001|2024-12-01|P101|Café|1|10|C001|North\n').encode('latin-1'))
+
+    assert detect_encoding(str(utf8)) == 'utf-8'
+    assert detect_encoding(str(latin)) == 'latin-1'
+
+    # A multi-byte character split by the end of the sample is not an error
+    assert detect_encoding(str(utf8), sample_size=len(HEADER) + 20) == 'utf-8'
+
+    monkeypatch.setattr(filehandler.codecs, 'getincrementaldecoder', None)
+    assert detect_encoding(str(latin)) == 'latin-1'
+
+
+def test_bad_bytes_past_the_sample_report_their_offset_and_switch_codec(tmp_path, capsys):
+    path = tmp_path / 'sales.txt'
+    good = (HEADER + ROWS[0] * (filehandler.ENCODING_SAMPLE_SIZE // len(ROWS[0]) + 1)).encode('utf-8')
+    bad_row = 'T002|2024-12-01|P102|Caf\xe9|5|500|C002|South\n'.encode('latin-1')
+    write_bytes(path, good + bad_row + ROWS[1].encode('utf-8'))
+
+    lines = read_all(path)
+    assert lines[-2:] == ['T002|2024-12-01|P102|Café|5|500|C002|South', ROWS[1].strip()]
+
+    offset = len(good) + bad_row.index(b'\xe9')
+    assert (f"Error: Cannot decode '{path}' as utf-8 at byte offset {offset}; switching to latin-1."
+            in capsys.readouterr().out)
+    assert detect_encoding(str(path)) == 'latin-1'
+
+
+def test_resume_skips_a_partial_last_line_with_a_split_character(tmp_path):
+    path = tmp_path / 'sales.txt'
+    row = 'T003|2024-12-02|P103|Café|1|2400|C003|North\n'.encode('utf-8')
+    write_bytes(path, HEADER.encode('utf-8') + row[:row.index(b'\xc3') + 1])
+
+    cursor = {}
+    assert read_all(path, cursor=cursor) == []
+    assert cursor['offset'] == len(HEADER)
+
+    write_bytes(path, row[row.index(b'\xc3') + 1:], 'ab')
+    assert read_all(path, cursor['offset'], cursor) == [row.decode('utf-8').strip()]
+    assert cursor['offset'] == path.stat().st_size
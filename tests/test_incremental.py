@@ -0,0 +1,40 @@
+import contextlib
+import io
+
+from utils.dataprocessor import analyze
+from utils.filehandler import parse_transactions, read_sales_data, validate_and_filter
+from utils.incremental import update_analytics
+
+ANALYSES = ['calculate_total_revenue', 'region_wise_sales', 'customer_analysis', 'daily_sales_trend']
+
+
+def exact_results(engine):
+    return {name: getattr(engine, name)() for name in ANALYSES}
+
+
+def expected_results(filename):
+    with contextlib.redirect_stdout(io.StringIO()):
+        valid, _, summary = validate_and_filter(parse_transactions(read_sales_data(filename)))
+    return exact_results(analyze(valid)), summary
+
+
+def test_appended_rows_are_folded_in_once(sales_file, tmp_path):
+    with open(sales_file, 'rb') as f:
+        data = f.read()
+
+    # Cut the file mid-line: the partial line waits until it is completed
+    lines = data.splitlines(keepends=True)
+    head = b''.join(lines[:1001])
+    partial = len(head) + len(lines[1001]) // 2
+
+    sales = tmp_path / 'sales.txt'
+    state_file = str(tmp_path / 'state.json')
+
+    for end in (partial, len(data), len(data)):
+        sales.write_bytes(data[:end])
+        engine = update_analytics([str(sales)], state_file, chunk_size=250)
+
+    expected, summary = expected_results(sales_file)
+
+    assert exact_results(engine) == expected
+    assert engine.transaction_count == summary['final_count']
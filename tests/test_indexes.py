@@ -0,0 +1,91 @@
+import pytest
+
+from utils import indexes
+from utils.indexes import TransactionIndex
+from utils.transactiontable import TransactionTable
+
+QUERIES = [
+    {},
+    {'Region': 'North'},
+    {'Region': ['East', 'West'], 'CustomerID': 'C339'},
+    {'ProductID': 'P101', 'Amount': (1000, None)},
+    {'Amount': (None, 500)},
+    {'Date': ('2024-01-10', '2024-01-20')},
+    {'Date': '2024-01-15', 'Region': 'South'},
+    {'Region': 'North', 'Date': ('2024-01-01', None), 'Amount': (100, 5000)},
+    {'Region': 'Nowhere'},
+]
+
+
+def matches(t, conditions):
+    for field, value in conditions.items():
+        actual = t['Quantity'] * t['UnitPrice'] if field == 'Amount' else t[field]
+
+        if field in indexes.HASH_FIELDS:
+            if actual not in (value if isinstance(value, list) else [value]):
+                return False
+        else:
+            low, high = value if isinstance(value, tuple) else (value, value)
+            if (low is not None and actual < low) or (high is not None and actual > high):
+                return False
+
+    return True
+
+
+def linear_scan(rows, conditions):
+    return [i for i, t in enumerate(rows) if matches(t, conditions)]
+
+
+@pytest.mark.parametrize('as_table', [False, True])
+@pytest.mark.parametrize('conditions', QUERIES)
+def test_index_positions_match_a_linear_scan(sales_rows, as_table, conditions):
+    transactions = TransactionTable.from_transactions(sales_rows) if as_table else sales_rows
+    index = TransactionIndex(transactions)
+
+    assert list(index.positions(**conditions)) == linear_scan(sales_rows, conditions)
+
+
+def test_filter_returns_the_matching_rows(sales_rows):
+    index = TransactionIndex(TransactionTable.from_transactions(sales_rows))
+    conditions = {'Region': 'North', 'Amount': (1000, None)}
+
+    expected = [sales_rows[i] for i in linear_scan(sales_rows, conditions)]
+    assert index.filter(**conditions).to_dicts() == expected
+    assert index.count(**conditions) == len(expected)
+
+
+def test_positions_without_numpy_match(sales_rows, monkeypatch):
+    monkeypatch.setattr(indexes, 'np', None)
+    index = TransactionIndex(sales_rows)
+
+    for conditions in QUERIES:
+        assert index.positions(**conditions) == linear_scan(sales_rows, conditions)
+
+
+@pytest.mark.parametrize('as_table', [False, True])
+def test_extended_index_matches_a_linear_scan(sales_rows, as_table):
+    batches = [sales_rows[:1000], sales_rows[1000:1100], sales_rows[1100:1101], [], sales_rows[1101:]]
+
+    transactions = TransactionTable() if as_table else []
+    index = TransactionIndex(transactions, sorted_fields=('Amount', 'Date', 'ProductName'))
+
+    for batch in batches:
+        rows = TransactionTable.from_transactions(batch) if as_table else batch
+        if as_table:
+            transactions.extend_table(rows)
+        else:
+            transactions.extend(rows)
+        index.extend(rows)
+
+    for conditions in QUERIES + [{'ProductName': ('Keyboard', 'Mouse')}]:
+        assert list(index.positions(**conditions)) == linear_scan(sales_rows, conditions)
+
+
+def test_extended_index_without_numpy_matches(sales_rows, monkeypatch):
+    monkeypatch.setattr(indexes, 'np', None)
+    index = TransactionIndex(sales_rows[:2000])
+    index.transactions = sales_rows
+    index.extend(sales_rows[2000:])
+
+    for conditions in QUERIES:
+        assert index.positions(**conditions) == linear_scan(sales_rows, conditions)
@@ -0,0 +1,24 @@
+import main
+
+
+class RecordingService:
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch_transactions(self, transactions):
+        self.prefetched.append(len(transactions))
+
+
+def test_prefetch_runs_even_when_validation_is_cached(sales_file, tmp_path, monkeypatch, capsys):
+    service = RecordingService()
+    monkeypatch.setattr(main, 'get_enrichment_service', lambda: service)
+
+    statuses = []
+    for _ in range(2):
+        pipeline = main.build_pipeline(sales_file)
+        pipeline.cache_dir = str(tmp_path / 'cache')
+        statuses.append(pipeline.run(targets=['prefetch']))
+
+    assert statuses[1]['validate'] == 'cached'
+    assert statuses[1]['prefetch'] == 'ran'
+    assert len(service.prefetched) == 2 and service.prefetched[0] == service.prefetched[1] > 0
@@ -0,0 +1,42 @@
+from utils.mmapparser import materialize, parse_sales_file_mmap
+
+
+def test_mmap_parse_matches_parse_transactions(sales_file, sales_rows):
+    table = parse_sales_file_mmap(sales_file)
+
+    assert table.to_dicts() == sales_rows
+    assert materialize(table).to_dicts() == sales_rows
+
+
+HEADER = b'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region\n'
+
+
+def test_very_long_fields_are_encoded_one_by_one(tmp_path):
+    filename = tmp_path / 'sales.txt'
+    lines = [b'T%03d|2024-12-01|P101|Laptop|1|500|C001|North\n' % i for i in range(200)]
+    lines[7] = b'T007|2024-12-01|P101|' + b'x' * 10000 + b'|1|500|C001|North\n'
+    lines[8] = b'T008|2024-12-01|P101|Laptop|2' + b' ' * 5000 + b'|500|C001|North\n'
+    filename.write_bytes(HEADER + b''.join(lines))
+
+    table = parse_sales_file_mmap(str(filename))
+
+    assert len(table) == 200
+    assert table.dictionary('ProductName') == ['Laptop', 'x' * 10000]
+    assert table[7]['ProductName'] == 'x' * 10000
+    assert table[8]['Quantity'] == 2
+
+
+def test_bad_bytes_past_the_encoding_sample_are_replaced(tmp_path, capsys):
+    filename = tmp_path / 'sales.txt'
+    good = [b'T%05d|2024-12-01|P101|Caf\xc3\xa9|1|500|C001|North\n' % i for i in range(2000)]
+    bad = b'T99999|2024-12-01|P102|Caf\xe9|1|500|C\xff02|South\n'
+    filename.write_bytes(HEADER + b''.join(good) + bad)
+
+    table = parse_sales_file_mmap(str(filename))
+
+    assert table.dictionary('ProductName') == ['Café', 'Caf�']
+    assert table[-1]['CustomerID'] == 'C�02'
+    assert len(table.columns['TransactionID'].values) == 2001
+
+    offset = len(HEADER) + len(b''.join(good)) + bad.index(b'\xe9')
+    assert f"at byte offset {offset}" in capsys.readouterr().out
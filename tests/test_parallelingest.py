@@ -0,0 +1,34 @@
+import contextlib
+import io
+
+from utils.filehandler import validate_and_filter
+from utils.mmapparser import parse_sales_file_mmap
+from utils.parallelingest import expand_sources, ingest_parallel, split_file
+
+
+def test_partitions_end_on_line_boundaries(sales_file, sales_rows):
+    ranges = split_file(sales_file, partition_bytes=20000)
+
+    assert len(ranges) > 1
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert [t for start, end in ranges for t in parse_sales_file_mmap(sales_file, start, end).to_dicts()] == sales_rows
+
+
+def test_expand_sources_resolves_directories_and_globs(tmp_path):
+    for name in ('b.txt', 'a.txt', 'notes.md'):
+        (tmp_path / name).write_text('')
+
+    expected = [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')]
+
+    assert expand_sources(tmp_path) == expected
+    assert expand_sources([str(tmp_path / '*.txt'), str(tmp_path / 'a.txt')]) == expected
+
+
+def test_parallel_ingest_matches_a_single_validation(sales_file, sales_rows):
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected, _, expected_summary = validate_and_filter(sales_rows, region='North')
+        table, summary = ingest_parallel(sales_file, workers=2, partition_bytes=20000, region='North')
+
+    assert table.to_dicts() == expected
+    for key in ('total_input', 'invalid', 'filtered_by_region', 'final_count', 'rejected_by_rule'):
+        assert summary[key] == expected_summary[key]
@@ -0,0 +1,92 @@
+import importlib
+import sys
+
+import pytest
+
+from utils.pipeline import Pipeline, Stage, code_dependencies
+
+HELPERS = '''
+def double(values):
+    return [v * 2 for v in values]
+
+
+def total(values):
+    return sum(values)
+'''
+
+STAGES = '''
+from pipeline_helpers import double, total
+
+
+def load():
+    return [1, 2, 3]
+
+
+def doubled(values):
+    return double(values)
+
+
+def summed(values):
+    return total(values)
+'''
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    (tmp_path / 'pipeline_helpers.py').write_text(HELPERS)
+    (tmp_path / 'pipeline_stages.py').write_text(STAGES)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    for name in ('pipeline_helpers', 'pipeline_stages'):
+        sys.modules.pop(name, None)
+
+    stages = importlib.import_module('pipeline_stages')
+    yield tmp_path, stages
+
+    for name in ('pipeline_helpers', 'pipeline_stages'):
+        sys.modules.pop(name, None)
+
+
+def build(root, stages):
+    return Pipeline([
+        Stage('load', stages.load),
+        Stage('doubled', stages.doubled, inputs=('load',)),
+        Stage('summed', stages.summed, inputs=('load',)),
+    ], cache_dir=str(root / 'cache'), verbose=False, code_root=str(root))
+
+
+def test_unchanged_stages_are_cached(project):
+    root, stages = project
+
+    assert set(build(root, stages).run().values()) == {'ran'}
+
+    pipeline = build(root, stages)
+    assert set(pipeline.run().values()) == {'cached'}
+    assert pipeline.value('doubled') == [2, 4, 6]
+
+
+def test_editing_a_helper_module_reruns_its_users(project):
+    root, stages = project
+    build(root, stages).run()
+
+    (root / 'pipeline_helpers.py').write_text(HELPERS + '\n# edited\n')
+
+    status = build(root, stages).run()
+    assert status == {'load': 'cached', 'doubled': 'ran', 'summed': 'ran'}
+
+
+def test_code_dependencies_follow_home_functions_and_whole_modules(project):
+    root, stages = project
+
+    functions, modules = code_dependencies((stages.doubled,), str(root))
+
+    assert [f.__name__ for f in functions] == ['doubled']
+    assert [m.__name__ for m in modules] == ['pipeline_helpers']
+
+
+def test_forced_stage_reruns_its_consumers(project):
+    root, stages = project
+    build(root, stages).run()
+
+    status = build(root, stages).run(force=('load',))
+    assert status == {'load': 'ran', 'doubled': 'ran', 'summed': 'ran'}
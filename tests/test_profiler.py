@@ -0,0 +1,61 @@
+import json
+
+from utils.pipeline import Pipeline, Stage
+from utils.profiler import Profiler, row_count
+
+
+def test_row_counts():
+    assert row_count([1, 2, 3]) == 3
+    assert row_count(([1, 2], 5, {})) == 2
+    assert row_count({'a': 1}) is None
+    assert row_count('text') is None
+    assert row_count(None) is None
+
+
+def test_nested_measurements_keep_the_outer_peak():
+    profiler = Profiler()
+
+    with profiler.measure('outer') as outer:
+        block = bytearray(4 << 20)
+        del block
+
+        with profiler.measure('inner') as inner:
+            small = bytearray(1 << 20)
+            del small
+
+    profiler.stop()
+
+    assert [m.name for m in profiler.measurements] == ['inner', 'outer']
+    assert inner.peak_traced_bytes >= 1 << 20
+    assert outer.peak_traced_bytes >= 4 << 20
+    assert outer.wall_seconds >= inner.wall_seconds
+
+
+def test_profiled_pipeline_writes_json_and_a_summary(tmp_path):
+    profiler = Profiler(trace_memory=False)
+
+    def build():
+        return Pipeline([
+            Stage('load', lambda: list(range(10))),
+            Stage('evens', lambda values: [v for v in values if v % 2 == 0], inputs=('load',)),
+        ], cache_dir=str(tmp_path / 'cache'), verbose=False, profiler=profiler)
+
+    build().run()
+    build().run()
+
+    filename = profiler.write(str(tmp_path / 'profile' / 'run.json'))
+    with open(filename, encoding='utf-8') as f:
+        profile = json.load(f)
+
+    stages = [(s['name'], s['status'], s['rows_in'], s['rows_out']) for s in profile['stages']]
+    assert stages == [
+        ('load', 'ran', None, 10), ('evens', 'ran', 10, 5),
+        ('load', 'cached', None, None), ('evens', 'cached', None, None),
+    ]
+    assert profile['trace_memory'] is False
+    assert profile['stages'][0]['peak_traced_bytes'] is None
+
+    lines = profiler.summary().splitlines()
+    assert lines[0].split() == ['Stage', 'Status', 'Wall', 's', 'CPU', 's', 'Peak', 'MB', 'Rows', 'in', 'Rows', 'out']
+    assert lines[2].split()[:2] == ['evens', 'ran'] and lines[2].split()[-2:] == ['10', '5']
+    assert lines[3].split() == ['load', 'cached', '0.000', '0.000']
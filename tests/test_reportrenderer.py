@@ -0,0 +1,59 @@
+import pandas as pd
+
+from output.generate_sales_report import generate_sales_report
+from utils.reportrenderer import format_currency, grouped_totals, render_rows, render_section, rollup
+
+
+def frame():
+    return pd.DataFrame({
+        'transaction_id': ['T001', 'T002', 'T003', 'T004', 'T005', 'T006'],
+        'date': pd.to_datetime(['2024-12-01', '2024-12-01', '2024-12-02', None, '2024-12-03', '2024-12-03']),
+        'region': ['West', 'East', 'West', 'North', 'East', 'West'],
+        'customer_id': ['C001', 'C002', 'C001', 'C003', 'C001', 'C004'],
+        'product_name': ['Laptop', 'Mouse', 'Keyboard', 'Monitor', 'Mouse', 'Laptop'],
+        'quantity': [2, 5, 1, 3, 4, 1],
+        'amount': [90000.0, 2500.0, None, 42000.0, 2000.0, 45000.0],
+    })
+
+
+def test_rollups_match_a_direct_groupby():
+    transactions = frame()
+    totals = grouped_totals(transactions)
+
+    for key in ('region', 'customer_id', 'date'):
+        rolled = rollup(totals, key, unique='customer_id').set_index(key)
+        direct = transactions.groupby(key).agg(
+            amount=('amount', 'sum'), priced=('amount', 'count'), dated=('date', 'count'),
+            unique_customer_id=('customer_id', 'nunique')
+        )
+
+        assert list(rolled.index) == list(direct.index)
+        for column in direct.columns:
+            assert rolled[column].tolist() == direct[column].tolist()
+
+    assert rollup(totals, 'region').set_index('region')['rows'].to_dict() == {'East': 2, 'North': 1, 'West': 3}
+
+
+def test_rendered_sections():
+    body = render_rows("{:<6}{}", pd.Series(['East', 'West']), [1, 2])
+
+    assert body == 'East  1\nWest  2\n'
+    assert render_section('TITLE', body, header='H', width=3) == 'TITLE\n---\nH\n---\nEast  1\nWest  2\n\n'
+
+
+def test_region_averages_stay_in_region_order(tmp_path):
+    transactions = frame()
+    output_file = str(tmp_path / 'report.txt')
+
+    generate_sales_report(transactions, transactions, output_file)
+
+    with open(output_file, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    start = lines.index('Avg transaction value per region:') + 1
+    expected = transactions.groupby('region')['amount'].mean().round(2)
+    assert lines[start:start + 3] == [f"  {region}: {format_currency(avg)}" for region, avg in expected.items()]
+
+    # The region-wise table itself is ranked by sales
+    first = lines.index('REGION-WISE PERFORMANCE') + 4
+    assert [line.split()[0] for line in lines[first:first + 3]] == ['West', 'North', 'East']
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from utils.dataprocessor import AnalyticsEngine, analyze, daily_sales_trend, find_peak_sales_day, sales_rollup
+from utils.incremental import load_analytics_state, update_analytics
+from utils.rollups import SalesCube, bucket_of
+from utils.transactiontable import TransactionTable
+
+HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region\n'
+
+
+def transaction(number, date, region, product, customer, qty, price):
+    return {
+        'TransactionID': f"T{number:03d}", 'Date': date, 'ProductID': 'P101', 'ProductName': product,
+        'Quantity': qty, 'UnitPrice': price, 'CustomerID': customer, 'Region': region
+    }
+
+
+TRANSACTIONS = [
+    transaction(1, '2024-01-30', 'North', 'Laptop', 'C001', 1, 500.0),
+    transaction(2, '2024-02-02', 'South', 'Mouse', 'C002', 2, 50.5),
+    transaction(3, '2024-02-02', 'North', 'Laptop', 'C001', 1, 900.0),
+    transaction(4, '2024-04-15', 'East', 'Keyboard', 'C003', 3, 100.0),
+    transaction(5, 'not-a-date', 'East', 'Keyboard', 'C003', 1, 100.0),
+]
+
+
+def line(t):
+    return '|'.join(str(t[k]) for k in ('TransactionID', 'Date', 'ProductID', 'ProductName',
+                                         'Quantity', 'UnitPrice', 'CustomerID', 'Region'))
+
+
+def test_bucket_labels():
+    assert bucket_of('2024-12-05', 'week') == '2024-W49'
+    assert bucket_of('2024-12-05', 'month') == '2024-12'
+    assert bucket_of('2024-12-05', 'quarter') == '2024-Q4'
+    assert bucket_of('garbage', 'month') is None
+
+
+def test_cube_serves_trend_and_peak_like_the_engine():
+    plain = analyze(TRANSACTIONS)
+
+    for transactions in (TRANSACTIONS, TransactionTable.from_transactions(TRANSACTIONS)):
+        engine = analyze(transactions, cube=True)
+        assert engine.daily_sales_trend() == plain.daily_sales_trend()
+        assert engine.find_peak_sales_day() == plain.find_peak_sales_day()
+
+    cube = SalesCube(TRANSACTIONS)
+    assert daily_sales_trend(cube) == plain.daily_sales_trend()
+    assert find_peak_sales_day(cube) == plain.find_peak_sales_day()
+
+
+def test_rollup_by_month_and_region():
+    months = sales_rollup(TRANSACTIONS, 'month')
+
+    assert list(months) == [(None,), ('2024-01',), ('2024-02',), ('2024-04',)]
+    assert months[('2024-02',)] == {'revenue': 1001.0, 'quantity': 3, 'transaction_count': 2, 'unique_customers': 2}
+
+    by_region = sales_rollup(TRANSACTIONS, 'quarter', by=('region',))
+    assert by_region[('2024-Q1', 'North')]['revenue'] == 1400.0
+
+    with pytest.raises(ValueError):
+        sales_rollup(TRANSACTIONS, 'hour')
+
+
+def test_cube_merges_and_round_trips_with_the_engine_state():
+    engine = AnalyticsEngine(TRANSACTIONS[:2], mergeable=True, cube=True)
+    engine.merge(AnalyticsEngine(TransactionTable.from_transactions(TRANSACTIONS[2:]), mergeable=True, cube=True))
+
+    restored = AnalyticsEngine.from_state(json.loads(json.dumps(engine.to_state())))
+    whole = SalesCube(TRANSACTIONS)
+
+    assert restored.rollup('week') == whole.rollup('week')
+    assert restored.rollup('month', ('region', 'product')) == whole.rollup('month', ('region', 'product'))
+    assert restored.daily_sales_trend() == whole.daily_sales_trend()
+
+
+def test_engines_with_and_without_a_cube_do_not_merge():
+    with pytest.raises(ValueError):
+        AnalyticsEngine([], mergeable=True, cube=True).merge(AnalyticsEngine([], mergeable=True))
+
+    with pytest.raises(ValueError):
+        AnalyticsEngine([], approximate=True, cube=True)
+
+
+def test_incremental_state_persists_the_cube(tmp_path):
+    sales = tmp_path / 'sales.txt'
+    state_file = str(tmp_path / 'state.json')
+
+    sales.write_text(HEADER + '\n'.join(line(t) for t in TRANSACTIONS[:2]) + '\n', encoding='latin-1')
+    update_analytics([str(sales)], state_file)
+
+    with open(sales, 'a', encoding='latin-1') as f:
+        f.write('\n'.join(line(t) for t in TRANSACTIONS[2:]) + '\n')
+    update_analytics([str(sales)], state_file)
+
+    engine, _, _ = load_analytics_state(state_file)
+
+    assert engine.cube is not None
+    assert engine.rollup('month') == sales_rollup(TRANSACTIONS, 'month')
+    assert engine.find_peak_sales_day() == analyze(TRANSACTIONS).find_peak_sales_day()
@@ -0,0 +1,48 @@
+import json
+
+from benchmarks import runbenchmarks
+
+
+def results(**seconds):
+    return {'scales': {'1k': {'rows': 1000, 'seconds': seconds}}}
+
+
+def test_saved_baseline_round_trips(tmp_path):
+    filename = str(tmp_path / 'nested' / 'baseline.json')
+    document = results(parse_transactions=0.5)
+
+    runbenchmarks.save_results(document, filename)
+
+    with open(filename, encoding='utf-8') as f:
+        assert json.load(f) == document
+
+
+def test_compare_flags_only_slowdowns_past_the_ratio(capsys):
+    baseline = results(fast=1.0, slow=1.0, same=1.0)
+    current = results(fast=0.5, slow=1.3, same=1.2, new=2.0)
+    current['scales']['1m'] = {'rows': 10 ** 6, 'seconds': {'fast': 1.0}}
+
+    assert runbenchmarks.compare(current, baseline) == [('1k', 'slow', 1.3)]
+    assert runbenchmarks.compare(current, baseline, ratio=1.1) == [('1k', 'slow', 1.3), ('1k', 'same', 1.2)]
+
+    out = capsys.readouterr().out
+    assert '[1m] no baseline' in out
+    assert 'REGRESSION' in out
+    assert [line.split()[:2] for line in out.splitlines() if line.strip().startswith('new')][0] == ['new', '-']
+
+
+def test_run_times_every_stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(runbenchmarks, 'SCALES', {'tiny': 300, 'stream': 500})
+    monkeypatch.setattr(runbenchmarks, 'IN_MEMORY_MAX_ROWS', 400)
+    monkeypatch.setattr(runbenchmarks, 'REPEAT_SMALL', 1)
+
+    document = runbenchmarks.run(('tiny', 'stream'), str(tmp_path))
+
+    tiny = document['scales']['tiny']['seconds']
+    for name in ('read_sales_data', 'parse_transactions[table]', 'parse_sales_file_mmap[materialized]',
+                 'validate_and_filter', 'analyze[table]') + runbenchmarks.ANALYSES:
+        assert tiny[name] >= 0
+
+    stream = document['scales']['stream']['seconds']
+    assert set(stream) == {'stream_parse_validate_analyze[approximate]', *runbenchmarks.ANALYSES}
+    assert document['scales']['stream']['rows'] == 500
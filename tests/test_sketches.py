@@ -0,0 +1,120 @@
+import bisect
+import json
+import random
+
+import pytest
+
+from utils.sketches import HyperLogLog, KLLSketch, hash64, hll_by_group, sketch_from_state
+
+FRACTIONS = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+# KLL with k=200 keeps rank error near 1%; HLL at precision 12 has 1.6% standard error
+KLL_RANK_ERROR = 0.02
+HLL_RELATIVE_ERROR = 0.05
+
+
+def values(n, seed=1):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(8, 1) for _ in range(n)]
+
+
+def worst_rank_error(sketch, data):
+    ordered = sorted(data)
+    return max(
+        abs(bisect.bisect_left(ordered, sketch.quantile(fraction)) / len(ordered) - fraction)
+        for fraction in FRACTIONS
+    )
+
+
+def test_kll_rank_error_is_bounded_for_add_update_and_merge():
+    data = values(200_000)
+
+    added = KLLSketch()
+    for value in data:
+        added.add(value)
+
+    updated = KLLSketch()
+    updated.update(data)
+
+    merged = KLLSketch()
+    for start in range(0, len(data), 25_000):
+        part = KLLSketch()
+        part.update(data[start:start + 25_000])
+        merged.merge(part)
+
+    for sketch in (added, updated, merged):
+        assert len(sketch) == len(data)
+        assert worst_rank_error(sketch, data) < KLL_RANK_ERROR
+
+
+def test_kll_memory_stays_bounded():
+    sketch = KLLSketch(k=100)
+    data = values(100_000)
+    peak = 0
+    for value in data:
+        sketch.add(value)
+        peak = max(peak, sum(map(len, sketch.levels)))
+
+    assert peak <= 4 * sketch.k
+
+    for start in range(0, 100_000, 5_000):
+        sketch.update(data[start:start + 5_000])
+        assert sum(map(len, sketch.levels)) <= 3 * sketch.k + 2 * len(sketch.levels)
+
+
+def test_kll_small_inputs_are_exact():
+    sketch = KLLSketch()
+    sketch.update([5, 1, 3])
+
+    assert sketch.quantiles([0, 0.5, 1]) == [1, 3, 5]
+    assert KLLSketch().quantile(0.5) is None
+
+
+def test_kll_state_round_trip_keeps_adding():
+    data = values(50_000)
+    sketch = KLLSketch()
+    sketch.update(data[:25_000])
+
+    restored = sketch_from_state(json.loads(json.dumps(sketch.to_state())))
+    for value in data[25_000:]:
+        restored.add(value)
+
+    assert len(restored) == len(data)
+    assert worst_rank_error(restored, data) < KLL_RANK_ERROR
+
+
+@pytest.mark.parametrize('distinct', [10, 1_000, 100_000])
+def test_hll_relative_error_is_bounded(distinct):
+    sketch = HyperLogLog()
+    for i in range(distinct):
+        sketch.add(f"C{i}")
+        sketch.add(f"C{i}")   # repeats do not count
+
+    assert abs(sketch.count() - distinct) <= max(1, HLL_RELATIVE_ERROR * distinct)
+
+
+def test_hll_merge_equals_sketch_of_the_union():
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+
+    for i in range(30_000):
+        (left if i % 3 else right).add(i)
+        union.add(i)
+
+    assert left.copy().merge(right).count() == union.count()
+
+    restored = sketch_from_state(json.loads(json.dumps(union.to_state())))
+    assert restored.count() == union.count()
+
+
+def test_hll_by_group_matches_one_sketch_per_group():
+    np = pytest.importorskip('numpy')
+    rng = random.Random(2)
+    rows = [(rng.randrange(5), f"P{rng.randrange(3000)}") for _ in range(20_000)]
+
+    hashes = np.array([hash64(value) for _, value in rows], dtype=np.uint64)
+    grouped = hll_by_group(np.array([group for group, _ in rows]), hashes)
+
+    for group, sketch in grouped.items():
+        expected = HyperLogLog()
+        expected.update(value for g, value in rows if g == group)
+        assert sketch.count() == expected.count()
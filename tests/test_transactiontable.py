@@ -0,0 +1,43 @@
+from array import array
+
+from utils.dates import INVALID_DAY, day_number
+from utils.transactiontable import TransactionTable
+
+
+def transaction(number, date):
+    return {
+        'TransactionID': f"T{number:03d}", 'Date': date, 'ProductID': 'P101', 'ProductName': 'Laptop',
+        'Quantity': 1, 'UnitPrice': 10.0, 'CustomerID': 'C001', 'Region': 'North'
+    }
+
+
+DATES = ['2024-12-02', '2024-12-01', 'not a date', '2024-12-02']
+TRANSACTIONS = [transaction(i, date) for i, date in enumerate(DATES)]
+
+
+def expected_days(dates):
+    return array('i', [day_number(date) for date in dates])
+
+
+def test_day_numbers_are_stored_when_the_table_is_built():
+    table = TransactionTable.from_transactions(TRANSACTIONS)
+
+    assert table.days == expected_days(DATES)
+    assert table.days[2] == INVALID_DAY
+    assert table.day_numbers() is table.days
+
+
+def test_day_numbers_follow_appends_takes_and_concat():
+    table = TransactionTable.from_columns({
+        name: [t[name] for t in TRANSACTIONS[:2]] for name in TRANSACTIONS[0]
+    })
+    table.extend_columns({name: [t[name] for t in TRANSACTIONS[2:]] for name in TRANSACTIONS[0]})
+    assert table.days == expected_days(DATES)
+
+    table.append(transaction(9, '2025-01-01'))
+    assert table.days == expected_days(DATES + ['2025-01-01'])
+
+    assert table.take([4, 0]).days == expected_days(['2025-01-01', '2024-12-02'])
+
+    both = TransactionTable.concat([table, table.take([1])])
+    assert both.days == expected_days(DATES + ['2025-01-01', '2024-12-01'])
@@ -0,0 +1,62 @@
+from utils.transactiontable import TransactionTable
+from utils.validation import Validator
+
+
+def transaction(number, region='North', customer='C001', product='P101', qty=1, price=100.0):
+    return {
+        'TransactionID': f"T{number:03d}", 'Date': '2024-12-01', 'ProductID': product,
+        'ProductName': 'Laptop', 'Quantity': qty, 'UnitPrice': price,
+        'CustomerID': customer, 'Region': region
+    }
+
+
+TRANSACTIONS = [
+    transaction(1),
+    transaction(2, region='South', qty=2, price=50.0),
+    transaction(3, product='X101'),
+    transaction(4, customer='Z001'),
+    transaction(5, qty=0),
+    transaction(6, price=-1.0),
+    transaction(7, region=''),
+    transaction(8, region='North', qty=10, price=1000.0),
+]
+
+
+def test_rejections_count_the_first_failing_rule():
+    validator = Validator()
+    kept, stats = validator.run(TRANSACTIONS)
+    summary = validator.new_summary()
+    validator.run(TRANSACTIONS, summary=summary)
+
+    assert [t['TransactionID'] for t in kept] == ['T001', 'T002', 'T008']
+    assert summary['invalid'] == 5
+    assert summary['rejected_by_rule'] == {
+        'transaction_id_prefix': 0, 'product_id_prefix': 1, 'customer_id_prefix': 1,
+        'quantity_positive': 1, 'unit_price_positive': 1, 'region_present': 1
+    }
+    assert stats['regions'] == {'North', 'South'}
+    assert stats['amount_range'] == (100.0, 10000.0)
+
+
+def test_missing_numeric_fields_are_rejected_not_raised():
+    row = transaction(9)
+    del row['Quantity'], row['UnitPrice']
+
+    summary = Validator().new_summary()
+    kept, _ = Validator().run([row], summary=summary)
+
+    assert kept == []
+    assert summary['rejected_by_rule']['quantity_positive'] == 1
+
+
+def test_row_and_columnar_paths_agree():
+    validator = Validator()
+    rows_summary, table_summary = validator.new_summary(), validator.new_summary()
+
+    kept_rows, row_stats = validator.run(TRANSACTIONS, 'North', 50, 5000, rows_summary)
+    table = TransactionTable.from_transactions(TRANSACTIONS)
+    kept_table, table_stats = validator.run(table, 'North', 50, 5000, table_summary)
+
+    assert rows_summary == table_summary
+    assert [t['TransactionID'] for t in kept_rows] == [t['TransactionID'] for t in kept_table]
+    assert row_stats == table_stats
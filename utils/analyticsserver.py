@@ -0,0 +1,481 @@
+# Resident analytics server over a warm, indexed dataset
+#
+# Loads every sales file in the data directory once into a TransactionTable,
+# indexes it (utils/indexes.py) and keeps a mergeable AnalyticsEngine with a
+# SalesCube (utils/rollups.py) over it, then answers the utils/dataprocessor.py analyses over HTTP (TCP or a
+# Unix socket) without re-reading anything:
+#
+#   GET  /health                      rows, files, dataset version
+#   GET  /analyses                    available analyses and parameters
+#   GET  /query/<analysis>?params     e.g. /query/top_products?region=North&n=3
+#   POST /reload                      fold in new files / appended bytes now
+#
+# Results are kept in an LRU cache keyed by dataset version. A poller folds
+# in new files and bytes appended to known files every reload_interval
+# seconds; only the new bytes are parsed and validated. A reload appends the
+# new rows to the table and index and merges their engine into the warm one
+# under a lock, so its cost follows the new bytes and queries never see a
+# half-updated dataset; a rewritten file rebuilds everything and swaps it in.
+#
+#   python -m utils.analyticsserver --port 8765
+#   python -m utils.analyticsserver --unix /tmp/analytics.sock
+import argparse
+import glob
+import hashlib
+import json
+import os
+import socketserver
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from utils.dataprocessor import ALL_GROUPS, AnalyticsEngine, analyze
+from utils.filehandler import iter_transactions, validate_and_filter_batches
+from utils.indexes import TransactionIndex
+from utils.transactiontable import TransactionTable
+
+DEFAULT_DATA_DIR = 'data'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+RELOAD_INTERVAL = 5       # seconds between checks for new data; 0 disables polling
+RESULT_CACHE_SIZE = 256
+LOAD_CHUNK_SIZE = 100_000
+
+# Bytes at the start of a loaded file that must be unchanged for it to count
+# as appended to rather than rewritten
+HEAD_BYTES = 4096
+
+SALES_HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region'
+
+# Query parameter -> (indexed field, kind)
+FILTER_PARAMS = {
+    'region': ('Region', 'values'),
+    'customer': ('CustomerID', 'values'),
+    'product': ('ProductID', 'values'),
+    'date_from': ('Date', 'low'),
+    'date_to': ('Date', 'high'),
+    'min_amount': ('Amount', 'low'),
+    'max_amount': ('Amount', 'high'),
+}
+
+# Analysis -> (function of (engine, n, threshold), parameters it takes besides the filters)
+ANALYSES = {
+    'revenue': (lambda engine, n, threshold: engine.calculate_total_revenue(), ()),
+    'regions': (lambda engine, n, threshold: engine.region_wise_sales(), ()),
+    'top_products': (lambda engine, n, threshold: engine.top_selling_products(n or 5), ('n',)),
+    'customers': (lambda engine, n, threshold: engine.customer_analysis(n), ('n',)),
+    'daily_trend': (lambda engine, n, threshold: engine.daily_sales_trend(), ()),
+    'peak_day': (lambda engine, n, threshold: engine.find_peak_sales_day(), ()),
+    'low_performers': (
+        lambda engine, n, threshold: engine.low_performing_products(10 if threshold is None else threshold, n),
+        ('threshold', 'n')
+    ),
+}
+
+
+class QueryError(ValueError):
+    """
+    A bad query; reported to the client as 400
+    """
+
+
+def is_sales_file(filename):
+    """
+    True if the file starts with the Sales_data.txt header
+    """
+    try:
+        with open(filename, 'r', encoding='latin-1') as f:
+            return f.readline().strip() == SALES_HEADER
+    except OSError:
+        return False
+
+
+def head_digest(filename, length):
+    """
+    Returns: SHA-256 of the first length bytes of the file
+    """
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_jsonable(item) for item in value)
+    return value
+
+
+class Snapshot:
+    """
+    The dataset: table, index and engine (with its cube)
+    Reloads append to all three in place and bump version
+    """
+
+    def __init__(self, table, engine, version):
+        self.table = table
+        self.engine = engine
+        self.version = version
+        self.index = TransactionIndex(table)
+
+
+def _empty_snapshot(version=0):
+    return Snapshot(TransactionTable(), AnalyticsEngine([], ALL_GROUPS, mergeable=True, cube=True), version)
+
+
+class AnalyticsService:
+    """
+    The warm dataset and its query API, independent of the transport
+    """
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, cache_size=RESULT_CACHE_SIZE):
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+
+        self.sources = {}   # path -> {'size', 'mtime', 'offset', 'head'}
+        self.snapshot = _empty_snapshot()
+        self.stats = {'queries': 0, 'cache_hits': 0, 'reloads': 0}
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()     # also guards stats
+        self._data_lock = threading.Lock()      # snapshot table, index and engine
+        self._reload_lock = threading.Lock()
+
+        self.reload()
+
+    # -------- LOADING --------
+
+    def _sales_files(self):
+        return sorted(
+            os.path.abspath(path)
+            for path in glob.glob(os.path.join(self.data_dir, '*.txt'))
+            if is_sales_file(path)
+        )
+
+    def reload(self):
+        """
+        Folds new files and bytes appended to known files into the snapshot
+        A file that shrank, disappeared or was rewritten (its first bytes
+        changed) triggers a full rebuild; a last line still being written is
+        left for the next reload
+        Returns: number of valid rows added
+        """
+        with self._reload_lock:
+            return self._fold(self.snapshot, dict(self.sources))
+
+    def _fold(self, base, sources):
+        pending = []
+        paths = self._sales_files()
+
+        if set(sources) - set(paths):
+            # A loaded file was removed or emptied; its rows must go too
+            print("A loaded sales file is gone; rebuilding the dataset.")
+            return self._fold(_empty_snapshot(base.version), {})
+
+        for path in paths:
+            stat = os.stat(path)
+            source = sources.get(path)
+
+            if source is not None:
+                if source['size'] == stat.st_size and source['mtime'] == stat.st_mtime_ns:
+                    continue
+
+                rewritten = (
+                    stat.st_size < source['offset']
+                    or head_digest(path, min(source['offset'], HEAD_BYTES)) != source['head']
+                )
+
+                if rewritten:
+                    # Aggregates cannot be subtracted again; start over
+                    print(f"'{path}' was rewritten since it was loaded; rebuilding the dataset.")
+                    return self._fold(_empty_snapshot(base.version), {})
+
+            pending.append((path, stat, 0 if source is None else source['offset']))
+
+        if not pending and base is self.snapshot:
+            return 0
+
+        # Parse, validate and aggregate the new bytes without holding the data lock
+        tables = []
+        delta = None
+
+        for path, stat, offset in pending:
+            cursor = {}
+            batches = iter_transactions(path, LOAD_CHUNK_SIZE, as_table=True, offset=offset, cursor=cursor)
+
+            for batch in validate_and_filter_batches(batches):
+                tables.append(batch)
+                engine = AnalyticsEngine(batch, ALL_GROUPS, mergeable=True, cube=True)
+                delta = engine if delta is None else delta.merge(engine)
+
+            offset = cursor.get('offset', offset)
+            sources[path] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'offset': offset,
+                'head': head_digest(path, min(offset, HEAD_BYTES))
+            }
+
+        with self._data_lock:
+            for table in tables:
+                base.table.extend_table(table)
+                base.index.extend(table)
+
+            if delta is not None:
+                base.engine.merge(delta)
+
+            base.version += 1
+            self.snapshot = base
+            self.sources = sources
+
+        with self._cache_lock:
+            self.stats['reloads'] += 1
+
+            # Results of older versions can never be hit again
+            self._cache.clear()
+
+        return sum(len(table) for table in tables)
+
+    # -------- QUERIES --------
+
+    def _conditions(self, params):
+        conditions = {}
+
+        for name, (field, kind) in FILTER_PARAMS.items():
+            value = params.get(name)
+            if value is None:
+                continue
+
+            if kind == 'values':
+                values = [v for v in value.split(',') if v]
+                conditions[field] = values[0] if len(values) == 1 else values
+                continue
+
+            if field == 'Amount':
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise QueryError(f"'{name}' must be a number")
+
+            low, high = conditions.get(field, (None, None))
+            conditions[field] = (value, high) if kind == 'low' else (low, value)
+
+        return conditions
+
+    def query(self, analysis, params=None):
+        """
+        Runs one analysis over the transactions matching the filter parameters
+        params: dict of str -> str, as parsed from a query string
+        Returns: JSON-ready result
+        """
+        params = dict(params or {})
+
+        if analysis not in ANALYSES:
+            raise KeyError(f"Unknown analysis '{analysis}'; use one of {sorted(ANALYSES)}")
+
+        func, extra = ANALYSES[analysis]
+
+        for name in params:
+            if name not in FILTER_PARAMS and name not in extra:
+                raise QueryError(f"Unknown parameter '{name}' for '{analysis}'")
+
+        try:
+            n = int(params['n']) if 'n' in params else None
+            threshold = int(params['threshold']) if 'threshold' in params else None
+        except ValueError:
+            raise QueryError("'n' and 'threshold' must be integers")
+
+        key = (self.snapshot.version, analysis, tuple(sorted(params.items())))
+
+        with self._cache_lock:
+            self.stats['queries'] += 1
+
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                return self._cache[key]
+
+        result = self._run(self._conditions(params), func, n, threshold)
+
+        with self._cache_lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return result
+
+    def _run(self, conditions, func, n, threshold):
+        """
+        Runs func over the warm engine when nothing is filtered out, else
+        over an engine of the indexed slice
+        Returns: JSON-ready result
+        """
+        with self._data_lock:
+            snapshot = self.snapshot
+            positions = snapshot.index.positions(**conditions) if conditions else None
+
+            if positions is None or len(positions) == len(snapshot.table):
+                return _jsonable(func(snapshot.engine, n, threshold))
+
+            subset = snapshot.table.take(positions)
+
+        return _jsonable(func(analyze(subset), n, threshold))
+
+    def health(self):
+        with self._data_lock:
+            rows = len(self.snapshot.table)
+            version = self.snapshot.version
+            files = sorted(self.sources)
+
+        with self._cache_lock:
+            return {
+                'status': 'ok',
+                'rows': rows,
+                'version': version,
+                'files': files,
+                'cached_results': len(self._cache),
+                **self.stats
+            }
+
+    def describe(self):
+        return {
+            name: {'parameters': list(extra), 'filters': list(FILTER_PARAMS)}
+            for name, (_, extra) in ANALYSES.items()
+        }
+
+
+# -------- HTTP --------
+
+class AnalyticsRequestHandler(BaseHTTPRequestHandler):
+    service = None   # set by make_server
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        try:
+            if url.path == '/health':
+                self._send(200, self.service.health())
+            elif url.path == '/analyses':
+                self._send(200, self.service.describe())
+            elif url.path.startswith('/query/'):
+                analysis = url.path[len('/query/'):]
+                self._send(200, {'analysis': analysis, 'result': self.service.query(analysis, params)})
+            else:
+                self._send(404, {'error': f"No route for {url.path}"})
+
+        except QueryError as e:
+            self._send(400, {'error': str(e)})
+        except KeyError as e:
+            self._send(404, {'error': e.args[0]})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+
+        try:
+            if url.path == '/reload':
+                added = self.service.reload()
+                self._send(200, {'added_rows': added, 'version': self.service.snapshot.version})
+            else:
+                self._send(404, {'error': f"No route for {url.path}"})
+
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+    """
+    HTTP server for the service, on host:port or on a Unix socket path
+    """
+    handler = type('Handler', (AnalyticsRequestHandler,), {'service': service})
+
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_reloader(service, interval=RELOAD_INTERVAL):
+    """
+    Polls the data directory every interval seconds on a daemon thread
+    Returns: threading.Event that stops the poller when set
+    """
+    stop = threading.Event()
+
+    def poll():
+        while not stop.wait(interval):
+            try:
+                added = service.reload()
+                if added:
+                    print(f"Reloaded: +{added} rows (version {service.snapshot.version})")
+            except Exception as e:
+                print(f"Error: Reload failed - {e}")
+
+    threading.Thread(target=poll, name='reloader', daemon=True).start()
+    return stop
+
+
+def serve(data_dir=DEFAULT_DATA_DIR, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None,
+          reload_interval=RELOAD_INTERVAL, cache_size=RESULT_CACHE_SIZE):
+    """
+    Loads the dataset and serves queries until interrupted
+    """
+    service = AnalyticsService(data_dir, cache_size)
+    server = make_server(service, host, port, unix_socket)
+    stop = start_reloader(service, reload_interval) if reload_interval else None
+
+    where = unix_socket or f"http://{host}:{server.server_address[1]}"
+    print(f"Serving {len(service.snapshot.table)} transactions from {len(service.sources)} file(s) at {where}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if stop is not None:
+            stop.set()
+        server.server_close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve sales analytics from a warm in-memory dataset')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help='serve on this Unix socket path instead of TCP')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL)
+    parser.add_argument('--cache-size', type=int, default=RESULT_CACHE_SIZE)
+    args = parser.parse_args()
+
+    serve(args.data_dir, args.host, args.port, args.unix, args.reload_interval, args.cache_size)
@@ -1,39 +1,323 @@
 # Handles API calls (e.g., external services) for the sales analytics system
 import requests
+import json
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-def fetch_all_products():
+CATALOG_URL = "https://dummyjson.com/products"
+
+# Local copy of the catalog so runs start instantly and survive API outages
+CATALOG_CACHE_FILE = 'data/product_catalog.json'
+CATALOG_TTL = 24 * 60 * 60   # seconds before the cache is revalidated
+
+# Pagination and connection pooling
+CATALOG_PAGE_SIZE = 100
+CATALOG_MAX_WORKERS = 8      # pages in flight at once (and pooled connections)
+REQUEST_TIMEOUT = 10
+REQUEST_RETRIES = 3
+RETRY_BACKOFF = 0.5          # seconds; doubled per attempt, with full jitter
+
+_session = None
+
+
+def get_session():
+    """
+    Returns the shared requests.Session, so runs reuse pooled TCP/TLS connections
+    """
+    global _session
+
+    if _session is None:
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=CATALOG_MAX_WORKERS,
+            pool_maxsize=CATALOG_MAX_WORKERS
+        )
+        _session = requests.Session()
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+
+    return _session
+
+
+def get_with_retry(url, params=None, headers=None, metrics=None):
+    """
+    GET through the shared session, retrying connection errors, 429 and 5xx
+    with jittered exponential backoff
+    Appends {'url', 'params', 'status', 'attempts', 'seconds'} to metrics if given
+    """
+    session = get_session()
+    started = time.perf_counter()
+
+    for attempt in range(1, REQUEST_RETRIES + 1):
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+
+            if response.status_code != 429 and response.status_code < 500:
+                break
+
+            if attempt == REQUEST_RETRIES:
+                response.raise_for_status()
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == REQUEST_RETRIES:
+                raise
+
+        time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1)))
+
+    if metrics is not None:
+        metrics.append({
+            'url': url,
+            'params': params,
+            'status': response.status_code,
+            'attempts': attempt,
+            'seconds': round(time.perf_counter() - started, 4)
+        })
+
+    return response
+
+
+def _clean_product(p):
+    return {
+        'id': p.get('id'),
+        'title': p.get('title'),
+        'category': p.get('category'),
+        'brand': p.get('brand'),
+        'price': p.get('price'),
+        'rating': p.get('rating')
+    }
+
+
+def fetch_all_products(url=CATALOG_URL, cache_file=CATALOG_CACHE_FILE, ttl=CATALOG_TTL,
+                       page_size=CATALOG_PAGE_SIZE, max_workers=CATALOG_MAX_WORKERS, metrics=None):
     """
     Fetches all products from DummyJSON API
+    The first page reports the catalog size; the remaining skip/limit pages, as
+    long as the first page the server returned, are fetched concurrently (at
+    most max_workers at once) over a pooled session.
+    Serves a fresh cached copy without a request; once stale, revalidates it with
+    ETag / If-Modified-Since on the first page, and falls back to the stale copy
+    if the API fails. Per-page timings are appended to metrics if given
     """
-    url = "https://dummyjson.com/products?limit=100"
+    cached = load_catalog_cache(url, cache_file) if cache_file else None
+
+    if cached and time.time() - cached['fetched_at'] < ttl:
+        print(f"Loaded {len(cached['products'])} products from cache")
+        return cached['products']
+
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    if metrics is None:
+        metrics = []
+
+    started = time.perf_counter()
 
     try:
-        response = requests.get(url, timeout=10)
+        response = get_with_retry(url, {'limit': page_size, 'skip': 0}, headers, metrics)
+
+        if response.status_code == 304 and cached:
+            cached['fetched_at'] = time.time()
+            save_catalog_cache(url, cached, cache_file)
+            print(f"Product catalog unchanged; using {len(cached['products'])} cached products")
+            return cached['products']
+
         response.raise_for_status()
 
         data = response.json()
         products = data.get("products", [])
+        total = data.get('total', len(products))
+
+        def fetch_range(skip, count):
+            # Re-requests the rest of a short page; stops at an empty one
+            found = []
+            while len(found) < count:
+                page = get_with_retry(url, {'limit': count - len(found), 'skip': skip + len(found)},
+                                      metrics=metrics)
+                page.raise_for_status()
+                items = page.json().get("products", [])
+                if not items:
+                    break
+                found.extend(items)
+            return found[:count]
+
+        # Servers may cap limit below page_size; step by what the first page held
+        step = len(products)
+        skips = range(step, total, step) if step else []
 
-        cleaned_products = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for page in pool.map(lambda skip: fetch_range(skip, min(step, total - skip)), skips):
+                products.extend(page)
 
-        for p in products:
-            cleaned_products.append({
-                'id': p.get('id'),
-                'title': p.get('title'),
-                'category': p.get('category'),
-                'brand': p.get('brand'),
-                'price': p.get('price'),
-                'rating': p.get('rating')
-            })
+        cleaned_products = [_clean_product(p) for p in products]
+
+        elapsed = time.perf_counter() - started
+        slowest = max(m['seconds'] for m in metrics)
+        print(f"Successfully fetched {len(cleaned_products)} products from API "
+              f"({len(metrics)} pages in {elapsed:.2f}s, slowest page {slowest:.2f}s)")
+
+        if cache_file:
+            save_catalog_cache(url, {
+                'fetched_at': time.time(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'products': cleaned_products
+            }, cache_file)
 
-        print(f"Successfully fetched {len(cleaned_products)} products from API")
         return cleaned_products
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"API request failed: {e}")
+
+        if cached:
+            print(f"Using stale cached catalog ({len(cached['products'])} products)")
+            return cached['products']
+
         return []
-    
+
+
+# Product catalog cache
+
+def load_catalog_cache(url, cache_file=CATALOG_CACHE_FILE):
+    """
+    Returns the cached catalog entry for url, or None
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get(url)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_catalog_cache(url, entry, cache_file=CATALOG_CACHE_FILE):
+    """
+    Stores a catalog entry for url, replacing the cache file atomically
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+
+    cache[url] = entry
+
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_file = cache_file + '.tmp'
+
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+
+    os.replace(tmp_file, cache_file)
+
+
+
+# On-demand product lookups
+
+# Per-ID cache: {"<id>": {"fetched_at": ..., "product": {...} or null}}.
+# Unknown IDs are cached as null so they are not requested again until the TTL expires
+PRODUCT_CACHE_FILE = 'data/product_cache.json'
+PRODUCT_BATCH_SIZE = 50
+
+
+def load_product_cache(cache_file=PRODUCT_CACHE_FILE):
+    """
+    Returns the per-ID product cache, empty if the file is missing or unreadable
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_product_cache(cache, cache_file=PRODUCT_CACHE_FILE):
+    """
+    Writes the per-ID product cache atomically (temp file, then rename)
+    """
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
+
+
+def fetch_products_by_id(product_ids, url=CATALOG_URL, cache_file=PRODUCT_CACHE_FILE, ttl=CATALOG_TTL,
+                         batch_size=PRODUCT_BATCH_SIZE, max_workers=CATALOG_MAX_WORKERS, metrics=None):
+    """
+    Fetches only the given numeric product IDs, serving what it can from the per-ID cache
+    Missing IDs are requested in batches, each batch concurrently over the pooled session
+    Returns: list of cleaned products that exist
+    """
+    cache = load_product_cache(cache_file) if cache_file else {}
+
+    now = time.time()
+    wanted = sorted({pid for pid in product_ids if pid is not None})
+    missing = [
+        pid for pid in wanted
+        if str(pid) not in cache or now - cache[str(pid)]['fetched_at'] >= ttl
+    ]
+
+    def fetch_one(pid):
+        response = get_with_retry(f"{url}/{pid}", metrics=metrics)
+        if response.status_code == 404:
+            return pid, None
+        response.raise_for_status()
+        return pid, _clean_product(response.json())
+
+    fetched = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for start in range(0, len(missing), batch_size):
+                for pid, product in pool.map(fetch_one, missing[start:start + batch_size]):
+                    cache[str(pid)] = {'fetched_at': time.time(), 'product': product}
+                    fetched += 1
+
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Keep whatever was fetched; stale entries still serve the rest
+        print(f"API request failed: {e}")
+
+    if fetched and cache_file:
+        save_product_cache(cache, cache_file)
+
+    print(f"Product lookups: {len(wanted)} referenced, "
+          f"{len(wanted) - len(missing)} cached, {fetched} fetched")
+
+    return [
+        cache[str(pid)]['product']
+        for pid in wanted
+        if str(pid) in cache and cache[str(pid)]['product'] is not None
+    ]
+
+
+def referenced_product_ids(transactions):
+    """
+    Distinct numeric product IDs referenced by the transactions
+    """
+    if hasattr(transactions, 'dictionary'):
+        product_ids = transactions.dictionary('ProductID')
+    else:
+        product_ids = {t.get('ProductID') for t in transactions}
+
+    return {extract_numeric_product_id(pid) for pid in product_ids} - {None}
+
+
+def fetch_referenced_products(transactions, **kwargs):
+    """
+    Builds a product mapping holding only the products the transactions reference
+    """
+    return create_product_mapping(fetch_products_by_id(referenced_product_ids(transactions), **kwargs))
 
 
     # Create Product mapping
@@ -60,18 +344,17 @@ def create_product_mapping(api_products):
     
 # Enrich sales data
  
+@lru_cache(maxsize=None)
 def extract_numeric_product_id(product_id):
     try:
         return int(product_id.replace('P', ''))
     except:
         return None
     
-def enrich_sales_data(transactions, product_mapping):
+def iter_enriched(transactions, product_mapping):
     """
-    Enriches transaction data with API product information
+    Generator stage: yields each transaction enriched with API product information
     """
-    enriched_transactions = []
-
     for t in transactions:
         enriched = t.copy()
 
@@ -89,39 +372,80 @@ def enrich_sales_data(transactions, product_mapping):
             enriched['API_Rating'] = None
             enriched['API_Match'] = False
 
-        enriched_transactions.append(enriched)
+        yield enriched
 
-    save_enriched_data(enriched_transactions)
 
-    return enriched_transactions
+def enrich_sales_data(transactions, product_mapping=None):
+    """
+    Enriches transaction data with API product information
+    Without a product_mapping only the referenced products are looked up
+    Nothing is written; pass the result (or iter_enriched) to save_enriched_data
+    """
+    if product_mapping is None:
+        # Looking up the referenced products reads the input once already,
+        # so a generator has to be materialised before that first pass
+        if not isinstance(transactions, (list, tuple)) and not hasattr(transactions, 'dictionary'):
+            transactions = list(transactions)
+
+        product_mapping = fetch_referenced_products(transactions)
+
+    return list(iter_enriched(transactions, product_mapping))
 
 # Save enriched data
 
-def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt'):
+ENRICHED_HEADER = [
+    'TransactionID', 'Date', 'ProductID', 'ProductName',
+    'Quantity', 'UnitPrice', 'CustomerID', 'Region',
+    'API_Category', 'API_Brand', 'API_Rating', 'API_Match'
+]
+
+WRITE_BLOCK_ROWS = 10000        # rows formatted per write() call
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt', atomic=True):
     """
     Saves enriched transactions back to file
+    Accepts any iterable, so enrichment can stream straight to disk; rows are
+    written in large blocks, and with atomic=True into a temp file that
+    replaces filename only once complete
+    Returns: number of rows written
     """
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
 
-    header = [
-        'TransactionID', 'Date', 'ProductID', 'ProductName',
-        'Quantity', 'UnitPrice', 'CustomerID', 'Region',
-        'API_Category', 'API_Brand', 'API_Rating', 'API_Match'
-    ]
+    target = filename + '.tmp' if atomic else filename
+    header = ENRICHED_HEADER
+    count = 0
+
+    try:
+        with open(target, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write('|'.join(header) + '\n')
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write('|'.join(header) + '\n')
+            block = []
 
-        for t in enriched_transactions:
-            row = [
-                str(t.get(col)) if t.get(col) is not None else ''
-                for col in header
-            ]
-            f.write('|'.join(row) + '\n')
+            for t in enriched_transactions:
+                values = [t.get(col) for col in header]
+                block.append('|'.join(['' if v is None else str(v) for v in values]))
 
-    print(f"Enriched data saved to {filename}")
+                if len(block) >= WRITE_BLOCK_ROWS:
+                    f.write('\n'.join(block) + '\n')
+                    count += len(block)
+                    block = []
 
+            if block:
+                f.write('\n'.join(block) + '\n')
+                count += len(block)
 
+        if atomic:
+            os.replace(target, filename)
 
+    except BaseException:
+        if atomic and os.path.exists(target):
+            os.remove(target)
+        raise
 
+    print(f"Enriched data saved to {filename}")
 
+    return count
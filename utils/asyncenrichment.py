@@ -0,0 +1,345 @@
+# Non-blocking product enrichment
+#
+# AsyncProductClient looks product IDs up concurrently on an asyncio loop:
+# at most max_concurrency requests are in flight (a bounded semaphore),
+# concurrent lookups of the same ID share one in-flight request, and every
+# call gives up after its deadline (the shared request keeps going and still
+# fills the cache). When a lookup fails or times out, a cache entry past
+# its TTL is served instead, as apihandler.fetch_products_by_id does.
+# Requests go through aiohttp when it is installed, else through the
+# blocking utils/apihandler.py session on a thread pool.
+#
+# EnrichmentService runs the client on a background thread, so ingestion
+# only hands it product IDs and keeps parsing; ingest_and_enrich streams a
+# sales file that way and enriches once the lookups are in. main.py's
+# pipeline shares one service (get_enrichment_service) between the stage
+# that validates rows, which starts the lookups, and the stage that needs
+# the products, so filtering and analysis run while requests are in flight.
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from utils.apihandler import (
+    CATALOG_MAX_WORKERS, CATALOG_TTL, CATALOG_URL, PRODUCT_CACHE_FILE, REQUEST_RETRIES,
+    REQUEST_TIMEOUT, RETRY_BACKOFF, _clean_product, create_product_mapping, enrich_sales_data,
+    get_with_retry, load_product_cache, referenced_product_ids,
+    save_product_cache
+)
+from utils.filehandler import iter_transactions, validate_and_filter_batches
+
+try:
+    import aiohttp
+except ImportError:   # requests on a thread pool
+    aiohttp = None
+
+LOOKUP_DEADLINE = REQUEST_TIMEOUT   # seconds one lookup may wait, queueing included
+
+_NETWORK_ERRORS = (requests.exceptions.RequestException, asyncio.TimeoutError, OSError, ValueError)
+if aiohttp is not None:
+    _NETWORK_ERRORS += (aiohttp.ClientError,)
+
+
+def _get_product_blocking(url):
+    """
+    One product over the pooled requests session
+    Returns: cleaned product, or None if the API does not know it
+    """
+    response = get_with_retry(url)
+
+    if response.status_code == 404:
+        return None
+
+    response.raise_for_status()
+    return _clean_product(response.json())
+
+
+class AsyncProductClient:
+    """
+    Coalescing, bounded, deadline-limited product lookups
+    Use on one event loop; close() saves what was fetched to the per-ID
+    cache shared with apihandler.fetch_products_by_id
+    """
+
+    def __init__(self, url=CATALOG_URL, max_concurrency=CATALOG_MAX_WORKERS, deadline=LOOKUP_DEADLINE,
+                 cache_file=PRODUCT_CACHE_FILE, ttl=CATALOG_TTL, use_aiohttp=None):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.use_aiohttp = aiohttp is not None if use_aiohttp is None else use_aiohttp
+
+        if self.use_aiohttp and aiohttp is None:
+            raise ValueError('use_aiohttp=True needs aiohttp installed')
+
+        self.cache = load_product_cache(cache_file) if cache_file else {}
+        self.stats = {'cache_hits': 0, 'requests': 0, 'coalesced': 0, 'timeouts': 0, 'failures': 0, 'stale': 0}
+
+        self._inflight = {}        # product ID -> task of its one request
+        self._semaphore = None     # created on the loop that uses it
+        self._session = None
+        self._executor = None
+        self._fetched = 0
+        self._last_error = None
+        self._reported = 0         # failures already reported
+
+    def _cached(self, product_id):
+        entry = self.cache.get(str(product_id))
+
+        if entry is not None and time.time() - entry['fetched_at'] < self.ttl:
+            return entry
+        return None
+
+    def _stale(self, product_id):
+        """
+        Fallback when the API cannot answer: any cached entry, however old
+        Returns: cleaned product, or None if the ID was never cached
+        """
+        entry = self.cache.get(str(product_id))
+
+        if entry is None:
+            return None
+
+        self.stats['stale'] += 1
+        return entry['product']
+
+    def report_failures(self):
+        """
+        Prints one line for the lookups that failed since the last report
+        """
+        failed = self.stats['failures'] - self._reported
+
+        if failed:
+            print(f"Warning: {failed} product lookups failed (last error: {self._last_error}); "
+                  f"{self.stats['stale']} served from the stale cache so far")
+            self._reported = self.stats['failures']
+
+    async def get(self, product_id, deadline=None):
+        """
+        Looks one numeric product ID up
+        Returns: cleaned product, or None if unknown; a failed or late lookup
+        returns the stale cache entry if there is one, else None
+        """
+        entry = self._cached(product_id)
+        if entry is not None:
+            self.stats['cache_hits'] += 1
+            return entry['product']
+
+        task = self._inflight.get(product_id)
+
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(product_id))
+            self._inflight[product_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(product_id, None))
+        else:
+            self.stats['coalesced'] += 1
+
+        try:
+            # shield: a caller giving up must not cancel the shared request
+            return await asyncio.wait_for(asyncio.shield(task), self.deadline if deadline is None else deadline)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return self._stale(product_id)
+
+    async def get_many(self, product_ids, deadline=None):
+        """
+        Returns: dict of product ID -> product (or None), looked up concurrently
+        """
+        product_ids = list(product_ids)
+        products = await asyncio.gather(*[self.get(pid, deadline) for pid in product_ids])
+        return dict(zip(product_ids, products))
+
+    async def _fetch(self, product_id):
+        if self._semaphore is None:
+            self._semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            self.stats['requests'] += 1
+            url = f"{self.url}/{product_id}"
+
+            try:
+                if self.use_aiohttp:
+                    product = await self._get_aiohttp(url)
+                else:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+                    loop = asyncio.get_running_loop()
+                    product = await loop.run_in_executor(self._executor, _get_product_blocking, url)
+
+            except _NETWORK_ERRORS as e:
+                # The cache keeps its old entry, so the next run asks again
+                self.stats['failures'] += 1
+                self._last_error = e
+                return self._stale(product_id)
+
+        self.cache[str(product_id)] = {'fetched_at': time.time(), 'product': product}
+        self._fetched += 1
+        return product
+
+    async def _get_aiohttp(self, url):
+        """
+        aiohttp counterpart of get_with_retry + _get_product_blocking
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+            )
+
+        for attempt in range(1, REQUEST_RETRIES + 1):
+            try:
+                async with self._session.get(url) as response:
+                    if response.status == 404:
+                        return None
+
+                    if response.status != 429 and response.status < 500:
+                        response.raise_for_status()
+                        return _clean_product(await response.json())
+
+                    if attempt == REQUEST_RETRIES:
+                        response.raise_for_status()
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == REQUEST_RETRIES:
+                    raise
+
+            await asyncio.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1)))
+
+    async def close(self):
+        """
+        Lets in-flight requests finish, releases connections and saves the cache
+        """
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight.values()), return_exceptions=True)
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        if self._fetched and self.cache_file:
+            save_product_cache(self.cache, self.cache_file)
+            self._fetched = 0
+
+        self.report_failures()
+
+
+class EnrichmentService:
+    """
+    An AsyncProductClient on its own event loop thread
+    prefetch() returns at once, so callers never wait on the network until
+    they ask for product_mapping(); use as a context manager
+    """
+
+    def __init__(self, **client_options):
+        self.client = AsyncProductClient(**client_options)
+        self._futures = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='enrichment', daemon=True)
+        self._thread.start()
+
+    def prefetch(self, product_ids):
+        """
+        Schedules lookups of numeric product IDs not yet requested
+        """
+        for pid in product_ids:
+            if pid is not None and pid not in self._futures:
+                self._futures[pid] = asyncio.run_coroutine_threadsafe(self.client.get(pid), self._loop)
+
+    def prefetch_transactions(self, transactions):
+        """
+        Schedules lookups of the products a batch of transactions references
+        """
+        self.prefetch(referenced_product_ids(transactions))
+
+    def product_mapping(self, product_ids=None):
+        """
+        Waits for the requested lookups (each bounded by the client's deadline)
+        Returns: product mapping as built by apihandler.create_product_mapping
+        """
+        if product_ids is None:
+            futures = dict(self._futures)
+        else:
+            self.prefetch(product_ids)
+            futures = {pid: self._futures[pid] for pid in product_ids if pid is not None}
+
+        wait(futures.values())
+        self.client.report_failures()
+
+        return create_product_mapping([
+            future.result() for future in futures.values()
+            if future.exception() is None and future.result() is not None
+        ])
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+
+        asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_service = None
+
+
+def get_enrichment_service(**client_options):
+    """
+    Returns the shared EnrichmentService, started on first use
+    client_options only apply when it is started
+    """
+    global _service
+
+    if _service is None:
+        _service = EnrichmentService(**client_options)
+
+    return _service
+
+
+def close_enrichment_service():
+    """
+    Closes the shared service, if one was started, saving its cache
+    """
+    global _service
+
+    if _service is not None:
+        _service.close()
+        _service = None
+
+
+def ingest_and_enrich(filename, chunk_size=10000, region=None, min_amount=None, max_amount=None,
+                      summary=None, **client_options):
+    """
+    Streams, validates and filters a sales file while the referenced products
+    are looked up in the background, then enriches the valid transactions
+    Counts accumulate in summary as in validate_and_filter_batches
+    Returns: (enriched transactions, lookup stats)
+    """
+    transactions = []
+
+    with EnrichmentService(**client_options) as service:
+        batches = iter_transactions(filename, chunk_size)
+
+        for batch in validate_and_filter_batches(batches, region, min_amount, max_amount, summary):
+            service.prefetch_transactions(batch)
+            transactions.extend(batch)
+
+        product_mapping = service.product_mapping()
+        stats = dict(service.client.stats)
+
+    return enrich_sales_data(transactions, product_mapping), stats
@@ -0,0 +1,229 @@
+# Compact columnar binary format for (enriched) sales data
+#
+# Layout:  MAGIC | column blocks ... | footer (JSON) | footer length (8 bytes LE) | MAGIC
+#
+# Every column is one block, optionally compressed:
+#   int / float / bool   raw array.array bytes (little-endian)
+#   category             int32 codes; the dictionary is kept in the footer
+#   string               int32 UTF-8 byte lengths followed by the joined UTF-8 bytes
+#
+# The footer records each block's offset, length, compression, min/max and
+# null count, so a reader seeks straight to the columns it needs and never
+# parses text for numbers.
+import json
+import lzma
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from utils.transactiontable import (
+    BOOL, CATEGORY, ENRICHED_SCHEMA, SCHEMA, STRING,
+    CategoryColumn, NumericColumn, StringColumn, TransactionTable
+)
+
+MAGIC = b'SALESCOL'
+FORMAT_VERSION = 1
+
+COMPRESSORS = {
+    None: (lambda data: data, lambda data: data),
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def _little_endian(values):
+    """
+    array bytes in little-endian order regardless of the host
+    """
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _column_stats(column):
+    """
+    min / max / null count for the footer
+    """
+    if column.kind == CATEGORY:
+        present = {column.dictionary[code] for code in set(column.codes)}
+        values = [v for v in present if v is not None]
+        nulls = sum(1 for code in column.codes if column.dictionary[code] is None) if None in present else 0
+    elif column.kind == STRING:
+        values = column.values
+        nulls = 0
+    else:
+        values = [v for v in column.values if v == v]   # drop NaN
+        nulls = len(column.values) - len(values)
+        if column.kind == BOOL:
+            values = [bool(v) for v in values]
+
+    return {
+        'min': min(values) if values else None,
+        'max': max(values) if values else None,
+        'nulls': nulls
+    }
+
+
+def _encode_column(column):
+    if column.kind == CATEGORY:
+        return _little_endian(column.codes)
+
+    if column.kind == STRING:
+        encoded = [value.encode('utf-8') for value in column.values]
+        return _little_endian(array('i', map(len, encoded))) + b''.join(encoded)
+
+    return _little_endian(column.values)
+
+
+def _decode_column(meta, data, rows):
+    kind = meta['kind']
+
+    if kind == CATEGORY:
+        return CategoryColumn(meta['dictionary'], _from_little_endian('i', data))
+
+    if kind == STRING:
+        split = rows * 4
+        lengths = _from_little_endian('i', data[:split])
+        values = []
+        position = split
+
+        for length in lengths:
+            values.append(data[position:position + length].decode('utf-8'))
+            position += length
+
+        return StringColumn(values)
+
+    return NumericColumn(kind, _from_little_endian(meta['typecode'], data))
+
+
+def write_columnar(transactions, filename, compression=None, schema=None):
+    """
+    Writes transactions (a TransactionTable or an iterable of dictionaries)
+    in the columnar binary format, replacing filename atomically
+    Returns: footer metadata
+    """
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Unknown compression '{compression}'; use one of {list(COMPRESSORS)}")
+
+    if not isinstance(transactions, TransactionTable):
+        transactions = list(transactions)
+        if schema is None:
+            schema = ENRICHED_SCHEMA if transactions and 'API_Match' in transactions[0] else SCHEMA
+        transactions = TransactionTable.from_transactions(transactions, schema)
+
+    compress = COMPRESSORS[compression][0]
+
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    footer = {'version': FORMAT_VERSION, 'rows': len(transactions), 'columns': []}
+    tmp_file = filename + '.tmp'
+
+    with open(tmp_file, 'wb') as f:
+        f.write(MAGIC)
+
+        for name, kind in transactions.schema:
+            column = transactions.columns[name]
+            block = compress(_encode_column(column))
+
+            meta = {
+                'name': name,
+                'kind': kind,
+                'offset': f.tell(),
+                'length': len(block),
+                'compression': compression,
+                'stats': _column_stats(column)
+            }
+
+            if kind == CATEGORY:
+                meta['dictionary'] = column.dictionary
+            elif kind != STRING:
+                meta['typecode'] = column.values.typecode
+
+            f.write(block)
+            footer['columns'].append(meta)
+
+        encoded_footer = json.dumps(footer).encode('utf-8')
+        f.write(encoded_footer)
+        f.write(struct.pack('<Q', len(encoded_footer)))
+        f.write(MAGIC)
+
+    os.replace(tmp_file, filename)
+
+    return footer
+
+
+def read_columnar_footer(filename):
+    """
+    Returns: footer metadata (row count, per-column offsets and min/max stats)
+    """
+    with open(filename, 'rb') as f:
+        return _read_footer(f, filename)
+
+
+def _read_footer(f, filename):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"'{filename}' is not a columnar sales data file")
+
+    f.seek(-(len(MAGIC) + 8), os.SEEK_END)
+    footer_length = struct.unpack('<Q', f.read(8))[0]
+
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"'{filename}' is truncated")
+
+    f.seek(-(len(MAGIC) + 8 + footer_length), os.SEEK_END)
+    footer = json.loads(f.read(footer_length).decode('utf-8'))
+
+    if footer['version'] != FORMAT_VERSION:
+        raise ValueError(f"'{filename}' uses unsupported format version {footer['version']}")
+
+    return footer
+
+
+def read_columnar(filename, columns=None):
+    """
+    Reads a columnar file back into a TransactionTable
+    Only the requested columns are read from disk; the table can be passed
+    straight to the utils/dataprocessor.py functions
+    """
+    with open(filename, 'rb') as f:
+        footer = _read_footer(f, filename)
+        metas = footer['columns']
+
+        if columns is not None:
+            known = {meta['name'] for meta in metas}
+            missing = [name for name in columns if name not in known]
+            if missing:
+                raise KeyError(f"Columns not in '{filename}': {missing}")
+            metas = [meta for meta in metas if meta['name'] in columns]
+
+        table_columns = {}
+
+        for meta in metas:
+            f.seek(meta['offset'])
+            data = COMPRESSORS[meta['compression']][1](f.read(meta['length']))
+            table_columns[meta['name']] = _decode_column(meta, data, footer['rows'])
+
+    schema = [(meta['name'], meta['kind']) for meta in metas]
+    return TransactionTable(schema, table_columns)
+
+
+def save_enriched_columnar(enriched_transactions, filename='data/enriched_sales_data.scol', compression='zlib'):
+    """
+    Columnar counterpart of apihandler.save_enriched_data
+    """
+    footer = write_columnar(enriched_transactions, filename, compression, ENRICHED_SCHEMA)
+    print(f"Enriched data saved to {filename}")
+    return footer['rows']
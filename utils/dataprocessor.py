@@ -1,238 +1,798 @@
+import heapq
 from collections import defaultdict
-from datetime import datetime
 
-def calculate_total_revenue(transactions):
+from utils.dates import day_number
+from utils.rollups import SalesCube
+from utils.sketches import HyperLogLog, KLLSketch, hash64, hll_by_group, sketch_from_state
+from utils.transactiontable import TransactionTable
+
+try:
+    import numpy as np
+except ImportError:   # fall back to the pure-Python loops below
+    np = None
+
+
+# NumPy fast path
+#
+# Used when NumPy is installed and the input is a columnar TransactionTable.
+# Sums are accumulated in row order (bincount / cumsum, never pairwise
+# reductions) and groups are emitted in order of first appearance, so every
+# rounded result is bit-identical to the loop-based path.
+
+def _use_numpy(transactions):
+    return np is not None and isinstance(transactions, TransactionTable)
+
+
+def _numpy_amounts(table):
+    return table.as_numpy('Quantity').astype(np.float64) * table.as_numpy('UnitPrice')
+
+
+def _sequential_sum(values):
+    return float(np.cumsum(values)[-1]) if len(values) else 0.0
+
+
+def _first_seen_codes(codes):
     """
-    Calculates total revenue from all transactions
+    Distinct codes present in the column, ordered by first appearance
     """
-    total_revenue = 0.0
+    present, first_index = np.unique(codes, return_index=True)
+    return present[np.argsort(first_index, kind='stable')]
 
-    for t in transactions:
-        total_revenue += t['Quantity'] * t['UnitPrice']
 
-    return round(total_revenue, 2)
+def _numpy_group_by(table, key, sums):
+    """
+    Groups rows by a dictionary-encoded column
+    sums maps output field -> per-row weights, or None to count rows
+    Returns: dict of key value -> {field: total}, in order of first appearance
+    """
+    codes = table.as_numpy(key)
+    dictionary = table.dictionary(key)
+    ngroups = len(dictionary)
 
-# Region-wise Sales Analysis
+    totals = {}
+
+    for field, weights in sums.items():
+        if weights is None:
+            totals[field] = np.bincount(codes, minlength=ngroups).tolist()
+        elif weights.dtype.kind in 'iu':
+            if len(weights) and int(np.abs(weights).max()) * len(weights) >= 2 ** 53:
+                # bincount sums in float64, which is only exact below 2**53
+                sums = np.zeros(ngroups, dtype=np.int64)
+                np.add.at(sums, codes, weights)
+                totals[field] = sums.tolist()
+            else:
+                totals[field] = np.bincount(codes, weights=weights, minlength=ngroups).astype(np.int64).tolist()
+        else:
+            totals[field] = np.bincount(codes, weights=weights, minlength=ngroups).tolist()
 
-def region_wise_sales(transactions):
+    return {
+        dictionary[code]: {field: values[code] for field, values in totals.items()}
+        for code in _first_seen_codes(codes).tolist()
+    }
+
+
+# Largest code space deduplicated with a flag array instead of a sort
+_BITMAP_DISTINCT_LIMIT = 1 << 24
+
+
+def _numpy_pair_codes(table, key, other):
     """
-    Analyzes sales by region
+    Distinct (key code, other code) pairs, packed into one int64 each
+    Returns: sorted distinct pair codes and the packing width
     """
-    region_data = defaultdict(lambda: {
-        'total_sales': 0.0,
-        'transaction_count': 0
-    })
+    width = max(len(table.dictionary(other)), 1)
+    space = max(len(table.dictionary(key)), 1) * width
+    pairs = table.as_numpy(key).astype(np.int64) * width + table.as_numpy(other)
 
-    total_sales_all = 0.0
+    if space <= _BITMAP_DISTINCT_LIMIT:
+        seen = np.zeros(space, dtype=bool)
+        seen[pairs] = True
+        return np.flatnonzero(seen), width
 
-    for t in transactions:
-        amount = t['Quantity'] * t['UnitPrice']
-        region = t['Region']
+    pairs.sort()
+    if len(pairs):
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    return pairs, width
 
-        region_data[region]['total_sales'] += amount
-        region_data[region]['transaction_count'] += 1
-        total_sales_all += amount
 
-    result = {}
+def _numpy_distinct_counts(table, key, other):
+    """
+    Number of distinct other values per key value
+    Returns: dict of key value -> count
+    """
+    pairs, width = _numpy_pair_codes(table, key, other)
+    counts = np.bincount(pairs // width, minlength=len(table.dictionary(key))).tolist()
 
-    for region, data in region_data.items():
-        percentage = (
-            (data['total_sales'] / total_sales_all) * 100
-            if total_sales_all > 0 else 0
-        )
+    keys = table.dictionary(key)
+    return {keys[code]: counts[code] for code in range(len(keys)) if counts[code]}
 
-        result[region] = {
-            'total_sales': round(data['total_sales'], 2),
-            'transaction_count': data['transaction_count'],
-            'percentage': round(percentage, 2)
-        }
 
-    # Sort by total_sales descending
-    result = dict(
-        sorted(
-            result.items(),
-            key=lambda x: x[1]['total_sales'],
-            reverse=True
-        )
-    )
+def _numpy_distinct_pairs(table, key, other):
+    """
+    Distinct (key value, other value) pairs present in the table
+    Returns: dict of key value -> set of other values
+    """
+    pairs, width = _numpy_pair_codes(table, key, other)
+
+    keys = table.dictionary(key)
+    others = table.dictionary(other)
+    result = defaultdict(set)
+
+    for code, other_code in zip((pairs // width).tolist(), (pairs % width).tolist()):
+        result[keys[code]].add(others[other_code])
 
     return result
 
 
-# (c) Top Selling Products
+def _numpy_distinct_sketches(table, key, other):
+    """
+    Approximate counterpart of _numpy_distinct_pairs
+    Returns: dict of key value -> HyperLogLog of other values
+    """
+    pairs, width = _numpy_pair_codes(table, key, other)
 
-def top_selling_products(transactions, n=5):
+    # Each distinct value is hashed once, not once per row
+    hashes = np.array([hash64(value) for value in table.dictionary(other)], dtype=np.uint64)
+    sketches = hll_by_group(pairs // width, hashes[pairs % width])
+
+    keys = table.dictionary(key)
+    return {keys[code]: sketch for code, sketch in sketches.items()}
+
+
+def _numpy_quantile_sketches(table, key, values):
     """
-    Finds top n products by total quantity sold
+    Returns: dict of key value -> KLLSketch of that group's values, in row order
     """
-    product_data = defaultdict(lambda: {
-        'quantity': 0,
-        'revenue': 0.0
-    })
+    codes = table.as_numpy(key)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(table.dictionary(key))))))
+    grouped = values[order]
 
-    for t in transactions:
-        name = t['ProductName']
-        qty = t['Quantity']
-        revenue = qty * t['UnitPrice']
+    keys = table.dictionary(key)
+    sketches = {}
 
-        product_data[name]['quantity'] += qty
-        product_data[name]['revenue'] += revenue
+    for code in range(len(keys)):
+        start, stop = int(bounds[code]), int(bounds[code + 1])
+        if start < stop:
+            sketch = sketches[keys[code]] = KLLSketch()
+            sketch.update(grouped[start:stop].tolist())
 
-    aggregated = [
-        (name,
-         data['quantity'],
-         round(data['revenue'], 2))
-        for name, data in product_data.items()
-    ]
+    return sketches
 
-    aggregated.sort(key=lambda x: x[1], reverse=True)
 
-    return aggregated[:n]
+# Top-k selection
+#
+# Report sections print a handful of rows, so ranked results asked for with
+# n are selected in O(n log k) with a heap (argpartition for large NumPy
+# inputs) instead of sorting every group. Ties keep first-seen order,
+# exactly like the stable sorts they replace.
 
+# Below this many keys a heap beats building an array
+_ARGPARTITION_MIN = 4096
 
-# (d) Customer Purchase Analysis
 
-def customer_analysis(transactions):
+def top_k_indices(scores, k, reverse=True):
     """
-    Analyzes customer purchase patterns
+    Positions of the k best scores, best first (largest when reverse=True)
+    Same result as sorted(range(len(scores)), key=scores.__getitem__, reverse=reverse)[:k]
     """
-    customer_data = defaultdict(lambda: {
-        'total_spent': 0.0,
-        'purchase_count': 0,
-        'products': set()
-    })
+    n = len(scores)
+    k = max(0, min(k, n))
 
-    for t in transactions:
-        customer = t['CustomerID']
-        amount = t['Quantity'] * t['UnitPrice']
+    if k == 0:
+        return []
 
-        customer_data[customer]['total_spent'] += amount
-        customer_data[customer]['purchase_count'] += 1
-        customer_data[customer]['products'].add(t['ProductName'])
+    if k == n:
+        return sorted(range(n), key=scores.__getitem__, reverse=reverse)
 
-    result = {}
+    if np is None or n < _ARGPARTITION_MIN:
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(k, range(n), key=scores.__getitem__)
 
-    for customer, data in customer_data.items():
-        avg_value = (
-            data['total_spent'] / data['purchase_count']
-            if data['purchase_count'] > 0 else 0
-        )
+    values = np.asarray(scores)
+    if reverse:
+        values = -values
+
+    # Everything tied with the k-th score is a candidate; a stable sort of
+    # the candidates then breaks ties by position
+    kth = np.partition(values, k - 1)[k - 1]
+    candidates = np.flatnonzero(values <= kth)
+    order = candidates[np.argsort(values[candidates], kind='stable')]
 
-        result[customer] = {
-            'total_spent': round(data['total_spent'], 2),
-            'purchase_count': data['purchase_count'],
-            'avg_order_value': round(avg_value, 2),
-            'products_bought': sorted(list(data['products']))
+    return order[:k].tolist()
+
+
+# One-pass analytics engine
+#
+# Every analysis below is a view over the group-bys held by an
+# AnalyticsEngine. Build one engine per dataset and pass it to the functions
+# in place of the transactions to get a whole report out of a single scan;
+# passing raw transactions still works and scans only for the groups needed.
+
+ALL_GROUPS = ('region', 'product', 'customer', 'date')
+
+
+class AnalyticsEngine:
+    """
+    Computes the region, product, customer and date group-bys in one scan
+    With mergeable=True the state keeps exact distinct sets everywhere, so
+    engines built over separate batches can be merged and serialized
+    With approximate=True distinct sets become HyperLogLog sketches and
+    regions and dates also keep a KLL sketch of order values, so memory stays
+    bounded; customer_analysis then reports unique_products instead of
+    products_bought, and order_value_percentiles becomes available
+    With cube=True a SalesCube (utils/rollups.py) is kept alongside: it
+    serves daily_sales_trend, find_peak_sales_day and rollup, and is merged
+    and serialized with the rest of the state
+    """
+
+    def __init__(self, transactions, groups=ALL_GROUPS, mergeable=False, approximate=False, cube=False):
+        if cube and approximate:
+            raise ValueError('A sales cube keeps exact customer sets; build it with approximate=False')
+
+        if cube and not isinstance(transactions, (list, TransactionTable)):
+            transactions = list(transactions)   # scanned twice
+
+        self.groups = tuple(groups)
+        self.mergeable = mergeable
+        self.approximate = approximate
+        self.total_revenue = 0.0
+        self.transaction_count = 0
+        self.cube = SalesCube(transactions) if cube else None
+
+        self.regions = {} if 'region' in self.groups else None
+        self.products = {} if 'product' in self.groups else None
+        self.customers = {} if 'customer' in self.groups else None
+        self.dates = {} if 'date' in self.groups else None
+
+        if _use_numpy(transactions):
+            self._scan_numpy(transactions)
+        else:
+            self._scan(transactions)
+
+    def _scan(self, transactions):
+        regions = self.regions
+        products = self.products
+        customers = self.customers
+        dates = self.dates
+
+        approximate = self.approximate
+        distinct = HyperLogLog if approximate else set
+
+        total_revenue = 0.0
+        count = 0
+
+        for t in transactions:
+            qty = t['Quantity']
+            amount = qty * t['UnitPrice']
+
+            total_revenue += amount
+            count += 1
+
+            if regions is not None:
+                data = regions.get(t['Region'])
+                if data is None:
+                    data = regions[t['Region']] = {'total_sales': 0.0, 'transaction_count': 0}
+                    if approximate:
+                        data['order_values'] = KLLSketch()
+                data['total_sales'] += amount
+                data['transaction_count'] += 1
+                if approximate:
+                    data['order_values'].add(amount)
+
+            if products is not None:
+                data = products.get(t['ProductName'])
+                if data is None:
+                    data = products[t['ProductName']] = {'quantity': 0, 'revenue': 0.0}
+                data['quantity'] += qty
+                data['revenue'] += amount
+
+            if customers is not None:
+                data = customers.get(t['CustomerID'])
+                if data is None:
+                    data = customers[t['CustomerID']] = {
+                        'total_spent': 0.0, 'purchase_count': 0, 'products': distinct()
+                    }
+                data['total_spent'] += amount
+                data['purchase_count'] += 1
+                data['products'].add(t['ProductName'])
+
+            if dates is not None:
+                data = dates.get(t['Date'])
+                if data is None:
+                    data = dates[t['Date']] = {
+                        'revenue': 0.0, 'transaction_count': 0, 'customers': distinct()
+                    }
+                    if approximate:
+                        data['order_values'] = KLLSketch()
+                data['revenue'] += amount
+                data['transaction_count'] += 1
+                data['customers'].add(t['CustomerID'])
+                if approximate:
+                    data['order_values'].add(amount)
+
+        self.total_revenue = total_revenue
+        self.transaction_count = count
+
+    def _scan_numpy(self, table):
+        amounts = _numpy_amounts(table)
+
+        self.total_revenue = _sequential_sum(amounts)
+        self.transaction_count = len(table)
+
+        if self.regions is not None:
+            self.regions = _numpy_group_by(table, 'Region', {
+                'total_sales': amounts,
+                'transaction_count': None
+            })
+            if self.approximate:
+                self._attach(self.regions, 'order_values', _numpy_quantile_sketches(table, 'Region', amounts))
+
+        if self.products is not None:
+            self.products = _numpy_group_by(table, 'ProductName', {
+                'quantity': table.as_numpy('Quantity'),
+                'revenue': amounts
+            })
+
+        if self.customers is not None:
+            self.customers = _numpy_group_by(table, 'CustomerID', {
+                'total_spent': amounts,
+                'purchase_count': None
+            })
+            if self.approximate:
+                products = _numpy_distinct_sketches(table, 'CustomerID', 'ProductName')
+            else:
+                products = _numpy_distinct_pairs(table, 'CustomerID', 'ProductName')
+
+            self._attach(self.customers, 'products', products)
+
+        if self.dates is not None:
+            self.dates = _numpy_group_by(table, 'Date', {
+                'revenue': amounts,
+                'transaction_count': None
+            })
+            if self.approximate:
+                self._attach(self.dates, 'customers', _numpy_distinct_sketches(table, 'Date', 'CustomerID'))
+                self._attach(self.dates, 'order_values', _numpy_quantile_sketches(table, 'Date', amounts))
+
+            elif self.mergeable:
+                self._attach(self.dates, 'customers', _numpy_distinct_pairs(table, 'Date', 'CustomerID'))
+
+            else:
+                self._attach(self.dates, 'unique_customers', _numpy_distinct_counts(table, 'Date', 'CustomerID'))
+
+    @staticmethod
+    def _attach(groups, field, values):
+        for key, data in groups.items():
+            data[field] = values[key]
+
+    def _require(self, group):
+        if group not in self.groups:
+            raise ValueError(f"AnalyticsEngine was built without the '{group}' group")
+
+    # Partial states
+    #
+    # A mergeable engine is a partial aggregate: sums, counts and exact
+    # distinct sets per group. Merging adds the sums, unions the sets and
+    # keeps first-appearance order, so merging engines built over
+    # consecutive batches gives the same report as one scan over all of them
+    # (totals may differ from a single scan in the last floating-point bit).
+    # In approximate mode the distinct sets are HyperLogLog sketches and
+    # order values are KLL sketches; both merge the same way.
+
+    _SET_FIELDS = {'customers': 'products', 'dates': 'customers'}
+
+    _SKETCH_FIELDS = ('order_values',)
+
+    def merge(self, other):
+        """
+        Folds another engine's partial state into this one
+        Returns: self
+        """
+        if set(other.groups) != set(self.groups):
+            raise ValueError('Cannot merge engines built over different groups')
+
+        if not (self.mergeable and other.mergeable):
+            raise ValueError('Only engines built with mergeable=True can be merged')
+
+        if self.approximate != other.approximate:
+            raise ValueError('Cannot merge approximate and exact engines')
+
+        if (self.cube is None) != (other.cube is None):
+            raise ValueError('Cannot merge an engine with a sales cube and one without')
+
+        if self.cube is not None:
+            self.cube.merge(other.cube)
+
+        self.total_revenue += other.total_revenue
+        self.transaction_count += other.transaction_count
+
+        for attr in ('regions', 'products', 'customers', 'dates'):
+            mine = getattr(self, attr)
+            theirs = getattr(other, attr)
+
+            if mine is None:
+                continue
+
+            set_field = self._SET_FIELDS.get(attr)
+
+            for key, data in theirs.items():
+                target = mine.get(key)
+
+                if target is None:
+                    target = mine[key] = {
+                        field: (type(value)() if field == set_field or field in self._SKETCH_FIELDS else 0)
+                        for field, value in data.items()
+                    }
+
+                for field, value in data.items():
+                    if field == set_field:
+                        target[field] |= value
+                    elif field in self._SKETCH_FIELDS:
+                        target[field].merge(value)
+                    else:
+                        target[field] += value
+
+        return self
+
+    def to_state(self):
+        """
+        Returns: JSON-serializable partial state
+        """
+        if not self.mergeable:
+            raise ValueError('Only engines built with mergeable=True have a partial state')
+
+        state = {
+            'groups': list(self.groups),
+            'approximate': self.approximate,
+            'total_revenue': self.total_revenue,
+            'transaction_count': self.transaction_count
         }
 
-    # Sort by total_spent descending
-    result = dict(
-        sorted(
-            result.items(),
-            key=lambda x: x[1]['total_spent'],
-            reverse=True
+        for attr in ('regions', 'products', 'customers', 'dates'):
+            groups = getattr(self, attr)
+
+            if groups is None:
+                continue
+
+            set_field = self._SET_FIELDS.get(attr)
+            state[attr] = {
+                key: {
+                    field: (
+                        (sorted(value) if isinstance(value, set) else value.to_state())
+                        if field == set_field or field in self._SKETCH_FIELDS else value
+                    )
+                    for field, value in data.items()
+                }
+                for key, data in groups.items()
+            }
+
+        if self.cube is not None:
+            state['cube'] = self.cube.to_state()
+
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Rebuilds a mergeable engine from to_state() output
+        """
+        engine = cls([], state['groups'], mergeable=True, approximate=state.get('approximate', False))
+        engine.total_revenue = state['total_revenue']
+        engine.transaction_count = state['transaction_count']
+
+        for attr in ('regions', 'products', 'customers', 'dates'):
+            if attr not in state:
+                continue
+
+            set_field = cls._SET_FIELDS.get(attr)
+            setattr(engine, attr, {
+                key: {
+                    field: (
+                        (set(value) if isinstance(value, list) else sketch_from_state(value))
+                        if field == set_field or field in cls._SKETCH_FIELDS else value
+                    )
+                    for field, value in data.items()
+                }
+                for key, data in state[attr].items()
+            })
+
+        if 'cube' in state:
+            engine.cube = SalesCube.from_state(state['cube'])
+
+        return engine
+
+    def calculate_total_revenue(self):
+        return round(self.total_revenue, 2)
+
+    def region_wise_sales(self, n=None):
+        self._require('region')
+
+        names = list(self.regions)
+        regions = self.regions
+
+        # Ranked by total_sales descending; n keeps only the n best
+        best = top_k_indices(
+            [round(data['total_sales'], 2) for data in regions.values()],
+            len(names) if n is None else n
         )
-    )
 
-    return result
+        result = {}
 
-# Daily Sales Trend
+        for i in best:
+            data = regions[names[i]]
+            percentage = (
+                (data['total_sales'] / self.total_revenue) * 100
+                if self.total_revenue > 0 else 0
+            )
 
-def daily_sales_trend(transactions):
+            result[names[i]] = {
+                'total_sales': round(data['total_sales'], 2),
+                'transaction_count': data['transaction_count'],
+                'percentage': round(percentage, 2)
+            }
+
+        return result
+
+    def top_selling_products(self, n=5):
+        self._require('product')
+
+        names = list(self.products)
+        products = self.products
+
+        # Select the n best by quantity instead of sorting every product
+        best = top_k_indices([data['quantity'] for data in products.values()], n)
+
+        return [
+            (names[i],
+             products[names[i]]['quantity'],
+             round(products[names[i]]['revenue'], 2))
+            for i in best
+        ]
+
+    def customer_analysis(self, n=None):
+        self._require('customer')
+
+        names = list(self.customers)
+        customers = self.customers
+
+        # Ranked by total_spent descending; n keeps only the n best
+        best = top_k_indices(
+            [round(data['total_spent'], 2) for data in customers.values()],
+            len(names) if n is None else n
+        )
+
+        result = {}
+
+        for i in best:
+            data = customers[names[i]]
+            avg_value = (
+                data['total_spent'] / data['purchase_count']
+                if data['purchase_count'] > 0 else 0
+            )
+
+            entry = {
+                'total_spent': round(data['total_spent'], 2),
+                'purchase_count': data['purchase_count'],
+                'avg_order_value': round(avg_value, 2)
+            }
+
+            if isinstance(data['products'], HyperLogLog):
+                entry['unique_products'] = data['products'].count()
+            else:
+                entry['products_bought'] = sorted(list(data['products']))
+
+            result[names[i]] = entry
+
+        return result
+
+    def daily_sales_trend(self):
+        if self.cube is not None:
+            return self.cube.daily_sales_trend()
+
+        self._require('date')
+
+        result = {}
+
+        # Chronological; each date string is parsed once, invalid dates sort first
+        for date in sorted(self.dates.keys(), key=day_number):
+            data = self.dates[date]
+
+            unique_customers = (
+                data['unique_customers'] if 'unique_customers' in data
+                else len(data['customers'])
+            )
+
+            result[date] = {
+                'revenue': round(data['revenue'], 2),
+                'transaction_count': data['transaction_count'],
+                'unique_customers': unique_customers
+            }
+
+        return result
+
+    def find_peak_sales_day(self):
+        if self.cube is not None:
+            return self.cube.find_peak_sales_day()
+
+        self._require('date')
+
+        peak_date = None
+        max_revenue = 0.0
+        peak_count = 0
+
+        for date, data in self.dates.items():
+            if data['revenue'] > max_revenue:
+                max_revenue = data['revenue']
+                peak_date = date
+                peak_count = data['transaction_count']
+
+        return (
+            peak_date,
+            round(max_revenue, 2),
+            peak_count
+        )
+
+    def rollup(self, bucket='week', by=()):
+        if self.cube is None:
+            raise ValueError('rollup needs an engine built with cube=True')
+        return self.cube.rollup(bucket, by)
+
+    def order_value_percentiles(self, group='region', percentiles=(50, 95, 99)):
+        if not self.approximate:
+            raise ValueError('order_value_percentiles needs an engine built with approximate=True')
+
+        groups = {'region': self.regions, 'date': self.dates}.get(group)
+        if groups is None:
+            raise ValueError(f"Order value percentiles are kept per 'region' and 'date', not '{group}'")
+        self._require(group)
+
+        keys = list(groups)
+        if group == 'date':
+            keys.sort(key=day_number)
+
+        fractions = [p / 100 for p in percentiles]
+        result = {}
+
+        for key in keys:
+            values = groups[key]['order_values'].quantiles(fractions)
+            result[key] = {
+                f"p{p:g}": round(value, 2)
+                for p, value in zip(percentiles, values)
+            }
+
+        return result
+
+    def low_performing_products(self, threshold=10, n=None):
+        self._require('product')
+
+        low_products = [
+            (
+                name,
+                data['quantity'],
+                data['revenue']
+            )
+            for name, data in self.products.items()
+            if data['quantity'] < threshold
+        ]
+
+        # Lowest quantity first; n keeps only the n lowest
+        lowest = top_k_indices(
+            [quantity for _, quantity, _ in low_products],
+            len(low_products) if n is None else n,
+            reverse=False
+        )
+
+        return [
+            (low_products[i][0], low_products[i][1], round(low_products[i][2], 2))
+            for i in lowest
+        ]
+
+
+def analyze(transactions, groups=ALL_GROUPS, approximate=False, cube=False):
     """
-    Analyzes sales trends by date
+    Scans transactions once and returns an AnalyticsEngine
+    Pass the engine to the functions below to reuse the scan
+    approximate=True trades exact distinct counts for bounded memory;
+    cube=True also materializes a SalesCube for trends and rollups
     """
-    daily_data = defaultdict(lambda: {
-        'revenue': 0.0,
-        'transaction_count': 0,
-        'customers': set()
-    })
+    return AnalyticsEngine(transactions, groups, approximate=approximate, cube=cube)
 
-    for t in transactions:
-        date = t['Date']
-        amount = t['Quantity'] * t['UnitPrice']
 
-        daily_data[date]['revenue'] += amount
-        daily_data[date]['transaction_count'] += 1
-        daily_data[date]['customers'].add(t['CustomerID'])
+def _engine(transactions, *groups):
+    if isinstance(transactions, AnalyticsEngine):
+        return transactions
+    return AnalyticsEngine(transactions, groups)
 
-    result = {}
 
-    for date in sorted(daily_data.keys(), key=lambda d: datetime.strptime(d, '%Y-%m-%d')):
-        data = daily_data[date]
+def calculate_total_revenue(transactions):
+    """
+    Calculates total revenue from all transactions
+    """
+    return _engine(transactions).calculate_total_revenue()
 
-        result[date] = {
-            'revenue': round(data['revenue'], 2),
-            'transaction_count': data['transaction_count'],
-            'unique_customers': len(data['customers'])
-        }
+# Region-wise Sales Analysis
 
-    return result
+def region_wise_sales(transactions, n=None):
+    """
+    Analyzes sales by region
+    Returns: dict ordered by total_sales descending; n keeps the n best regions
+    """
+    return _engine(transactions, 'region').region_wise_sales(n)
 
-# Peak Sales Day
 
-def find_peak_sales_day(transactions):
+# (c) Top Selling Products
+
+def top_selling_products(transactions, n=5):
     """
-    Identifies the date with highest revenue
+    Finds top n products by total quantity sold
     """
-    daily_totals = defaultdict(lambda: {
-        'revenue': 0.0,
-        'transaction_count': 0
-    })
+    return _engine(transactions, 'product').top_selling_products(n)
 
-    for t in transactions:
-        date = t['Date']
-        amount = t['Quantity'] * t['UnitPrice']
 
-        daily_totals[date]['revenue'] += amount
-        daily_totals[date]['transaction_count'] += 1
+# (d) Customer Purchase Analysis
 
-    peak_date = None
-    max_revenue = 0.0
+def customer_analysis(transactions, n=None):
+    """
+    Analyzes customer purchase patterns
+    Returns: dict ordered by total_spent descending; n keeps the n best customers
+    """
+    return _engine(transactions, 'customer').customer_analysis(n)
 
-    for date, data in daily_totals.items():
-        if data['revenue'] > max_revenue:
-            max_revenue = data['revenue']
-            peak_date = date
+# Daily Sales Trend
 
-    return (
-        peak_date,
-        round(max_revenue, 2),
-        daily_totals[peak_date]['transaction_count']
-    )
+def daily_sales_trend(transactions):
+    """
+    Analyzes sales trends by date
+    A SalesCube (utils/rollups.py), or an engine holding one, answers from
+    its day table without a scan
+    """
+    if isinstance(transactions, SalesCube):
+        return transactions.daily_sales_trend()
+    return _engine(transactions, 'date').daily_sales_trend()
 
-# Low Performing Products
+# Peak Sales Day
 
-def low_performing_products(transactions, threshold=10):
+def find_peak_sales_day(transactions):
     """
-    Identifies products with low sales
+    Identifies the date with highest revenue
     """
-    product_data = defaultdict(lambda: {
-        'quantity': 0,
-        'revenue': 0.0
-    })
+    if isinstance(transactions, SalesCube):
+        return transactions.find_peak_sales_day()
+    return _engine(transactions, 'date').find_peak_sales_day()
 
-    for t in transactions:
-        name = t['ProductName']
-        qty = t['Quantity']
-        revenue = qty * t['UnitPrice']
+# Time-bucketed Rollups
 
-        product_data[name]['quantity'] += qty
-        product_data[name]['revenue'] += revenue
+def sales_rollup(transactions, bucket='week', by=()):
+    """
+    Revenue, quantity and transaction count per week / month / quarter / year,
+    optionally by 'region' and/or 'product' (see SalesCube.rollup)
+    """
+    if isinstance(transactions, SalesCube):
+        return transactions.rollup(bucket, by)
+    if isinstance(transactions, AnalyticsEngine) and transactions.cube is not None:
+        return transactions.rollup(bucket, by)
+    return SalesCube(transactions).rollup(bucket, by)
 
-    low_products = [
-        (
-            name,
-            data['quantity'],
-            round(data['revenue'], 2)
-        )
-        for name, data in product_data.items()
-        if data['quantity'] < threshold
-    ]
+# Order Value Percentiles
+
+def order_value_percentiles(transactions, group='region', percentiles=(50, 95, 99)):
+    """
+    Approximate order-value percentiles per region or per date
+    Returns: dict of key -> {'p50': value, ...}
+    """
+    if not isinstance(transactions, AnalyticsEngine):
+        transactions = AnalyticsEngine(transactions, (group,), approximate=True)
+    return transactions.order_value_percentiles(group, percentiles)
 
-    low_products.sort(key=lambda x: x[1])
+# Low Performing Products
 
-    return low_products
+def low_performing_products(transactions, threshold=10, n=None):
+    """
+    Identifies products with low sales
+    n limits the result to the n lowest
+    """
+    return _engine(transactions, 'product').low_performing_products(threshold, n)
 
 
 def load_transactions(file_path):
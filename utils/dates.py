@@ -0,0 +1,34 @@
+# Parse-once date handling
+#
+# Dates arrive as 'YYYY-MM-DD' strings and a file holds only a few hundred
+# distinct ones, so each distinct string is parsed once (memoized) into a day
+# number: the proleptic Gregorian ordinal of the date. Sorting, range filters
+# and weekly / monthly rollups then work on plain integers.
+from datetime import date, datetime
+from functools import lru_cache
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Day number of a date string that does not parse; real ordinals start at 1
+INVALID_DAY = 0
+
+
+@lru_cache(maxsize=1 << 16)
+def day_number(value):
+    """
+    Parses a date string once
+    Returns: day number, or INVALID_DAY if value is not a valid date
+    """
+    try:
+        return datetime.strptime(value, DATE_FORMAT).toordinal()
+    except (TypeError, ValueError):
+        return INVALID_DAY
+
+
+def day_string(day):
+    """
+    Returns: 'YYYY-MM-DD' for a day number, None for INVALID_DAY
+    """
+    if day == INVALID_DAY:
+        return None
+    return date.fromordinal(day).strftime(DATE_FORMAT)
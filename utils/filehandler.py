@@ -1,47 +1,167 @@
-def read_sales_data(filename):
+import codecs
+import os
+
+from utils.transactiontable import SCHEMA, TransactionTable
+from utils.validation import DEFAULT_VALIDATOR
+
+ENCODINGS = ['utf-8', 'latin-1', 'cp1252']
+
+# Bytes sampled from the start of a file to pick its encoding
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# (path, size, mtime) -> encoding chosen for that exact file version
+_encoding_cache = {}
+
+
+def detect_encoding(filename, sample_size=ENCODING_SAMPLE_SIZE):
     """
-    Reads sales data from file handling encoding issues
-    Returns: list of raw lines (strings)
+    Picks the first supported encoding that decodes a sample of the file
+    Returns: encoding name, cached per file path, size and mtime
     """
 
-    encodings = ['utf-8', 'latin-1', 'cp1252']
-
-    for enc in encodings:
-        try:
-            with open(filename, 'r', encoding=enc) as file:
-                lines = file.readlines()
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
 
-                # Skip header and remove empty lines
-                raw_lines = [
-                    line.strip()
-                    for line in lines[1:]
-                    if line.strip()
-                ]
+    if key in _encoding_cache:
+        return _encoding_cache[key]
 
-                # Ensure 50–100 records only
-                if len(raw_lines) < 50:
-                    print("Warning: Less than 50 records found.")
-                    return raw_lines
+    with open(filename, 'rb') as file:
+        sample = file.read(sample_size)
 
-                return raw_lines[:80]   # safe, deterministic slice
+    # A sample cut short by the file end is complete; otherwise the last
+    # multi-byte character may be split and must not count as an error
+    final = len(sample) < sample_size
+    encoding = ENCODINGS[-1]
 
+    for enc in ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(sample, final=final)
+            encoding = enc
+            break
         except UnicodeDecodeError:
             continue
-        except FileNotFoundError:
-            print(f"Error: File '{filename}' not found.")
-            return []
 
-    print("Error: Unable to read file with supported encodings.")
-    return []
+    _encoding_cache[key] = encoding
+    return encoding
+
+
+def read_sales_data_chunks(filename, chunk_size=10000, limit=None, offset=0, cursor=None, end=None):
+    """
+    Streams sales data from file in batches, handling encoding issues
+    offset resumes reading at a byte position (the header is only skipped at 0)
+    and end stops before the first line starting at or after it;
+    if a cursor dict is given, cursor['offset'] tracks the bytes consumed so far
+    and a last line without a newline (still being written) is left for the
+    next resume instead of being read
+    Yields: lists of at most chunk_size raw lines (strings)
+    """
+
+    try:
+        encoding = detect_encoding(filename)
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return
+
+    decode = codecs.getdecoder(encoding)
+
+    resumable = cursor is not None
+
+    if cursor is None:
+        cursor = {}
+
+    with open(filename, 'rb') as file:
+        if offset:
+            file.seek(offset)
+        else:
+            offset = len(file.readline())   # skip header
+
+        cursor['offset'] = offset
+
+        batch = []
+        seen = 0
+
+        for raw in file:
+            if end is not None and offset >= end:
+                break
+
+            if resumable and not raw.endswith(b'\n'):
+                break
+
+            try:
+                line = decode(raw)[0]
+            except UnicodeDecodeError as e:
+                # The sample looked fine but this line does not; report where
+                # and carry on with the next codec instead of re-reading
+                fallback = ENCODINGS[min(ENCODINGS.index(encoding) + 1, len(ENCODINGS) - 1)]
+                print(
+                    f"Error: Cannot decode '{filename}' as {encoding} "
+                    f"at byte offset {offset + e.start}; switching to {fallback}."
+                )
+                encoding = fallback
+                decode = codecs.getdecoder(encoding)
+                _remember_encoding(filename, encoding)
+                line = decode(raw, 'replace')[0]
+
+            line = line.strip()
+
+            if line:
+                seen += 1
+
+                if limit is not None and seen > limit:
+                    break
+
+                batch.append(line)
+
+            offset += len(raw)
+
+            if len(batch) >= chunk_size:
+                cursor['offset'] = offset
+                yield batch
+                batch = []
+
+        cursor['offset'] = offset
+
+        if batch:
+            yield batch
+
+
+def _remember_encoding(filename, encoding):
+    """
+    Overrides the cached encoding decision for the current file version
+    """
+
+    stat = os.stat(filename)
+    _encoding_cache[(os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)] = encoding
+
+
+def read_sales_data(filename, limit=None, chunk_size=10000):
+    """
+    Reads sales data from file handling encoding issues
+    Returns: list of raw lines (strings), at most limit lines if given
+    """
+
+    raw_lines = []
+
+    for batch in read_sales_data_chunks(filename, chunk_size, limit):
+        raw_lines.extend(batch)
+
+    if len(raw_lines) < 50:
+        print("Warning: Less than 50 records found.")
+
+    return raw_lines
 
 
 # PART 2: Parsing raw data into dictionaries
 
-def parse_transactions(raw_lines):
+def parse_transactions(raw_lines, as_table=False):
     """
     Parses raw lines into clean list of dictionaries
+    With as_table=True the rows are stored in a columnar TransactionTable
     """
 
+    if as_table:
+        return _parse_table(raw_lines)
+
     transactions = []
 
     for line in raw_lines:
@@ -70,72 +190,93 @@ def parse_transactions(raw_lines):
     return transactions
 
 
+def _parse_table(raw_lines):
+    """
+    Table flavour of parse_transactions
+    Fields go straight into per-column lists (no dict per row), and the
+    string columns are dictionary-encoded a whole column at a time
+    """
+
+    columns = {name: [] for name, _ in SCHEMA}
+
+    # Bound appends, one per column, in SCHEMA order
+    add_id, add_date, add_product, add_name, add_quantity, add_price, add_customer, add_region = (
+        values.append for values in columns.values()
+    )
+
+    for line in raw_lines:
+        parts = line.split('|')
+
+        if len(parts) != 8:
+            continue
+
+        try:
+            quantity = int(parts[4].replace(',', ''))
+            price = float(parts[5].replace(',', ''))
+        except ValueError:
+            continue
+
+        add_id(parts[0].strip())
+        add_date(parts[1].strip())
+        add_product(parts[2].strip())
+        add_name(parts[3].replace(',', ' ').strip())
+        add_quantity(quantity)
+        add_price(price)
+        add_customer(parts[6].strip())
+        add_region(parts[7].strip())
+
+    return TransactionTable.from_columns(columns)
+
+
+def iter_transactions(filename, chunk_size=10000, limit=None, as_table=False, offset=0, cursor=None):
+    """
+    Streams parsed transactions from file
+    Yields: lists of transaction dictionaries (or tables), one per raw batch
+    """
+
+    for batch in read_sales_data_chunks(filename, chunk_size, limit, offset, cursor):
+        yield parse_transactions(batch, as_table)
+
+
 # PART 3: VALIDATION AND FILTERING
 
 def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
     """
     Validates transactions and applies optional filters
+    Rules live in utils/validation.py; one pass validates, filters and
+    collects the regions / amount range shown below
     """
 
-    summary = {
-        'total_input': len(transactions),
-        'invalid': 0,
-        'filtered_by_region': 0,
-        'filtered_by_amount': 0,
-        'final_count': 0
-    }
-
-    valid_stage = []
+    summary = DEFAULT_VALIDATOR.new_summary()
+    final_transactions, stats = DEFAULT_VALIDATOR.run(transactions, region, min_amount, max_amount, summary)
 
     # Display available regions
-    regions = sorted(set(t['Region'] for t in transactions if t.get('Region')))
-    print("Available Regions:", regions)
+    print("Available Regions:", sorted(stats['regions']))
 
     # Display transaction amount range
-    amounts = [
-        t['Quantity'] * t['UnitPrice']
-        for t in transactions
-        if t['Quantity'] > 0 and t['UnitPrice'] > 0
-    ]
-
-    if amounts:
-        print(f"Transaction Amount Range: {min(amounts)} to {max(amounts)}")
-
-    # -------- VALIDATION STAGE --------
-    for t in transactions:
-        if (
-            not t.get('TransactionID', '').startswith('T') or
-            not t.get('ProductID', '').startswith('P') or
-            not t.get('CustomerID', '').startswith('C') or
-            t.get('Quantity', 0) <= 0 or
-            t.get('UnitPrice', 0) <= 0 or
-            not t.get('Region')
-        ):
-            summary['invalid'] += 1
-        else:
-            valid_stage.append(t)
+    amount_min, amount_max = stats['amount_range']
 
-    # -------- REGION FILTER --------
-    region_stage = []
-    for t in valid_stage:
-        if region and t['Region'] != region:
-            summary['filtered_by_region'] += 1
-        else:
-            region_stage.append(t)
+    if amount_min is not None:
+        print(f"Transaction Amount Range: {amount_min} to {amount_max}")
 
-    # -------- AMOUNT FILTER --------
-    final_transactions = []
-    for t in region_stage:
-        amount = t['Quantity'] * t['UnitPrice']
+    return final_transactions, summary['invalid'], summary
 
-        if min_amount is not None and amount < min_amount:
-            summary['filtered_by_amount'] += 1
-        elif max_amount is not None and amount > max_amount:
-            summary['filtered_by_amount'] += 1
-        else:
-            final_transactions.append(t)
 
-    summary['final_count'] = len(final_transactions)
+def validate_and_filter_batches(batches, region=None, min_amount=None, max_amount=None, summary=None):
+    """
+    Streaming counterpart of validate_and_filter
+    Yields filtered batches; counts accumulate in summary as batches pass through
+    """
+
+    if summary is None:
+        summary = {}
 
-    return final_transactions, summary['invalid'], summary
+    for key, value in DEFAULT_VALIDATOR.new_summary().items():
+        summary.setdefault(key, value)
+
+    for batch in batches:
+        final_transactions, _ = DEFAULT_VALIDATOR.run(batch, region, min_amount, max_amount, summary)
+
+        if final_transactions:
+            yield final_transactions
 # Handles file reading and writing for sales analytics
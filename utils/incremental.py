@@ -0,0 +1,109 @@
+# Incremental analytics over append-only sales data drops
+import json
+import os
+
+from utils.dataprocessor import ALL_GROUPS, AnalyticsEngine
+from utils.filehandler import iter_transactions, validate_and_filter_batches
+
+DEFAULT_STATE_FILE = 'output/analytics_state.json'
+
+STATE_VERSION = 2   # 2: exact states carry a SalesCube
+
+
+def _empty_engine(approximate):
+    return AnalyticsEngine([], ALL_GROUPS, mergeable=True, approximate=approximate, cube=not approximate)
+
+
+def load_analytics_state(state_file=DEFAULT_STATE_FILE, approximate=False):
+    """
+    Loads the persisted partial aggregates
+    Returns: (engine, sources, validation) - an empty state if the file is missing;
+    approximate only applies to a new, empty state, which keeps a SalesCube
+    unless it is approximate
+    """
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return _empty_engine(approximate), {}, {}
+
+    if state.get('version') != STATE_VERSION:
+        print(f"Warning: Ignoring '{state_file}' written by an incompatible version.")
+        return _empty_engine(approximate), {}, {}
+
+    return AnalyticsEngine.from_state(state['engine']), state['sources'], state['validation']
+
+
+def save_analytics_state(engine, sources, validation, state_file=DEFAULT_STATE_FILE):
+    """
+    Writes the partial aggregates atomically (temp file, then rename)
+    """
+    directory = os.path.dirname(state_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    state = {
+        'version': STATE_VERSION,
+        'engine': engine.to_state(),
+        'sources': sources,
+        'validation': validation
+    }
+
+    tmp_file = state_file + '.tmp'
+
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+    os.replace(tmp_file, state_file)
+
+
+def update_analytics(filenames, state_file=DEFAULT_STATE_FILE, chunk_size=10000, approximate=False):
+    """
+    Folds only new files, or bytes appended to known files, into the persisted state
+    approximate=True starts a new state with bounded-memory sketches; an
+    existing state keeps the mode it was created with
+    Returns: AnalyticsEngine over the full history, usable by every dataprocessor
+    analysis; exact states also carry the SalesCube serving trends and rollups
+    """
+    engine, sources, validation = load_analytics_state(state_file, approximate)
+
+    for filename in filenames:
+        path = os.path.abspath(filename)
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            print(f"Error: File '{filename}' not found.")
+            continue
+
+        source = sources.get(path)
+        offset = 0
+
+        if source is not None:
+            if source['size'] == stat.st_size and source['mtime'] == stat.st_mtime_ns:
+                continue
+
+            if stat.st_size < source['offset']:
+                # Aggregates cannot be subtracted again; a rewritten file needs a rebuild
+                print(f"Warning: '{filename}' shrank since it was folded in; "
+                      f"delete '{state_file}' to rebuild. Skipping.")
+                continue
+
+            offset = source['offset']
+
+        cursor = {}
+        batches = iter_transactions(filename, chunk_size, as_table=True, offset=offset, cursor=cursor)
+
+        for batch in validate_and_filter_batches(batches, summary=validation):
+            engine.merge(AnalyticsEngine(batch, engine.groups, mergeable=True, approximate=engine.approximate,
+                                         cube=engine.cube is not None))
+
+        sources[path] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'offset': cursor.get('offset', offset)
+        }
+
+    save_analytics_state(engine, sources, validation, state_file)
+
+    return engine
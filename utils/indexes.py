@@ -0,0 +1,397 @@
+# In-memory secondary indexes for repeated ad-hoc slicing of loaded transactions
+#
+# Hash indexes (Region, CustomerID, ProductID) keep the row positions of every
+# value; sorted indexes (Amount, Date) keep the row order by value so a range
+# is two binary searches. Each condition becomes a packed bitmap (one bit per
+# row) and a query is the AND of its bitmaps, so no query rescans the rows.
+# When one condition is very selective its positions are probed against the
+# other conditions directly instead. Appended rows are indexed on their own
+# (extend): posting lists grow in place and sorted keys gain a new run.
+from bisect import bisect_left, bisect_right
+from heapq import merge
+
+from utils.dates import day_number
+from utils.transactiontable import CATEGORY, FLOAT, INT, OPTIONAL_FLOAT, TransactionTable
+
+try:
+    import numpy as np
+except ImportError:   # position sets instead of bitmaps
+    np = None
+
+HASH_FIELDS = ('Region', 'CustomerID', 'ProductID')
+SORTED_FIELDS = ('Amount', 'Date')
+
+# Derived field: Quantity * UnitPrice, as in validate_and_filter
+AMOUNT = 'Amount'
+
+# Date string fields, indexed by integer day number (utils/dates.py)
+DATE_FIELDS = ('Date',)
+
+# A condition matching fewer than 1 / PROBE_RATIO of the rows is probed
+# row by row rather than turned into a bitmap
+PROBE_RATIO = 32
+
+
+def _field_values(transactions, field):
+    """
+    Returns: ('numbers', array) or ('category', (dictionary, codes)) for one field
+    """
+    if field in DATE_FIELDS:
+        if isinstance(transactions, TransactionTable):
+            return 'numbers', np.frombuffer(transactions.day_numbers(field), dtype=np.int32).astype(np.int64)
+        return 'numbers', np.array([day_number(t[field]) for t in transactions], dtype=np.int64)
+
+    if isinstance(transactions, TransactionTable) and field in transactions.columns:
+        column = transactions.columns[field]
+
+        if column.kind in (INT, FLOAT, OPTIONAL_FLOAT):
+            return 'numbers', transactions.as_numpy(field)
+        if column.kind == CATEGORY:
+            return 'category', (column.dictionary, transactions.as_numpy(field).astype(np.int64))
+
+    if field == AMOUNT and isinstance(transactions, TransactionTable):
+        quantity = transactions.as_numpy('Quantity').astype(np.float64)
+        return 'numbers', quantity * transactions.as_numpy('UnitPrice')
+
+    if field == AMOUNT:
+        values = [t['Quantity'] * t['UnitPrice'] for t in transactions]
+    else:
+        values = [t[field] for t in transactions]
+
+    if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return 'numbers', np.array(values, dtype=np.float64)
+
+    # Factorize strings (and anything else hashable) into dictionary codes
+    dictionary = []
+    lookup = {}
+    codes = np.empty(len(values), dtype=np.int64)
+
+    for i, value in enumerate(values):
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(dictionary)
+            dictionary.append(value)
+        codes[i] = code
+
+    return 'category', (dictionary, codes)
+
+
+class TransactionIndex:
+    """
+    Hash and sorted indexes over one set of loaded transactions
+    transactions may be a TransactionTable or a list of dictionaries; rows
+    may only be appended to it, and extend() must see them before the next query
+    Conditions are keyword arguments named after the fields:
+      hash field     a value, or a list / set / tuple of values (any of them)
+      sorted field   a (low, high) pair, None meaning open-ended, or a single value
+    A condition of None is ignored
+    """
+
+    def __init__(self, transactions, hash_fields=HASH_FIELDS, sorted_fields=SORTED_FIELDS):
+        self.transactions = transactions
+        self.size = 0
+        self.hash_fields = tuple(hash_fields)
+        self.sorted_fields = tuple(sorted_fields)
+
+        self._postings = {field: {} for field in self.hash_fields}
+        self._ranges = {field: ([], None) for field in self.sorted_fields}
+        self._bitmaps = {}
+        self._row_codes = {}   # hash field -> (value -> code, per-row codes)
+        self._row_keys = {}    # sorted field -> per-row sort keys
+        self._buffers = {}     # growable arrays: key -> (backing array, length)
+
+        self._index_rows(transactions)
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, transactions):
+        """
+        Indexes rows just appended to the indexed transactions
+        transactions holds only the new rows, in order; the work is
+        proportional to them rather than to everything indexed so far
+        """
+        self._bitmaps.clear()
+        self._index_rows(transactions)
+
+    # -------- BUILD --------
+
+    def _index_rows(self, rows):
+        base = self.size
+        if not len(rows):
+            return
+
+        for field in self.hash_fields:
+            self._add_postings(field, rows, base)
+
+        for field in self.sorted_fields:
+            self._add_sorted(field, rows, base)
+
+        self.size = base + len(rows)
+
+    def _append(self, key, values):
+        """
+        Appends to a growable array, doubling its backing array when full
+        Returns: view of the filled part
+        """
+        backing, size = self._buffers.get(key, (None, 0))
+        needed = size + len(values)
+
+        if backing is None or needed > len(backing):
+            grown = np.empty(max(needed, 2 * size, 16), dtype=values.dtype)
+            if size:
+                grown[:size] = backing[:size]
+            backing = grown
+
+        backing[size:needed] = values
+        self._buffers[key] = (backing, needed)
+        return backing[:needed]
+
+    def _add_postings(self, field, rows, base):
+        """
+        value -> row positions, in row order
+        """
+        postings = self._postings[field]
+
+        if np is None:
+            for position, t in enumerate(rows, base):
+                postings.setdefault(t[field], []).append(position)
+            return
+
+        _, (dictionary, codes) = _field_values(rows, field)
+        lookup, _ = self._row_codes.get(field, ({}, None))
+
+        # One stable sort groups the positions of each code together
+        order = np.argsort(codes, kind='stable') + base
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(dictionary)))))
+
+        for code, value in enumerate(dictionary):
+            if bounds[code] < bounds[code + 1]:
+                postings[value] = self._append(('postings', field, value), order[bounds[code]:bounds[code + 1]])
+
+        # Per-row codes use the index's own value numbering across batches
+        remap = np.array([lookup.setdefault(value, len(lookup)) for value in dictionary], dtype=np.int64)
+        self._row_codes[field] = (lookup, self._append(('codes', field), remap[codes]))
+
+    def _add_sorted(self, field, rows, base):
+        """
+        Sorted keys and row order, kept as runs of decreasing size that are
+        merged once a newer run grows to half the one before it
+        Date fields are sorted by day number; other category fields by the
+        rank of their value, so string ranges compare lexicographically
+        """
+        runs, _ = self._ranges[field]
+
+        if np is None:
+            if field == AMOUNT:
+                keyed = [(t['Quantity'] * t['UnitPrice'], i) for i, t in enumerate(rows, base)]
+            elif field in DATE_FIELDS and isinstance(rows, TransactionTable):
+                keyed = [(day, i) for i, day in enumerate(rows.day_numbers(field), base)]
+            elif field in DATE_FIELDS:
+                keyed = [(day_number(t[field]), i) for i, t in enumerate(rows, base)]
+            else:
+                keyed = [(t[field], i) for i, t in enumerate(rows, base)]
+            keyed.sort()
+
+            if runs:
+                keyed = list(merge(zip(*runs[0]), keyed))
+            self._ranges[field] = ([([key for key, _ in keyed], [i for _, i in keyed])], None)
+            return
+
+        kind, values = _field_values(rows, field)
+
+        if kind == 'category':
+            # New values shift the ranks of old ones, so re-rank every row
+            dictionary, codes = _field_values(self.transactions, field)[1]
+            ordered = sorted(set(dictionary))
+            rank = np.array([bisect_left(ordered, value) for value in dictionary], dtype=np.int64)
+            keys = rank[codes] if len(rank) else codes
+
+            self._buffers[('keys', field)] = (keys, len(keys))
+            self._row_keys[field] = keys
+            order = np.argsort(keys, kind='stable')
+            self._ranges[field] = ([(keys[order], order)], ordered)
+            return
+
+        self._row_keys[field] = self._append(('keys', field), values)
+
+        order = np.argsort(values, kind='stable')
+        runs.append((values[order], order + base))
+
+        while len(runs) > 1 and 2 * len(runs[-1][0]) >= len(runs[-2][0]):
+            newer_keys, newer_order = runs.pop()
+            older_keys, older_order = runs[-1]
+            keys = np.concatenate((older_keys, newer_keys))
+            order = np.concatenate((older_order, newer_order))
+            merged = np.argsort(keys, kind='stable')
+            runs[-1] = (keys[merged], order[merged])
+
+    # -------- QUERY --------
+
+    def _hash_positions(self, field, value):
+        postings = self._postings[field]
+
+        if isinstance(value, (list, set, frozenset, tuple)):
+            found = [postings[v] for v in value if v in postings]
+            if np is None:
+                return sorted(p for positions in found for p in positions)
+            return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+        if value in postings:
+            return postings[value]
+        return [] if np is None else np.zeros(0, dtype=np.int64)
+
+    def _key_bounds(self, field, value):
+        """
+        Condition value -> (low, high) in sort-key space; None is open-ended
+        """
+        low, high = value if isinstance(value, tuple) else (value, value)
+        ordered = self._ranges[field][1]
+
+        if field in DATE_FIELDS:
+            low = day_number(low) if isinstance(low, str) else low
+            high = day_number(high) if isinstance(high, str) else high
+
+        if ordered is not None:
+            # Translate value bounds into rank bounds
+            low = None if low is None else bisect_left(ordered, low)
+            high = None if high is None else bisect_right(ordered, high) - 1
+
+        return low, high
+
+    def _range_slice(self, field, value):
+        runs, _ = self._ranges[field]
+        low, high = self._key_bounds(field, value)
+        found = []
+
+        for keys, order in runs:
+            if np is None:
+                start = 0 if low is None else bisect_left(keys, low)
+                stop = len(keys) if high is None else bisect_right(keys, high)
+            else:
+                start = 0 if low is None else int(np.searchsorted(keys, low, 'left'))
+                stop = len(keys) if high is None else int(np.searchsorted(keys, high, 'right'))
+            found.append(order[start:max(start, stop)])
+
+        if np is None:
+            return [position for positions in found for position in positions]
+        if len(found) == 1:
+            return found[0]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def _bitmap(self, positions):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    def _condition_bitmap(self, field, value):
+        if field in self._postings:
+            if isinstance(value, (list, set, frozenset, tuple)):
+                key = (field, frozenset(value))
+            else:
+                key = (field, value)
+
+            # Value bitmaps are reused across queries
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                bitmap = self._bitmaps[key] = self._bitmap(self._hash_positions(field, value))
+            return bitmap
+
+        return self._bitmap(self._range_slice(field, value))
+
+    def _check_fields(self, conditions):
+        for field in conditions:
+            if field not in self._postings and field not in self._ranges:
+                raise KeyError(f"No index on '{field}'; indexed fields: "
+                               f"{list(self.hash_fields) + list(self.sorted_fields)}")
+
+    def positions(self, **conditions):
+        """
+        Row positions matching every condition, in row order
+        Returns: NumPy int array (a list without NumPy)
+        """
+        self._check_fields(conditions)
+        conditions = {field: value for field, value in conditions.items() if value is not None}
+
+        if np is None:
+            return self._positions_python(conditions)
+
+        if not conditions:
+            return np.arange(self.size)
+
+        # Start from the condition with the fewest matching rows
+        matches = {
+            field: self._hash_positions(field, value) if field in self._postings
+            else self._range_slice(field, value)
+            for field, value in conditions.items()
+        }
+        field = min(matches, key=lambda name: len(matches[name]))
+        candidates = matches[field]
+
+        if len(conditions) > 1 and len(candidates) * PROBE_RATIO >= self.size:
+            combined = None
+            for field, value in conditions.items():
+                bitmap = self._condition_bitmap(field, value)
+                combined = bitmap if combined is None else combined & bitmap
+
+            return np.flatnonzero(np.unpackbits(combined, count=self.size))
+
+        if field in self._ranges:
+            candidates = np.sort(candidates)
+
+        for other, value in conditions.items():
+            if other != field and len(candidates):
+                candidates = candidates[self._probe(other, value, candidates)]
+
+        # Never hand out a posting list itself
+        return candidates.copy()
+
+    def _probe(self, field, value, candidates):
+        """
+        Mask of the candidate rows that satisfy one condition
+        """
+        if field in self._row_codes:
+            lookup, codes = self._row_codes[field]
+            values = value if isinstance(value, (list, set, frozenset, tuple)) else [value]
+
+            allowed = np.zeros(len(lookup), dtype=bool)
+            allowed[[lookup[v] for v in values if v in lookup]] = True
+            return allowed[codes[candidates]]
+
+        keys = self._row_keys[field][candidates]
+        low, high = self._key_bounds(field, value)
+
+        mask = np.ones(len(candidates), dtype=bool)
+        if low is not None:
+            mask &= keys >= low
+        if high is not None:
+            mask &= keys <= high
+        return mask
+
+    def _positions_python(self, conditions):
+        selected = None
+
+        for field, value in conditions.items():
+            if field in self._postings:
+                found = set(self._hash_positions(field, value))
+            else:
+                found = set(self._range_slice(field, value))
+
+            selected = found if selected is None else selected & found
+
+        return list(range(self.size)) if selected is None else sorted(selected)
+
+    def count(self, **conditions):
+        return len(self.positions(**conditions))
+
+    def filter(self, **conditions):
+        """
+        Matching transactions: a TransactionTable for table input, else a list
+        """
+        positions = self.positions(**conditions)
+
+        if isinstance(self.transactions, TransactionTable):
+            return self.transactions.take(positions)
+
+        transactions = self.transactions
+        return [transactions[i] for i in positions]
@@ -0,0 +1,430 @@
+# Memory-mapped parser for the pipe-delimited sales data format
+#
+# The file is mapped, not read. Line and '|' offsets are found in bulk with
+# NumPy, Quantity and UnitPrice are converted straight from the mapped bytes
+# into numeric buffers, and the string columns stay as (start, end) offsets
+# until something reads them. Results match parse_transactions exactly:
+# fields are stripped, commas in ProductName become spaces, thousands
+# separators are dropped from numbers, and rows parse_transactions would
+# skip are skipped.
+import mmap
+from array import array
+
+from utils.filehandler import detect_encoding, parse_transactions, read_sales_data_chunks
+from utils.transactiontable import (
+    FLOAT, INT, SCHEMA, STRING, CategoryColumn, NumericColumn, StringColumn, TransactionTable
+)
+
+try:
+    import numpy as np
+except ImportError:   # fall back to the line-based parser
+    np = None
+
+NEWLINE, PIPE, COMMA, DOT, MINUS = 10, 124, 44, 46, 45
+
+# Digits that fit exactly in a double mantissa; longer numbers take the slow path
+_MAX_FAST_DIGITS = 15
+
+# Number fields wider than this (garbage, not numbers) skip the bulk conversion
+_MAX_FAST_WIDTH = 32
+
+# String fields wider than this are dictionary-encoded one by one, which keeps
+# the padded byte matrix of the bulk encoder at most n x _MAX_KEY_WIDTH
+_MAX_KEY_WIDTH = 64
+
+if np is not None:
+    _HASH_PRIME = np.uint64(1099511628211)   # FNV-1a 64-bit
+    _ALL_BITS = np.uint64(2 ** 64 - 1)
+
+
+class MappedStringColumn:
+    """
+    String column that points into the mapped file
+    Single values are decoded on access; codes / dictionary (or values, for
+    plain string columns) are built in one vectorized pass the first time a
+    consumer asks for them
+    source is (filename, byte offset of buffer[0]) for error messages
+    """
+
+    def __init__(self, kind, buffer, starts, ends, encoding, replace_commas=False, source=('', 0)):
+        self.kind = kind
+        self._buffer = buffer
+        self._starts = starts
+        self._ends = ends
+        self._encoding = encoding
+        self._replace_commas = replace_commas
+        self._source = source
+        self._warned = False
+        self._category = None
+        self._values = None
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _text(self, raw, offset):
+        """
+        Decodes raw bytes found at buffer position offset
+        Bytes the sampled encoding cannot decode are replaced, not raised
+        """
+        try:
+            return raw.decode(self._encoding)
+        except UnicodeDecodeError as e:
+            if not self._warned:
+                filename, base = self._source
+                print(f"Error: Cannot decode '{filename}' as {self._encoding} "
+                      f"at byte offset {base + offset + e.start}; replacing undecodable bytes.")
+                self._warned = True
+            return raw.decode(self._encoding, 'replace')
+
+    def _clean(self, value):
+        if self._replace_commas:
+            value = value.replace(',', ' ')
+        return value.strip()
+
+    def _decode(self, row):
+        start = int(self._starts[row])
+        return self._clean(self._text(self._buffer[start:self._ends[row]].tobytes(), start))
+
+    def __getitem__(self, i):
+        if self._category is not None:
+            return self._category[i]
+        if self._values is not None:
+            return self._values[i]
+        return self._decode(i)
+
+    def append(self, value):
+        raise TypeError('Memory-mapped columns are read-only')
+
+    def _encode(self):
+        if self._category is not None:
+            return self._category
+
+        n = len(self._starts)
+        widths = self._ends - self._starts
+        codes = np.empty(n, dtype=np.int32)
+        dictionary = []
+        lookup = {}
+
+        def code_of(row):
+            value = self._decode(row)
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            return code
+
+        # Fields up to _MAX_KEY_WIDTH bytes are deduplicated on raw bytes in
+        # bulk; longer (garbage) fields are few and decoded one by one
+        narrow = np.flatnonzero(widths <= _MAX_KEY_WIDTH)
+
+        if len(narrow):
+            _, first_index, inverse = _unique_fields(self._buffer, self._starts[narrow], widths[narrow])
+
+            # Different raw bytes can clean up to the same value (' North', 'North\r');
+            # codes follow first appearance, as CategoryColumn.extend assigns them
+            remap = np.empty(len(first_index), dtype=np.int32)
+            for j in np.argsort(first_index, kind='stable').tolist():
+                remap[j] = code_of(int(narrow[first_index[j]]))
+
+            codes[narrow] = remap[inverse]
+
+        for row in np.flatnonzero(widths > _MAX_KEY_WIDTH).tolist():
+            codes[row] = code_of(row)
+
+        packed = array('i')
+        packed.frombytes(codes.tobytes())
+
+        self._category = CategoryColumn(dictionary, packed, lookup)
+        return self._category
+
+    @property
+    def codes(self):
+        return self._encode().codes
+
+    @property
+    def dictionary(self):
+        return self._encode().dictionary
+
+    @property
+    def lookup(self):
+        return self._encode().lookup
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = self._decode_all()
+        return self._values
+
+    def _decode_all(self):
+        """
+        Every value, decoded in one call: the fields are copied into one
+        buffer separated by newlines (which never occur inside a field)
+        """
+        n = len(self._starts)
+        if not n:
+            return []
+
+        widths = self._ends - self._starts
+        joined_starts = np.concatenate(([0], np.cumsum(widths + 1)[:-1]))
+
+        joined = np.full(int(widths.sum()) + n, NEWLINE, dtype=np.uint8)
+        is_byte = np.ones(len(joined), dtype=bool)
+        is_byte[joined_starts + widths] = False
+
+        targets = np.flatnonzero(is_byte)
+        joined[targets] = self._buffer[targets + np.repeat(self._starts - joined_starts, widths)]
+
+        raw = joined.tobytes()
+        try:
+            text = raw.decode(self._encoding)
+        except UnicodeDecodeError as e:
+            # Report the file offset of the first bad byte, then replace
+            row = int(np.searchsorted(joined_starts, e.start, 'right')) - 1
+            start = int(self._starts[row])
+            self._text(raw[joined_starts[row]:joined_starts[row] + widths[row]], start)
+            text = raw.decode(self._encoding, 'replace')
+
+        if self._replace_commas:
+            text = text.replace(',', ' ')
+
+        values = text.split('\n')
+        values.pop()   # after the last separator
+        return list(map(str.strip, values))
+
+    def materialize(self):
+        """
+        Plain in-memory column that no longer references the mapped file
+        """
+        if self.kind == STRING:
+            return StringColumn(self.values)
+        return self._encode()
+
+    def take(self, indices):
+        indices = np.asarray(list(indices), dtype=np.int64)
+
+        if self._category is not None:
+            return self._category.take(indices.tolist())
+
+        return MappedStringColumn(
+            self.kind, self._buffer, self._starts[indices], self._ends[indices],
+            self._encoding, self._replace_commas, self._source
+        )
+
+
+def _unique_fields(buffer, starts, widths):
+    """
+    np.unique over the raw bytes of fields at most _MAX_KEY_WIDTH wide
+    Each field is zero-padded into 8-byte words and hashed to one uint64, so
+    the sort compares integers; the result is checked word for word and an
+    (unlikely) hash collision falls back to sorting the padded words
+    Returns: (keys, first_index, inverse) as np.unique gives them
+    """
+    words = [_field_word(buffer, starts, widths, j) for j in range(max((int(widths.max()) + 7) // 8, 1))]
+
+    keys = widths.astype(np.uint64)
+    for word in words:
+        keys = (keys ^ word) * _HASH_PRIME
+
+    keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+
+    representative = first_index[inverse]
+    if np.array_equal(widths, widths[representative]) and \
+            all(np.array_equal(word, word[representative]) for word in words):
+        return keys, first_index, inverse
+
+    exact = np.ascontiguousarray(np.stack(words, axis=1)).view(np.dtype((np.void, len(words) * 8))).ravel()
+    keys, first_index, inverse = np.unique(exact, return_index=True, return_inverse=True)
+    return keys, first_index, inverse.ravel()
+
+
+def _field_word(buffer, starts, widths, j):
+    """
+    Bytes 8j .. 8j+7 of every field as one little-endian uint64, zero past
+    the end of the field; one unaligned 8-byte load per field
+    """
+    size = len(buffer)
+    offsets = starts + 8 * j
+    word = np.zeros(len(starts), dtype=np.uint64)
+
+    if size >= 8:
+        loads = np.ndarray((size - 7,), dtype='<u8', buffer=buffer, strides=(1,))
+        word = loads[np.minimum(offsets, size - 8)]
+
+    remaining = np.clip(widths - 8 * j, 0, 8).astype(np.uint64)
+    word &= np.where(remaining >= 8, _ALL_BITS, (np.uint64(1) << (remaining * np.uint64(8))) - np.uint64(1))
+
+    # Fields within 8 bytes of the end of the buffer are assembled byte by byte
+    for row in np.flatnonzero((offsets > size - 8) & (remaining > 0)).tolist():
+        start = int(offsets[row])
+        word[row] = int.from_bytes(buffer[start:start + int(remaining[row])].tobytes(), 'little')
+
+    return word
+
+
+def _parse_numbers(buffer, starts, ends, allow_fraction):
+    """
+    Converts digit fields in bulk, ignoring thousands separators
+    Returns: (values, bad) - bad marks fields the fast path cannot convert
+    exactly; they are retried with int()/float()
+    """
+    n = len(starts)
+    widths = ends - starts
+    last = len(buffer) - 1
+
+    mantissa = np.zeros(n, dtype=np.int64)
+    digits = np.zeros(n, dtype=np.int64)
+    fraction = np.zeros(n, dtype=np.int64)
+    seen_dot = np.zeros(n, dtype=bool)
+    negative = np.zeros(n, dtype=bool)
+    bad = widths <= 0
+
+    for k in range(min(int(widths.max()), _MAX_FAST_WIDTH) if n else 0):
+        active = k < widths
+        ch = buffer[np.minimum(starts + k, last)].astype(np.int64)
+
+        is_digit = active & (ch >= 48) & (ch <= 57)
+        is_dot = active & (ch == DOT)
+        is_minus = active & (ch == MINUS)
+
+        mantissa = np.where(is_digit, mantissa * 10 + (ch - 48), mantissa)
+        digits += is_digit
+        fraction += is_digit & seen_dot
+
+        if allow_fraction:
+            bad |= is_dot & seen_dot
+            seen_dot |= is_dot
+        else:
+            bad |= is_dot
+
+        if k == 0:
+            negative = is_minus
+        else:
+            bad |= is_minus
+
+        bad |= active & ~(is_digit | is_dot | is_minus | (ch == COMMA))
+
+    bad |= (digits == 0) | (digits > _MAX_FAST_DIGITS) | (widths > _MAX_FAST_WIDTH)
+
+    if allow_fraction:
+        # mantissa and 10**fraction are exact doubles, so the quotient is
+        # correctly rounded - the same double float() returns for the text
+        values = mantissa.astype(np.float64) / np.power(10.0, fraction)
+    else:
+        values = mantissa
+
+    values = np.where(negative, -values, values)
+    return values, bad
+
+
+def parse_sales_file_mmap(filename, start=0, end=None):
+    """
+    Parses a sales data file into a TransactionTable over a memory map
+    start / end limit parsing to a byte range that begins and ends on line
+    boundaries; the header is only skipped when start is 0
+    Falls back to the line-based reader without NumPy
+    """
+    if np is None:
+        lines = [
+            line
+            for batch in read_sales_data_chunks(filename, offset=start, end=end)
+            for line in batch
+        ]
+        return parse_transactions(lines, as_table=True)
+
+    try:
+        encoding = detect_encoding(filename)
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return TransactionTable()
+
+    with open(filename, 'rb') as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:   # empty file
+            return TransactionTable()
+
+    buffer = np.frombuffer(mapped, dtype=np.uint8)[start:end]
+
+    # -------- LINES AND FIELDS --------
+    # One pass finds every delimiter; a running newline count tells which
+    # line each '|' belongs to, so lines with exactly 8 fields fall out of
+    # a bincount instead of a per-line split
+    delimiters = np.flatnonzero((buffer == NEWLINE) | (buffer == PIPE))
+    is_newline = buffer[delimiters] == NEWLINE
+
+    newlines = delimiters[is_newline]
+    pipes = delimiters[~is_newline]
+
+    line_of_pipe = np.cumsum(is_newline)[~is_newline]
+    pipe_counts = np.bincount(line_of_pipe, minlength=len(newlines) + 1)
+    first_pipe = np.concatenate(([0], np.cumsum(pipe_counts)[:-1]))
+
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_ends = np.concatenate((newlines, [len(buffer)]))
+
+    keep = pipe_counts == 7
+    if start == 0:
+        keep[0] = False   # header
+
+    first_pipe = first_pipe[keep]
+    field_starts = [line_starts[keep]]
+    field_ends = []
+
+    for k in range(7):
+        separator = pipes[first_pipe + k]
+        field_ends.append(separator)
+        field_starts.append(separator + 1)
+
+    field_ends.append(line_ends[keep])
+
+    # -------- NUMBERS --------
+    quantity, quantity_bad = _parse_numbers(buffer, field_starts[4], field_ends[4], False)
+    unit_price, price_bad = _parse_numbers(buffer, field_starts[5], field_ends[5], True)
+
+    valid = np.ones(len(first_pipe), dtype=bool)
+
+    for row in np.flatnonzero(quantity_bad | price_bad).tolist():
+        try:
+            raw_quantity = buffer[field_starts[4][row]:field_ends[4][row]].tobytes().decode(encoding)
+            raw_price = buffer[field_starts[5][row]:field_ends[5][row]].tobytes().decode(encoding)
+            quantity[row] = int(raw_quantity.replace(',', ''))
+            unit_price[row] = float(raw_price.replace(',', ''))
+        except (ValueError, OverflowError):
+            valid[row] = False
+
+    if not valid.all():
+        field_starts = [starts[valid] for starts in field_starts]
+        field_ends = [ends[valid] for ends in field_ends]
+        quantity, unit_price = quantity[valid], unit_price[valid]
+
+    # -------- COLUMNS --------
+    columns = {}
+
+    for position, (name, kind) in enumerate(SCHEMA):
+        if kind == INT:
+            values = array('q')
+            values.frombytes(quantity.astype(np.int64).tobytes())
+            columns[name] = NumericColumn(INT, values)
+        elif kind == FLOAT:
+            values = array('d')
+            values.frombytes(unit_price.astype(np.float64).tobytes())
+            columns[name] = NumericColumn(FLOAT, values)
+        else:
+            columns[name] = MappedStringColumn(
+                kind, buffer, field_starts[position], field_ends[position], encoding,
+                replace_commas=(name == 'ProductName'), source=(filename, start)
+            )
+
+    return TransactionTable(SCHEMA, columns)
+
+
+def materialize(table):
+    """
+    Copies mapped string columns into memory, e.g. before pickling a table
+    to another process or closing the file
+    """
+    return TransactionTable(table.schema, {
+        name: column.materialize() if isinstance(column, MappedStringColumn) else column
+        for name, column in table.columns.items()
+    }, table.days)
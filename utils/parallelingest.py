@@ -0,0 +1,121 @@
+# Multi-process ingestion of large and multiple sales data files
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.filehandler import validate_and_filter_batches
+from utils.mmapparser import materialize, parse_sales_file_mmap
+from utils.transactiontable import TransactionTable
+
+# Target size of one unit of work; large files are split on line boundaries
+PARTITION_BYTES = 64 * 1024 * 1024
+
+SUMMARY_KEYS = ('total_input', 'invalid', 'filtered_by_region', 'filtered_by_amount', 'final_count')
+
+
+def expand_sources(sources):
+    """
+    Resolves files, directories (every *.txt inside) and glob patterns
+    Returns: sorted list of file paths, without duplicates
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+
+    files = []
+
+    for source in sources:
+        source = os.fspath(source)
+
+        if os.path.isdir(source):
+            files.extend(glob.glob(os.path.join(source, '*.txt')))
+        elif os.path.exists(source):
+            files.append(source)
+        else:
+            matches = glob.glob(source)
+            if not matches:
+                print(f"Error: File '{source}' not found.")
+            files.extend(matches)
+
+    return sorted(set(files))
+
+
+def split_file(filename, partition_bytes=PARTITION_BYTES):
+    """
+    Splits a file into (start, end) byte ranges that start and end on line boundaries
+    """
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+
+    with open(filename, 'rb') as f:
+        while start < size:
+            end = start + partition_bytes
+
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()   # move to the start of the next line
+                end = f.tell()
+
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def _ingest_partition(filename, start, end, region, min_amount, max_amount):
+    """
+    Worker: parses and validates one byte range
+    Returns: (compact TransactionTable, validation summary)
+    """
+    # Mapped columns point into this process's memory map; copy them out
+    # (dictionary-encoding them in bulk) before validation masks them
+    table = materialize(parse_sales_file_mmap(filename, start, end))
+    summary = {}
+
+    tables = list(validate_and_filter_batches([table], region, min_amount, max_amount, summary))
+
+    return (tables[0] if tables else TransactionTable()), summary
+
+
+def ingest_parallel(sources, workers=None, partition_bytes=PARTITION_BYTES,
+                    region=None, min_amount=None, max_amount=None):
+    """
+    Parses and validates files in parallel worker processes
+    sources may be a file, a directory, a glob pattern or a list of them;
+    large files are split into partitions of about partition_bytes
+    Returns: (TransactionTable of valid transactions, merged validation summary)
+    """
+    partitions = [
+        (filename, start, end)
+        for filename in expand_sources(sources)
+        for start, end in split_file(filename, partition_bytes)
+    ]
+
+    summary = dict.fromkeys(SUMMARY_KEYS, 0)
+    summary['rejected_by_rule'] = {}
+
+    if not partitions:
+        return TransactionTable(), summary
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_ingest_partition, filename, start, end, region, min_amount, max_amount)
+            for filename, start, end in partitions
+        ]
+        results = [future.result() for future in futures]
+
+    for _, partition_summary in results:
+        for key in SUMMARY_KEYS:
+            summary[key] += partition_summary.get(key, 0)
+
+        for name, count in partition_summary.get('rejected_by_rule', {}).items():
+            summary['rejected_by_rule'][name] = summary['rejected_by_rule'].get(name, 0) + count
+
+    table = TransactionTable.concat(table for table, _ in results)
+
+    print(f"Ingested {len(partitions)} partitions from {len({p[0] for p in partitions})} files: "
+          f"{summary['final_count']} valid of {summary['total_input']} transactions")
+
+    return table, summary
@@ -0,0 +1,429 @@
+# Lazy, cached pipeline of stages for the sales analytics run
+#
+# Each stage names the stages it consumes, so the run is a DAG. A stage's
+# fingerprint hashes its code, its parameters, the contents of the files it
+# reads and the fingerprints of its inputs. Its code is the stage function,
+# the functions of its own module that it calls, and every project module it
+# reaches, whole, together with the project modules those import (see
+# code_dependencies), so editing a helper deep in utils/ reruns the stages
+# that use it. A stage whose fingerprint matches
+# the last run (and whose output files still exist) is skipped, and its
+# cached result is unpickled only if a stage downstream of it has to run.
+# A stage that reran for another reason (expired, forced, output deleted)
+# also reruns its consumers. So editing the report code reruns only the
+# report; a new sales file reruns everything downstream of the read.
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+
+DEFAULT_CACHE_DIR = 'data/pipeline_cache'
+
+MANIFEST_FILE = 'manifest.json'
+
+MANIFEST_VERSION = 1
+
+HASH_BLOCK_SIZE = 1 << 20
+
+# Modules under this directory are project code and part of fingerprints
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _code_digest(obj):
+    """
+    Digest of a function's (or module's) source; falls back to bytecode
+    """
+    try:
+        source = inspect.getsource(obj)
+    except (OSError, TypeError):
+        code = getattr(obj, '__code__', None)
+        source = code.co_code.hex() + repr(code.co_consts) if code is not None else repr(obj)
+
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _is_project_module(module, root):
+    path = getattr(module, '__file__', None)
+    if not path:
+        return False
+
+    path = os.path.abspath(path)
+    return path.startswith(os.path.join(root, '')) and 'site-packages' not in path
+
+
+def _referenced_names(code):
+    """
+    Global names a code object uses, nested functions and comprehensions included
+    """
+    names = set(code.co_names)
+
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _referenced_names(const)
+
+    return names
+
+
+def code_dependencies(objs, root=PROJECT_ROOT):
+    """
+    Code the given functions (or modules) depend on
+    Functions of the first function's own module are followed one by one
+    through the globals they use; any other project module they reach is
+    taken whole, along with every project module it imports
+    Returns: (functions, modules), both sorted by name
+    """
+    objs = list(objs)
+    home = getattr(objs[0], '__module__', None) if objs else None
+
+    functions = {}
+    modules = {}
+    pending = objs
+
+    while pending:
+        obj = pending.pop()
+
+        if inspect.ismodule(obj):
+            if obj.__name__ not in modules and _is_project_module(obj, root):
+                modules[obj.__name__] = obj
+                pending.extend(vars(obj).values())
+            continue
+
+        module = sys.modules.get(getattr(obj, '__module__', None) or '')
+
+        if module is None or not _is_project_module(module, root):
+            continue
+
+        if module.__name__ != home:
+            pending.append(module)
+            continue
+
+        func = getattr(obj, '__func__', obj)
+        if not inspect.isfunction(func):
+            pending.append(module)
+            continue
+
+        key = f"{func.__module__}.{func.__qualname__}"
+        if key in functions:
+            continue
+
+        functions[key] = func
+        namespace = func.__globals__
+        pending.extend(namespace[name] for name in _referenced_names(func.__code__) if name in namespace)
+
+    return (
+        [functions[key] for key in sorted(functions)],
+        [modules[name] for name in sorted(modules)]
+    )
+
+
+def file_digest(filename):
+    """
+    SHA-256 of a file's contents, read in blocks
+    Returns: hex digest, or None if the file does not exist
+    """
+    h = hashlib.sha256()
+
+    try:
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+
+    return h.hexdigest()
+
+
+class Stage:
+    """
+    One step of the pipeline
+    func is called as func(*input values, **params)
+      inputs     names of the stages whose results func receives
+      params     keyword arguments, part of the fingerprint (JSON-serializable)
+      files      files func reads; their contents are part of the fingerprint
+      outputs    files func writes; the stage reruns if any is missing
+      code       extra functions / modules whose source is part of the fingerprint;
+                 the project code func uses is found by code_dependencies
+      max_age    seconds a cached result stays valid (None: until inputs change)
+      cacheable  predicate on the result; a False result is not cached
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, files=(), outputs=(),
+                 code=(), max_age=None, cacheable=None, description=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = dict(params or {})
+        self.files = tuple(files)
+        self.outputs = tuple(outputs)
+        self.code = tuple(code)
+        self.max_age = max_age
+        self.cacheable = cacheable
+        self.description = description or name
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={list(self.inputs)})"
+
+
+class Pipeline:
+    """
+    DAG of stages with fingerprinted, on-disk caching of their results
+    """
+
+    def __init__(self, stages=(), cache_dir=DEFAULT_CACHE_DIR, verbose=True, profiler=None,
+                 code_root=PROJECT_ROOT):
+        self.stages = {}
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+        self.profiler = profiler   # utils.profiler.Profiler measuring each stage that runs
+        self.code_root = code_root   # modules under it count as project code
+
+        self._values = {}
+        self._fingerprints = {}
+        self._manifest = None
+
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage, *args, **options):
+        """
+        Adds a Stage, or builds one from (name, func, **options)
+        Returns: the stage
+        """
+        if not isinstance(stage, Stage):
+            stage = Stage(stage, *args, **options)
+
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage '{stage.name}'")
+
+        self.stages[stage.name] = stage
+        return stage
+
+    # -------- GRAPH --------
+
+    def plan(self, targets=None):
+        """
+        Stages needed for targets (default: all), inputs before consumers
+        """
+        targets = list(self.stages) if targets is None else list(targets)
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'")
+            if name in visiting:
+                raise ValueError(f"Stage '{name}' depends on itself")
+
+            visiting.add(name)
+            for upstream in self.stages[name].inputs:
+                visit(upstream)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in targets:
+            visit(name)
+
+        return order
+
+    # -------- FINGERPRINTS --------
+
+    def _file_digest(self, filename):
+        """
+        Content digest, reused while size and mtime are unchanged
+        """
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+
+        files = self._load_manifest()['files']
+        known = files.get(filename)
+
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+
+        digest = file_digest(filename)
+        files[filename] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def fingerprint(self, name):
+        """
+        Hash of everything the stage's result depends on
+        """
+        if name in self._fingerprints:
+            return self._fingerprints[name]
+
+        stage = self.stages[name]
+        h = hashlib.sha256()
+
+        h.update(name.encode('utf-8'))
+
+        functions, modules = code_dependencies((stage.func,) + stage.code, self.code_root)
+        for obj in [stage.func] + list(stage.code) + functions:
+            h.update(_code_digest(obj).encode('ascii'))
+        for module in modules:
+            h.update(f"{module.__name__}={file_digest(module.__file__)}".encode('utf-8'))
+
+        h.update(json.dumps(stage.params, sort_keys=True, default=repr).encode('utf-8'))
+
+        for filename in stage.files:
+            h.update(f"{filename}={self._file_digest(filename)}".encode('utf-8'))
+
+        for upstream in stage.inputs:
+            h.update(self.fingerprint(upstream).encode('ascii'))
+
+        self._fingerprints[name] = h.hexdigest()
+        return self._fingerprints[name]
+
+    # -------- CACHE --------
+
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (FileNotFoundError, ValueError):
+                manifest = None
+
+            if not manifest or manifest.get('version') != MANIFEST_VERSION:
+                manifest = {'version': MANIFEST_VERSION, 'files': {}, 'stages': {}}
+
+            self._manifest = manifest
+
+        return self._manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = self._manifest_path() + '.tmp'
+
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, indent=2)
+
+        os.replace(tmp_file, self._manifest_path())
+
+    def _artifact_path(self, name, fingerprint):
+        return os.path.join(self.cache_dir, f"{name}-{fingerprint[:16]}.pkl")
+
+    def is_fresh(self, name):
+        """
+        True if the cached result of the stage can be used as is
+        """
+        stage = self.stages[name]
+        entry = self._load_manifest()['stages'].get(name)
+
+        if not entry or entry['fingerprint'] != self.fingerprint(name):
+            return False
+
+        if stage.max_age is not None and time.time() - entry['created_at'] > stage.max_age:
+            return False
+
+        if not all(os.path.exists(path) for path in stage.outputs):
+            return False
+
+        return os.path.exists(self._artifact_path(name, entry['fingerprint']))
+
+    def _store(self, name, value):
+        fingerprint = self.fingerprint(name)
+        stages = self._load_manifest()['stages']
+        previous = stages.pop(name, None)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._artifact_path(name, fingerprint)
+        tmp_file = path + '.tmp'
+
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_file, path)
+
+        if previous and previous['fingerprint'] != fingerprint:
+            try:
+                os.remove(self._artifact_path(name, previous['fingerprint']))
+            except FileNotFoundError:
+                pass
+
+        stages[name] = {'fingerprint': fingerprint, 'created_at': time.time()}
+        self._save_manifest()
+
+    def _discard(self, name):
+        """
+        Drops the cached result of a stage, so it runs again next time
+        """
+        entry = self._load_manifest()['stages'].pop(name, None)
+
+        if entry:
+            try:
+                os.remove(self._artifact_path(name, entry['fingerprint']))
+            except FileNotFoundError:
+                pass
+            self._save_manifest()
+
+    def value(self, name):
+        """
+        Result of a stage from this run, or loaded from the cache
+        """
+        if name not in self._values:
+            entry = self._load_manifest()['stages'].get(name)
+
+            if not entry:
+                raise KeyError(f"Stage '{name}' has no result; run it first")
+
+            with open(self._artifact_path(name, entry['fingerprint']), 'rb') as f:
+                self._values[name] = pickle.load(f)
+
+        return self._values[name]
+
+    # -------- RUN --------
+
+    def run(self, targets=None, force=()):
+        """
+        Brings the target stages (default: all) up to date, running only
+        stages that are stale or consume the result of a stage that ran
+        force names stages to rerun regardless of their cache
+        Returns: dict of stage name -> 'ran' or 'cached', in run order
+        """
+        self._fingerprints = {}
+        self._values = {}
+        self._manifest = None
+
+        order = self.plan(targets)
+        force = set(force)
+        status = {}
+
+        for number, name in enumerate(order, 1):
+            stage = self.stages[name]
+
+            if self.verbose:
+                print(f"[{number}/{len(order)}] {stage.description}...")
+
+            upstream_ran = any(status[upstream] == 'ran' for upstream in stage.inputs)
+
+            if name not in force and not upstream_ran and self.is_fresh(name):
+                status[name] = 'cached'
+                if self.profiler is not None:
+                    self.profiler.skipped(name)
+                if self.verbose:
+                    print("✓ Unchanged, using cached result\n")
+                continue
+
+            inputs = [self.value(upstream) for upstream in stage.inputs]
+            func = stage.func if self.profiler is None else self.profiler.profile(name)(stage.func)
+
+            value = func(*inputs, **stage.params)
+            self._values[name] = value
+            status[name] = 'ran'
+
+            if stage.cacheable is None or stage.cacheable(value):
+                self._store(name, value)
+            else:
+                self._discard(name)
+
+        return status
@@ -0,0 +1,222 @@
+# Lightweight run instrumentation: time, memory and row counts per stage
+#
+# Profiler.measure() is a context manager and Profiler.profile() a decorator
+# over it. Each measurement records wall and CPU time, the tracemalloc peak
+# above the memory in use when it started, the process peak RSS so far, and
+# rows in / out. Measurements may nest: an inner one resets the tracemalloc
+# peak, so the outer one keeps the highest peak seen before it did.
+# write() saves the run profile as JSON.
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+try:
+    import resource
+except ImportError:   # Windows: no peak RSS
+    resource = None
+
+DEFAULT_PROFILE_FILE = 'output/run_profile.json'
+
+
+def peak_rss_bytes():
+    """
+    Highest resident set size of this process so far
+    Returns: bytes, or None where the platform does not report it
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def row_count(value):
+    """
+    Rows in a stage's input or result: len() of a list, table or frame;
+    the first element of a tuple such as (valid, invalid_count, summary)
+    Returns: int, or None for values without rows
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+
+    if isinstance(value, (str, bytes, dict)) or not hasattr(value, '__len__'):
+        return None
+
+    return len(value)
+
+
+class Measurement:
+    """
+    One measured block; rows_in / rows_out may be set inside it
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.status = 'ran'
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_traced_bytes = None
+        self.peak_rss_bytes = None
+
+        self._peak = 0   # highest traced memory seen before a nested reset
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'peak_traced_bytes': self.peak_traced_bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out
+        }
+
+
+class Profiler:
+    """
+    Collects Measurements for one run
+    trace_memory=False skips tracemalloc, which slows allocation-heavy code
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.measurements = []
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+
+        self._stack = []
+        self._started_tracing = False
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextmanager
+    def measure(self, name, rows_in=None):
+        """
+        Measures the block; yields the Measurement
+        """
+        m = Measurement(name, rows_in)
+        tracing = self.trace_memory
+
+        if tracing:
+            self._start_tracing()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent._peak = max(parent._peak, peak)
+            tracemalloc.reset_peak()
+            start_memory = current
+
+        self._stack.append(m)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield m
+        finally:
+            m.wall_seconds = time.perf_counter() - wall
+            m.cpu_seconds = time.process_time() - cpu
+            self._stack.pop()
+
+            if tracing:
+                peak = max(m._peak, tracemalloc.get_traced_memory()[1])
+                m.peak_traced_bytes = max(0, peak - start_memory)
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent._peak = max(parent._peak, peak)
+
+            m.peak_rss_bytes = peak_rss_bytes()
+            self.measurements.append(m)
+
+    def profile(self, name=None):
+        """
+        Decorator: measures every call, counting rows of the first argument
+        and of the result (see row_count)
+        """
+        def decorate(func):
+            label = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(label, row_count(args[0]) if args else None) as m:
+                    result = func(*args, **kwargs)
+                    m.rows_out = row_count(result)
+                return result
+
+            return wrapper
+
+        return decorate
+
+    def skipped(self, name, status='cached'):
+        """
+        Records a stage that did not run
+        """
+        m = Measurement(name)
+        m.status = status
+        self.measurements.append(m)
+        return m
+
+    def _start_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """
+        Stops tracemalloc if this profiler started it
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    # -------- OUTPUT --------
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'python': sys.version.split()[0],
+            'wall_seconds': round(time.perf_counter() - self._wall, 6),
+            'cpu_seconds': round(time.process_time() - self._cpu, 6),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'trace_memory': self.trace_memory,
+            'stages': [m.to_dict() for m in self.measurements]
+        }
+
+    def write(self, filename=DEFAULT_PROFILE_FILE):
+        """
+        Writes the run profile as JSON, atomically (temp file, then rename)
+        Returns: filename
+        """
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_file = filename + '.tmp'
+
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+        os.replace(tmp_file, filename)
+        return filename
+
+    def summary(self):
+        """
+        Returns: the measurements as a printable table
+        """
+        lines = [f"{'Stage':<10} {'Status':<7} {'Wall s':>8} {'CPU s':>8} {'Peak MB':>8} {'Rows in':>9} {'Rows out':>9}"]
+
+        for m in self.measurements:
+            peak = '' if m.peak_traced_bytes is None else f"{m.peak_traced_bytes / (1 << 20):.1f}"
+            rows_in = '' if m.rows_in is None else m.rows_in
+            rows_out = '' if m.rows_out is None else m.rows_out
+            lines.append(f"{m.name:<10} {m.status:<7} {m.wall_seconds:>8.3f} {m.cpu_seconds:>8.3f} "
+                         f"{peak:>8} {rows_in:>9} {rows_out:>9}")
+
+        return '\n'.join(lines)
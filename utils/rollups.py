@@ -0,0 +1,298 @@
+# Pre-materialized sales cube for time-bucketed trends
+#
+# One scan at ingest fills two tables:
+#   cells  (date, region, product) -> revenue, quantity, transaction count
+#   days   date -> revenue, transaction count, set of customers
+# Week / month / quarter / year trends by region and/or product are then
+# answered by folding the (small) cells table, never the raw rows. The day
+# table is accumulated in row order, so daily_sales_trend and
+# find_peak_sales_day served from it match utils/dataprocessor.py exactly.
+# The data has dates but no times, so 'day' is the finest bucket.
+#
+# An AnalyticsEngine built with cube=True (see utils/dataprocessor.py) keeps
+# one, merges it and persists it with its partial state, which is how the
+# incremental state and the analytics server carry a cube from ingest on.
+from datetime import date
+from functools import lru_cache
+
+from utils.dates import INVALID_DAY, day_number, day_string
+from utils.transactiontable import TransactionTable
+
+try:
+    import numpy as np
+except ImportError:   # cube is filled by the row loop
+    np = None
+
+BUCKETS = ('day', 'week', 'month', 'quarter', 'year')
+
+DIMENSIONS = ('region', 'product')
+
+
+@lru_cache(maxsize=1 << 16)
+def bucket_of(date_string, bucket):
+    """
+    Label of the time bucket a date falls into
+    ('2024-12-05', 'week') -> '2024-W49'; None for an invalid date
+    """
+    day = day_number(date_string)
+
+    if day == INVALID_DAY:
+        return None
+
+    if bucket == 'day':
+        return day_string(day)
+
+    d = date.fromordinal(day)
+
+    if bucket == 'week':
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    if bucket == 'month':
+        return f"{d.year}-{d.month:02d}"
+    if bucket == 'quarter':
+        return f"{d.year}-Q{(d.month - 1) // 3 + 1}"
+    return str(d.year)
+
+
+def _check_bucket(bucket):
+    if bucket == 'hour':
+        raise ValueError("Sales data has dates but no times; the finest bucket is 'day'")
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'; use one of {list(BUCKETS)}")
+
+
+class SalesCube:
+    """
+    date x region x product cube plus a per-date table, built in one scan
+    Pass it to dataprocessor.daily_sales_trend / find_peak_sales_day in
+    place of the transactions, or ask it for coarser rollups
+    """
+
+    def __init__(self, transactions=()):
+        self.cells = {}   # (date, region, product) -> [revenue, quantity, count]
+        self.days = {}    # date -> {'revenue', 'transaction_count', 'customers'}
+
+        if np is not None and isinstance(transactions, TransactionTable):
+            self._fill_numpy(transactions)
+        else:
+            self._fill(transactions)
+
+    def _fill(self, transactions):
+        cells = self.cells
+        days = self.days
+
+        for t in transactions:
+            quantity = t['Quantity']
+            amount = quantity * t['UnitPrice']
+
+            key = (t['Date'], t['Region'], t['ProductName'])
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0.0, 0, 0]
+            cell[0] += amount
+            cell[1] += quantity
+            cell[2] += 1
+
+            data = days.get(t['Date'])
+            if data is None:
+                data = days[t['Date']] = {'revenue': 0.0, 'transaction_count': 0, 'customers': set()}
+            data['revenue'] += amount
+            data['transaction_count'] += 1
+            data['customers'].add(t['CustomerID'])
+
+    def _fill_numpy(self, table):
+        quantity = table.as_numpy('Quantity')
+        amounts = quantity.astype(np.float64) * table.as_numpy('UnitPrice')
+
+        date_codes = table.as_numpy('Date').astype(np.int64)
+        region_codes = table.as_numpy('Region').astype(np.int64)
+        product_codes = table.as_numpy('ProductName').astype(np.int64)
+
+        dates = table.dictionary('Date')
+        regions = table.dictionary('Region')
+        products = table.dictionary('ProductName')
+
+        # -------- CELLS --------
+        cell_ids = (date_codes * len(regions) + region_codes) * len(products) + product_codes
+        unique_ids, first_index, inverse = np.unique(cell_ids, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+
+        # bincount adds each bin's weights in row order, like the row loop
+        revenue = np.bincount(inverse, weights=amounts, minlength=len(unique_ids)).tolist()
+        counts = np.bincount(inverse, minlength=len(unique_ids)).tolist()
+        quantities = np.zeros(len(unique_ids), dtype=np.int64)
+        np.add.at(quantities, inverse, quantity)
+        quantities = quantities.tolist()
+
+        ids = unique_ids.tolist()
+        for i in np.argsort(first_index, kind='stable').tolist():
+            cell_id = ids[i]
+            date_code, rest = divmod(cell_id, len(regions) * len(products))
+            region_code, product_code = divmod(rest, len(products))
+            self.cells[(dates[date_code], regions[region_code], products[product_code])] = [
+                revenue[i], quantities[i], counts[i]
+            ]
+
+        # -------- DAYS --------
+        day_revenue = np.bincount(date_codes, weights=amounts, minlength=len(dates)).tolist()
+        day_counts = np.bincount(date_codes, minlength=len(dates)).tolist()
+
+        customers = table.dictionary('CustomerID')
+        pairs = np.unique(date_codes * len(customers) + table.as_numpy('CustomerID'))
+        day_customers = {}
+        for date_code, customer_code in zip((pairs // len(customers)).tolist(), (pairs % len(customers)).tolist()):
+            day_customers.setdefault(date_code, set()).add(customers[customer_code])
+
+        present, first_row = np.unique(date_codes, return_index=True)
+        for code in present[np.argsort(first_row, kind='stable')].tolist():
+            self.days[dates[code]] = {
+                'revenue': day_revenue[code],
+                'transaction_count': day_counts[code],
+                'customers': day_customers[code]
+            }
+
+    def merge(self, other):
+        """
+        Folds another cube (e.g. of a later batch) into this one
+        Returns: self
+        """
+        for key, (revenue, quantity, count) in other.cells.items():
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = [0.0, 0, 0]
+            cell[0] += revenue
+            cell[1] += quantity
+            cell[2] += count
+
+        for date_string, data in other.days.items():
+            target = self.days.get(date_string)
+            if target is None:
+                target = self.days[date_string] = {'revenue': 0.0, 'transaction_count': 0, 'customers': set()}
+            target['revenue'] += data['revenue']
+            target['transaction_count'] += data['transaction_count']
+            target['customers'] |= data['customers']
+
+        return self
+
+    def to_state(self):
+        """
+        Returns: JSON-serializable cube, in insertion order
+        """
+        return {
+            'cells': [list(key) + cell for key, cell in self.cells.items()],
+            'days': {
+                date_string: {
+                    'revenue': data['revenue'],
+                    'transaction_count': data['transaction_count'],
+                    'customers': sorted(data['customers'])
+                }
+                for date_string, data in self.days.items()
+            }
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Rebuilds a cube from to_state() output
+        """
+        cube = cls()
+
+        for date_string, region, product, revenue, quantity, count in state['cells']:
+            cube.cells[(date_string, region, product)] = [revenue, quantity, count]
+
+        for date_string, data in state['days'].items():
+            cube.days[date_string] = {
+                'revenue': data['revenue'],
+                'transaction_count': data['transaction_count'],
+                'customers': set(data['customers'])
+            }
+
+        return cube
+
+    # -------- ROLLUPS --------
+
+    def rollup(self, bucket='week', by=()):
+        """
+        Revenue, quantity and transaction count per time bucket, optionally
+        split by 'region' and/or 'product'
+        Returns: dict of (bucket label, *dimension values) -> totals, in
+        chronological order (invalid dates, labelled None, first); totals
+        without dimensions also carry unique_customers
+        """
+        _check_bucket(bucket)
+
+        by = tuple(by)
+        for dimension in by:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dimension}'; use any of {list(DIMENSIONS)}")
+
+        positions = [1 + DIMENSIONS.index(dimension) for dimension in by]
+        totals = {}
+
+        for key, (revenue, quantity, count) in self.cells.items():
+            group = (bucket_of(key[0], bucket),) + tuple(key[p] for p in positions)
+
+            data = totals.get(group)
+            if data is None:
+                data = totals[group] = {'revenue': 0.0, 'quantity': 0, 'transaction_count': 0}
+            data['revenue'] += revenue
+            data['quantity'] += quantity
+            data['transaction_count'] += count
+
+        if not by:
+            customers = {}
+            for date_string, data in self.days.items():
+                customers.setdefault(bucket_of(date_string, bucket), set()).update(data['customers'])
+
+            for group, data in totals.items():
+                data['unique_customers'] = len(customers[group[0]])
+
+        for data in totals.values():
+            data['revenue'] = round(data['revenue'], 2)
+
+        return dict(sorted(totals.items(), key=lambda item: (item[0][0] is not None, item[0][0] or '')))
+
+    def trend(self, bucket='week'):
+        """
+        Bucket label -> totals, e.g. a weekly version of daily_sales_trend
+        """
+        return {group[0]: data for group, data in self.rollup(bucket).items()}
+
+    # -------- SERVED ANALYSES --------
+
+    def daily_sales_trend(self):
+        result = {}
+
+        for date_string in sorted(self.days, key=day_number):
+            data = self.days[date_string]
+            result[date_string] = {
+                'revenue': round(data['revenue'], 2),
+                'transaction_count': data['transaction_count'],
+                'unique_customers': len(data['customers'])
+            }
+
+        return result
+
+    def find_peak_sales_day(self):
+        peak_date = None
+        max_revenue = 0.0
+        peak_count = 0
+
+        for date_string, data in self.days.items():
+            if data['revenue'] > max_revenue:
+                max_revenue = data['revenue']
+                peak_date = date_string
+                peak_count = data['transaction_count']
+
+        return (
+            peak_date,
+            round(max_revenue, 2),
+            peak_count
+        )
+
+
+def build_cube(transactions):
+    """
+    Scans transactions once into a SalesCube
+    """
+    return SalesCube(transactions)
@@ -0,0 +1,371 @@
+# Bounded-memory, mergeable sketches for approximate analytics
+#
+# HyperLogLog estimates distinct counts (unique customers per day, unique
+# products per customer) in at most 2**precision bytes, and a KLL sketch
+# answers quantile queries (order-value percentiles) from at most about 4 * k
+# kept values (800 at the default k of 200). Both merge exactly across partitions: merging the sketches of two
+# batches gives the sketch of the combined batch. Values are hashed with
+# BLAKE2b, not hash(), so sketches built in different processes agree.
+import base64
+import hashlib
+import math
+import random
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:   # sketches are filled one value at a time
+    np = None
+
+HLL_PRECISION = 12   # 4096 registers, about 1.6% standard error
+
+KLL_K = 200          # about 1% rank error
+
+_HASH_BITS = 64
+
+# A sparse register dict costs roughly 64 bytes per entry; past this share of
+# the registers the dense bytearray is smaller
+_SPARSE_SHARE = 64
+
+
+@lru_cache(maxsize=1 << 16)
+def hash64(value):
+    """
+    Stable 64-bit hash of str(value)
+    """
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _register_update(hashed, precision):
+    """
+    Returns: (register index, rank of the first 1 bit in the remaining bits)
+    """
+    bits = _HASH_BITS - precision
+    rest = hashed & ((1 << bits) - 1)
+    return hashed >> bits, bits - rest.bit_length() + 1
+
+
+def _register_updates(hashes, precision):
+    """
+    Vectorized _register_update over a uint64 array
+    """
+    bits = _HASH_BITS - precision
+    index = (hashes >> np.uint64(bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << bits) - 1)
+
+    # Exact bit length by binary search over the shift amount
+    length = np.zeros(len(rest), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = (rest >> np.uint64(shift)) != 0
+        length += shift * high
+        rest = np.where(high, rest >> np.uint64(shift), rest)
+    length += rest != 0
+
+    return index, (bits - length + 1).astype(np.uint8)
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimator
+    Registers start sparse (a dict) and switch to a dense bytearray once that
+    is smaller, so sketches of small sets stay small. add() mirrors set.add
+    and len() returns the estimate, so a sketch can stand in for a set
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError('HyperLogLog precision must be between 4 and 18')
+
+        self.precision = precision
+        self.size = 1 << precision
+        self.sparse = {}
+        self.dense = None
+
+    def add(self, value):
+        index, rank = _register_update(hash64(value), self.precision)
+        self._set(index, rank)
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def _set(self, index, rank):
+        if self.dense is not None:
+            if rank > self.dense[index]:
+                self.dense[index] = rank
+        elif rank > self.sparse.get(index, 0):
+            self.sparse[index] = rank
+            if len(self.sparse) > self.size // _SPARSE_SHARE:
+                self._densify()
+
+    def _densify(self):
+        self.dense = bytearray(self.size)
+        for index, rank in self.sparse.items():
+            self.dense[index] = rank
+        self.sparse = None
+
+    def _registers(self):
+        """
+        Returns: (non-zero ranks, number of zero registers)
+        """
+        if self.dense is not None:
+            ranks = [rank for rank in self.dense if rank]
+        else:
+            ranks = list(self.sparse.values())
+        return ranks, self.size - len(ranks)
+
+    def count(self):
+        ranks, zeros = self._registers()
+
+        if not ranks:
+            return 0
+
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / (zeros + sum(2.0 ** -rank for rank in ranks))
+
+        # Small-range correction: linear counting over empty registers
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def merge(self, other):
+        """
+        Folds another sketch in (register-wise max)
+        Returns: self
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLog sketches of different precision')
+
+        if other.dense is not None:
+            if self.dense is None:
+                self._densify()
+            self.dense = bytearray(map(max, self.dense, other.dense))
+        else:
+            for index, rank in other.sparse.items():
+                self._set(index, rank)
+
+        return self
+
+    def __ior__(self, other):
+        return self.merge(other)
+
+    def copy(self):
+        sketch = HyperLogLog(self.precision)
+        sketch.sparse = None if self.sparse is None else dict(self.sparse)
+        sketch.dense = None if self.dense is None else bytearray(self.dense)
+        return sketch
+
+    def to_state(self):
+        state = {'type': 'hll', 'precision': self.precision}
+        if self.dense is not None:
+            state['dense'] = base64.b64encode(bytes(self.dense)).decode('ascii')
+        else:
+            state['sparse'] = sorted(self.sparse.items())
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['precision'])
+        if 'dense' in state:
+            sketch.sparse = None
+            sketch.dense = bytearray(base64.b64decode(state['dense']))
+        else:
+            sketch.sparse = {index: rank for index, rank in state['sparse']}
+        return sketch
+
+    def __repr__(self):
+        return f"HyperLogLog(precision={self.precision}, estimate={self.count()})"
+
+
+def hll_by_group(group_codes, value_hashes, precision=HLL_PRECISION):
+    """
+    Builds one HyperLogLog per group from (group code, value hash) pairs
+    in bulk; both are NumPy arrays
+    Returns: dict of group code -> HyperLogLog
+    """
+    if not len(group_codes):
+        return {}
+
+    m = 1 << precision
+    index, rank = _register_updates(value_hashes, precision)
+
+    # Highest rank per (group, register)
+    keys = group_codes.astype(np.int64) * m + index
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ranks = np.maximum.reduceat(rank[order], starts)
+    keys = keys[starts]
+
+    groups = keys // m
+    registers = keys % m
+    bounds = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1], [True])))
+
+    sketches = {}
+    for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        sketch = HyperLogLog(precision)
+        sketch.sparse = dict(zip(registers[start:stop].tolist(), ranks[start:stop].tolist()))
+        if len(sketch.sparse) > m // _SPARSE_SHARE:
+            sketch._densify()
+        sketches[int(groups[start])] = sketch
+
+    return sketches
+
+
+class KLLSketch:
+    """
+    Quantile sketch (Karnin, Lang, Liberty)
+    Keeps levels of sorted compactors; a full level is sorted and every other
+    value is promoted with double weight. New values are buffered in level 0
+    and compacted k at a time, so add() is O(1) amortized over the sort.
+    Memory is bounded by about 4 * k values: the level capacities sum to
+    about 3 * k, and level 0 buffers up to k more before compacting
+    """
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self._random = random.Random(seed)
+        self._recount()
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _recount(self):
+        """
+        Refreshes the running totals _full() compares
+        """
+        self._size = sum(map(len, self.levels))
+        self._capacity_total = sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _full(self):
+        return self._size >= self._capacity_total
+
+    def add(self, value):
+        level = self.levels[0]
+        level.append(value)
+        self.n += 1
+        self._size += 1
+
+        # Level 0 is a buffer: compacting only once it holds k values keeps
+        # the shallow capacities of a deep sketch from compacting every add
+        if len(level) >= self.k and self._full():
+            self._compress()
+
+    def update(self, values):
+        values = list(values)
+        self.levels[0].extend(values)
+        self.n += len(values)
+        self._size += len(values)
+        self._compress()
+
+    def _compress(self):
+        while self._full():
+            for height, level in enumerate(self.levels):
+                if len(level) >= self._capacity(height):
+                    if height + 1 == len(self.levels):
+                        self.levels.append([])
+                        self._capacity_total = sum(self._capacity(h) for h in range(len(self.levels)))
+
+                    level.sort()
+                    leftover = [level.pop()] if len(level) % 2 else []
+                    promoted = level[self._random.getrandbits(1)::2]
+                    self.levels[height + 1].extend(promoted)
+                    self._size -= len(level) - len(promoted)
+                    level[:] = leftover
+                    break
+
+    def merge(self, other):
+        """
+        Folds another sketch in
+        Returns: self
+        """
+        if other.k != self.k:
+            raise ValueError('Cannot merge KLL sketches with different k')
+
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+
+        for height, level in enumerate(other.levels):
+            self.levels[height].extend(level)
+
+        self.n += other.n
+        self._recount()
+        self._compress()
+        return self
+
+    def quantiles(self, fractions):
+        """
+        Approximate values at the given fractions (0.5 for the median)
+        Returns: list of values, None for an empty sketch
+        """
+        weighted = sorted(
+            (value, 1 << height)
+            for height, level in enumerate(self.levels)
+            for value in level
+        )
+
+        if not weighted:
+            return [None] * len(fractions)
+
+        total = sum(weight for _, weight in weighted)
+        results = []
+
+        for fraction in fractions:
+            target = fraction * total
+            cumulative = 0
+
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+
+            results.append(value)
+
+        return results
+
+    def quantile(self, fraction):
+        return self.quantiles([fraction])[0]
+
+    def __len__(self):
+        return self.n
+
+    def copy(self):
+        sketch = KLLSketch(self.k)
+        sketch.n = self.n
+        sketch.levels = [list(level) for level in self.levels]
+        sketch._recount()
+        return sketch
+
+    def to_state(self):
+        return {'type': 'kll', 'k': self.k, 'n': self.n, 'levels': self.levels}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['k'])
+        sketch.n = state['n']
+        sketch.levels = [list(level) for level in state['levels']]
+        sketch._recount()
+        return sketch
+
+    def __repr__(self):
+        return f"KLLSketch(k={self.k}, n={self.n})"
+
+
+SKETCH_TYPES = {'hll': HyperLogLog, 'kll': KLLSketch}
+
+
+def sketch_from_state(state):
+    """
+    Rebuilds a sketch from its to_state() output
+    """
+    return SKETCH_TYPES[state['type']].from_state(state)
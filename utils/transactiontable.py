@@ -0,0 +1,389 @@
+# Compact columnar storage for parsed sales transactions
+from array import array
+from collections.abc import Mapping
+
+from utils.dates import day_number
+
+try:
+    import numpy as np
+except ImportError:   # NumPy is optional; arrays work without it
+    np = None
+
+# Column kinds
+STRING = 'string'       # plain list of str, for unique values like TransactionID
+CATEGORY = 'category'   # dictionary-encoded strings (None allowed as a value)
+INT = 'int'
+FLOAT = 'float'
+OPTIONAL_FLOAT = 'optional_float'   # float with None stored as NaN
+BOOL = 'bool'
+
+SCHEMA = [
+    ('TransactionID', STRING),
+    ('Date', CATEGORY),
+    ('ProductID', CATEGORY),
+    ('ProductName', CATEGORY),
+    ('Quantity', INT),
+    ('UnitPrice', FLOAT),
+    ('CustomerID', CATEGORY),
+    ('Region', CATEGORY),
+]
+
+# Column the per-row day numbers are derived from
+DATE = 'Date'
+
+# Columns added by apihandler.enrich_sales_data
+ENRICHED_SCHEMA = SCHEMA + [
+    ('API_Category', CATEGORY),
+    ('API_Brand', CATEGORY),
+    ('API_Rating', OPTIONAL_FLOAT),
+    ('API_Match', BOOL),
+]
+
+
+class StringColumn:
+    """
+    Plain string column backed by a list
+    """
+
+    kind = STRING
+
+    def __init__(self, values=None):
+        self.values = values if values is not None else []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def append(self, value):
+        self.values.append(value)
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    def take(self, indices):
+        values = self.values
+        return StringColumn([values[i] for i in indices])
+
+
+class CategoryColumn:
+    """
+    Dictionary-encoded string column
+    codes[i] indexes into dictionary; lookup maps value -> code
+    """
+
+    kind = CATEGORY
+
+    def __init__(self, dictionary=None, codes=None, lookup=None):
+        self.dictionary = dictionary if dictionary is not None else []
+        self.lookup = lookup if lookup is not None else {
+            value: code for code, value in enumerate(self.dictionary)
+        }
+        self.codes = codes if codes is not None else array('i')
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.dictionary[self.codes[i]]
+
+    def encode(self, value):
+        code = self.lookup.get(value)
+
+        if code is None:
+            code = len(self.dictionary)
+            self.lookup[value] = code
+            self.dictionary.append(value)
+
+        return code
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def extend(self, values):
+        """
+        Bulk append: new distinct values are encoded once, then codes are
+        looked up through the dict in a single C-level map
+        """
+        values = values if isinstance(values, list) else list(values)
+        lookup = self.lookup
+
+        for value in dict.fromkeys(values):
+            if value not in lookup:
+                lookup[value] = len(self.dictionary)
+                self.dictionary.append(value)
+
+        self.codes.fromlist(list(map(lookup.__getitem__, values)))
+
+    def take(self, indices):
+        # The dictionary is shared; unused entries are harmless
+        return CategoryColumn(self.dictionary, _take(self.codes, indices), self.lookup)
+
+
+class NumericColumn:
+    """
+    Typed numeric column backed by array.array
+    """
+
+    TYPECODES = {INT: 'q', FLOAT: 'd', OPTIONAL_FLOAT: 'd', BOOL: 'b'}
+
+    def __init__(self, kind, values=None):
+        self.kind = kind
+        self.values = values if values is not None else array(self.TYPECODES[kind])
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        value = self.values[i]
+
+        if self.kind == OPTIONAL_FLOAT:
+            return None if value != value else value
+        if self.kind == BOOL:
+            return bool(value)
+
+        return value
+
+    def append(self, value):
+        if value is None and self.kind == OPTIONAL_FLOAT:
+            value = float('nan')
+
+        self.values.append(value)
+
+    def extend(self, values):
+        if self.kind == OPTIONAL_FLOAT:
+            values = [float('nan') if value is None else value for value in values]
+
+        self.values.fromlist(values if isinstance(values, list) else list(values))
+
+    def take(self, indices):
+        return NumericColumn(self.kind, _take(self.values, indices))
+
+
+def _take(values, indices):
+    """
+    Gathers positions from an array.array, vectorized when NumPy is available
+    """
+    if np is not None:
+        gathered = np.frombuffer(values, dtype=values.typecode)[np.asarray(indices, dtype=np.intp)]
+        result = array(values.typecode)
+        result.frombytes(gathered.tobytes())
+        return result
+
+    return array(values.typecode, (values[i] for i in indices))
+
+
+def _day_column(column, start=0):
+    """
+    Day numbers (utils/dates.py) of a date string column from row start on
+    Each distinct string is parsed once; invalid dates are 0
+    Returns: array('i')
+    """
+    if column.kind != CATEGORY:
+        return array('i', map(day_number, column.values[start:]))
+
+    days = array('i', map(day_number, column.dictionary))
+    codes = column.codes
+    return _take(days, codes[start:] if start else codes)
+
+
+def _new_column(kind):
+    if kind == STRING:
+        return StringColumn()
+    if kind == CATEGORY:
+        return CategoryColumn()
+    return NumericColumn(kind)
+
+
+class TransactionRow(Mapping):
+    """
+    Read-only dict-like view of one row, so t['Quantity'] keeps working
+    """
+
+    __slots__ = ('_table', '_position')
+
+    def __init__(self, table, position):
+        self._table = table
+        self._position = position
+
+    @property
+    def position(self):
+        return self._position
+
+    def __getitem__(self, key):
+        return self._table.columns[key][self._position]
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self):
+        return len(self._table.columns)
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"TransactionRow({self.copy()!r})"
+
+
+class TransactionTable:
+    """
+    Column-oriented collection of transactions
+    Iterating yields TransactionRow views, so code written for lists of
+    dictionaries can take a table directly
+    days holds the day number of every row's Date, kept in step with the
+    rows so date filters and sorts never reparse (None without a Date column)
+    """
+
+    def __init__(self, schema=SCHEMA, columns=None, days=None):
+        self.schema = list(schema)
+        self.columns = columns if columns is not None else {
+            name: _new_column(kind) for name, kind in self.schema
+        }
+
+        if days is None and DATE in self.columns:
+            days = _day_column(self.columns[DATE])
+        self.days = days
+
+    @classmethod
+    def from_transactions(cls, transactions, schema=SCHEMA):
+        table = cls(schema)
+        table.extend(transactions)
+        return table
+
+    @classmethod
+    def from_columns(cls, values, schema=SCHEMA):
+        """
+        Builds a table from one sequence of values per column name
+        Much faster than appending row by row for large batches
+        """
+        table = cls(schema)
+        table.extend_columns(values)
+        return table
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        Appends tables with the same schema into one, merging category dictionaries
+        """
+        tables = list(tables)
+        result = cls(tables[0].schema if tables else SCHEMA)
+
+        for table in tables:
+            result.extend_table(table)
+
+        return result
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield TransactionRow(self, position)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('transaction index out of range')
+        return TransactionRow(self, position)
+
+    def __repr__(self):
+        return f"TransactionTable({len(self)} rows, columns={list(self.columns)})"
+
+    def append(self, transaction):
+        for name, column in self.columns.items():
+            column.append(transaction[name])
+
+        if self.days is not None:
+            self.days.append(day_number(transaction[DATE]))
+
+    def extend(self, transactions):
+        for transaction in transactions:
+            self.append(transaction)
+
+    def extend_columns(self, values):
+        """
+        Appends whole columns at once; values maps every column name to a sequence
+        """
+        start = len(self)
+
+        for name, column in self.columns.items():
+            column.extend(values[name])
+
+        if self.days is not None:
+            self.days.extend(_day_column(self.columns[DATE], start))
+
+    def extend_table(self, other):
+        """
+        Appends another table's rows in place, merging category dictionaries
+        """
+        for name, kind in self.schema:
+            target = self.columns[name]
+            source = other.columns[name]
+
+            if kind == CATEGORY:
+                remap = [target.encode(value) for value in source.dictionary]
+
+                if np is not None and len(source):
+                    codes = np.asarray(remap, dtype=np.int32)[np.frombuffer(source.codes, dtype=np.int32)]
+                    target.codes.frombytes(codes.tobytes())
+                else:
+                    target.codes.extend(remap[code] for code in source.codes)
+
+            else:
+                target.values.extend(source.values)
+
+        if self.days is not None:
+            self.days.extend(other.day_numbers())
+
+    def take(self, positions):
+        """
+        Returns a new table holding only the given row positions
+        """
+        if np is None or not isinstance(positions, np.ndarray):
+            positions = list(positions)
+        days = None if self.days is None else _take(self.days, positions)
+        return TransactionTable(self.schema, {
+            name: column.take(positions) for name, column in self.columns.items()
+        }, days)
+
+    def to_dicts(self):
+        return [row.copy() for row in self]
+
+    # Raw buffer access for vectorized consumers
+
+    def codes(self, name):
+        return self.columns[name].codes
+
+    def dictionary(self, name):
+        return self.columns[name].dictionary
+
+    def numbers(self, name):
+        return self.columns[name].values
+
+    def day_numbers(self, name=DATE):
+        """
+        Integer day-number column of a date string column
+        The Date column's is stored on the table; other columns are derived on demand
+        Returns: array('i')
+        """
+        if name == DATE and self.days is not None:
+            return self.days
+
+        return _day_column(self.columns[name])
+
+    def as_numpy(self, name):
+        """
+        Zero-copy NumPy view of a numeric column, or of a category column's codes
+        The view pins the buffer: appending to the table while it is alive fails
+        """
+        if np is None:
+            raise ImportError('NumPy is required for as_numpy()')
+
+        column = self.columns[name]
+        buffer = column.codes if column.kind == CATEGORY else column.values
+        return np.frombuffer(buffer, dtype=buffer.typecode)
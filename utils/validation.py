@@ -0,0 +1,244 @@
+# Declarative validation rules shared by every ingest entry point
+import operator
+from collections import namedtuple
+from functools import partial
+
+from utils.transactiontable import CATEGORY, TransactionTable
+
+try:
+    import numpy as np
+except ImportError:   # fused row-by-row check only
+    np = None
+
+# A transaction is invalid if any rule does not hold. Rules are checked in
+# order and a rejection is counted against the first rule that fails.
+Rule = namedtuple('Rule', ['name', 'field', 'op', 'value'])
+
+VALIDATION_RULES = [
+    Rule('transaction_id_prefix', 'TransactionID', 'startswith', 'T'),
+    Rule('product_id_prefix', 'ProductID', 'startswith', 'P'),
+    Rule('customer_id_prefix', 'CustomerID', 'startswith', 'C'),
+    Rule('quantity_positive', 'Quantity', 'gt', 0),
+    Rule('unit_price_positive', 'UnitPrice', 'gt', 0),
+    Rule('region_present', 'Region', 'nonempty', None),
+]
+
+# Value a missing field is checked as, per operator (0 for numeric rules)
+_MISSING = {'gt': 0, 'ge': 0}
+
+
+def _value_test(rule):
+    """
+    Returns: test(value) -> True if the rule holds for a field value
+    """
+    op = rule.op
+    expected = rule.value
+
+    if op == 'startswith':
+        return lambda value: (value or '').startswith(expected)
+    if op == 'gt':
+        return partial(operator.lt, expected)   # expected < value
+    if op == 'ge':
+        return partial(operator.le, expected)
+    if op == 'eq':
+        return partial(operator.eq, expected)
+    if op == 'nonempty':
+        return bool
+
+    raise ValueError(f"Unknown validation operator '{op}' in rule '{rule.name}'")
+
+
+def _rule_tests(rules):
+    return [
+        (index, rule.field, _value_test(rule), _MISSING.get(rule.op))
+        for index, rule in enumerate(rules)
+    ]
+
+
+def compile_rules(rules=VALIDATION_RULES):
+    """
+    Fuses the rules into one check over (index, field, test) closures
+    Returns: check(t) -> index of the first failing rule, or -1 if t is valid
+    """
+    tests = _rule_tests(rules)
+
+    def check(t):
+        for index, field, test, missing in tests:
+            if not test(t.get(field, missing)):
+                return index
+        return -1
+
+    return check
+
+
+def compile_scan(rules=VALIDATION_RULES):
+    """
+    Builds the row loop with the rule closures checked in order inside it
+    Returns: scan(transactions, region, min_amount, max_amount, rejected, kept)
+    -> (total, filtered_by_region, filtered_by_amount, regions, amount_range)
+    """
+    tests = _rule_tests(rules)
+
+    def scan(transactions, region, min_amount, max_amount, rejected, kept):
+        regions = set()
+        amount_min = amount_max = None
+        filtered_by_region = filtered_by_amount = total = 0
+
+        for t in transactions:
+            total += 1
+
+            t_region = t.get('Region')
+            if t_region:
+                regions.add(t_region)
+
+            quantity = t.get('Quantity', 0)
+            unit_price = t.get('UnitPrice', 0)
+            amount = quantity * unit_price
+
+            if quantity > 0 and unit_price > 0:
+                if amount_min is None or amount < amount_min:
+                    amount_min = amount
+                if amount_max is None or amount > amount_max:
+                    amount_max = amount
+
+            for index, field, test, missing in tests:
+                if not test(t.get(field, missing)):
+                    rejected[index] += 1
+                    break
+            else:
+                if region and t_region != region:
+                    filtered_by_region += 1
+                elif (min_amount is not None and amount < min_amount) or \
+                        (max_amount is not None and amount > max_amount):
+                    filtered_by_amount += 1
+                else:
+                    kept.append(t)
+
+        return total, filtered_by_region, filtered_by_amount, regions, (amount_min, amount_max)
+
+    return scan
+
+
+def _column_mask(table, rule):
+    """
+    Vectorized "rule holds" mask over a TransactionTable column
+    """
+    column = table.columns[rule.field]
+
+    if column.kind == CATEGORY:
+        holds = _value_test(rule)
+        per_value = np.array([holds(value) for value in column.dictionary], dtype=bool)
+        return per_value[table.as_numpy(rule.field)] if len(per_value) else np.zeros(0, dtype=bool)
+
+    if rule.op in ('gt', 'ge'):
+        values = table.as_numpy(rule.field)
+        return values > rule.value if rule.op == 'gt' else values >= rule.value
+
+    return np.fromiter(map(_value_test(rule), column.values), dtype=bool, count=len(column))
+
+
+class Validator:
+    """
+    Single-pass validation and filtering with per-rule rejection counts
+    Runs the fused check row by row, or whole-column masks when
+    given a TransactionTable and NumPy is installed
+    """
+
+    def __init__(self, rules=VALIDATION_RULES):
+        self.rules = list(rules)
+        self.check = compile_rules(self.rules)
+        self.scan = compile_scan(self.rules)
+
+    def new_summary(self):
+        return {
+            'total_input': 0,
+            'invalid': 0,
+            'filtered_by_region': 0,
+            'filtered_by_amount': 0,
+            'final_count': 0,
+            'rejected_by_rule': {rule.name: 0 for rule in self.rules}
+        }
+
+    def run(self, transactions, region=None, min_amount=None, max_amount=None, summary=None):
+        """
+        Validates and filters in one pass, updating summary in place
+        Returns: (kept transactions, stats) - a table for table input, else a list;
+        stats holds the regions seen and the positive amount range
+        """
+        if summary is None:
+            summary = self.new_summary()
+
+        if np is not None and isinstance(transactions, TransactionTable):
+            return self._run_columnar(transactions, region, min_amount, max_amount, summary)
+
+        return self._run_rows(transactions, region, min_amount, max_amount, summary)
+
+    def _run_rows(self, transactions, region, min_amount, max_amount, summary):
+        rejected = [0] * len(self.rules)
+        kept = []
+
+        total, filtered_by_region, filtered_by_amount, regions, amount_range = self.scan(
+            transactions, region, min_amount, max_amount, rejected, kept
+        )
+
+        self._update_summary(summary, total, rejected, filtered_by_region, filtered_by_amount, len(kept))
+
+        return kept, {'regions': regions, 'amount_range': amount_range}
+
+    def _run_columnar(self, table, region, min_amount, max_amount, summary):
+        n = len(table)
+        quantity = table.as_numpy('Quantity')
+        unit_price = table.as_numpy('UnitPrice')
+        amounts = quantity.astype(np.float64) * unit_price
+
+        # First failing rule per row (-1 = valid)
+        failed = np.full(n, -1, dtype=np.int16)
+
+        for index, rule in enumerate(self.rules):
+            newly_failed = ~_column_mask(table, rule) & (failed < 0)
+            failed[newly_failed] = index
+
+        rejected = np.bincount(failed[failed >= 0], minlength=len(self.rules)).tolist()
+        valid = failed < 0
+
+        if region:
+            region_mask = _column_mask(table, Rule('region_filter', 'Region', 'eq', region))
+            filtered_by_region = int(np.count_nonzero(valid & ~region_mask))
+            valid &= region_mask
+        else:
+            filtered_by_region = 0
+
+        amount_mask = np.ones(n, dtype=bool)
+        if min_amount is not None:
+            amount_mask &= amounts >= min_amount
+        if max_amount is not None:
+            amount_mask &= amounts <= max_amount
+
+        filtered_by_amount = int(np.count_nonzero(valid & ~amount_mask))
+        kept_rows = np.flatnonzero(valid & amount_mask)
+
+        positive = amounts[(quantity > 0) & (unit_price > 0)]
+        amount_range = (float(positive.min()), float(positive.max())) if len(positive) else (None, None)
+
+        region_codes = np.unique(table.as_numpy('Region'))
+        region_names = table.dictionary('Region')
+        regions = {region_names[code] for code in region_codes.tolist() if region_names[code]}
+
+        kept = table.take(kept_rows)
+        self._update_summary(summary, n, rejected, filtered_by_region, filtered_by_amount, len(kept))
+
+        return kept, {'regions': regions, 'amount_range': amount_range}
+
+    def _update_summary(self, summary, total, rejected, filtered_by_region, filtered_by_amount, kept):
+        summary['total_input'] += total
+        summary['invalid'] += sum(rejected)
+        summary['filtered_by_region'] += filtered_by_region
+        summary['filtered_by_amount'] += filtered_by_amount
+        summary['final_count'] += kept
+
+        by_rule = summary.setdefault('rejected_by_rule', {rule.name: 0 for rule in self.rules})
+        for rule, count in zip(self.rules, rejected):
+            by_rule[rule.name] = by_rule.get(rule.name, 0) + count
+
+
+DEFAULT_VALIDATOR = Validator()